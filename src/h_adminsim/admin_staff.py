@@ -13,7 +13,11 @@ from patientsim.utils.common_utils import set_seed
 
 from h_adminsim.utils import colorstr, log
 from h_adminsim.tools import SchedulingRule, create_tools
-from h_adminsim.client import GeminiClient, GPTClient, VLLMClient
+from h_adminsim.client import (
+    GeminiClient, GPTClient, VLLMClient,
+    AsyncGeminiClient, AsyncGPTClient, AsyncVLLMClient,
+    get_client, get_shared_object,
+)
 
 
 
@@ -28,6 +32,7 @@ class AdminStaffAgent:
                  scheduling_user_prompt_path: Optional[str] = None,
                  tool_calling_prompt_path: Optional[str] = None,
                  sc_tool_calling_prompt_path: Optional[str] = None,
+                 use_async: bool = False,
                  **kwargs):
         
         # Initialize environment
@@ -41,6 +46,7 @@ class AdminStaffAgent:
             api_key=api_key,
             use_vllm=use_vllm,
             vllm_endpoint=vllm_endpoint,
+            use_async=use_async,
         )
         
         # Initialize prompt
@@ -77,7 +83,8 @@ class AdminStaffAgent:
                     model: str,
                     api_key: Optional[str] = None,
                     use_vllm: bool = False,
-                    vllm_endpoint: Optional[str] = None):
+                    vllm_endpoint: Optional[str] = None,
+                    use_async: bool = False):
         """
         Initialize the model and API client based on the specified model type.
 
@@ -87,16 +94,17 @@ class AdminStaffAgent:
                                                Defaults to None.
             use_vllm (bool): Whether to use vLLM client.
             vllm_endpoint (Optional[str], optional): Path to the vLLM server. Defaults to None.
+            use_async (bool, optional): Whether to use the asynchronous API client, which makes the agent call awaitable. Defaults to False.
 
         Raises:
             ValueError: If the specified model is not supported.
         """
         if 'gemini' in model.lower():
-            self.client = GeminiClient(model, api_key)
+            self.client = get_client(AsyncGeminiClient, model, api_key) if use_async else get_client(GeminiClient, model, api_key)
         elif 'gpt' in model.lower():       # TODO: Support o3, o4 models etc.
-            self.client = GPTClient(model, api_key)
+            self.client = get_client(AsyncGPTClient, model, api_key) if use_async else get_client(GPTClient, model, api_key)
         elif use_vllm:
-            self.client = VLLMClient(model, vllm_endpoint)
+            self.client = get_client(AsyncVLLMClient, model, vllm_endpoint) if use_async else get_client(VLLMClient, model, vllm_endpoint)
         else:
             raise ValueError(colorstr("red", f"Unsupported model: {model}. Supported models are 'gemini' and 'gpt'."))
         
@@ -216,11 +224,17 @@ class AdminStaffAgent:
             ("user", "{input}"),
             ("assistant", "{agent_scratchpad}"),
         ])
+        # Chat models keep no conversation state, so that they are shared in the process per (provider, model, endpoint)
+        # Streaming is disabled, since the streamed calls bypass the LangChain cache (i.e., the LLM response cache and trace)
         # Gemini series
         if 'gemini' in self.model.lower():
-            llm = ChatGoogleGenerativeAI(
-                model=self.model,
-                temperature=0,
+            llm = get_shared_object(
+                (ChatGoogleGenerativeAI, self.model),
+                lambda: ChatGoogleGenerativeAI(
+                    model=self.model,
+                    temperature=0,
+                    disable_streaming=True,
+                )
             )
             agent = create_tool_calling_agent(
                 llm=llm,
@@ -229,9 +243,13 @@ class AdminStaffAgent:
             )
         # GPT series
         elif 'gpt' in self.model.lower():
-            llm = ChatOpenAI(
-                model_name=self.model, 
-                temperature=0 if not 'gpt-5' in self.model.lower() else 1
+            llm = get_shared_object(
+                (ChatOpenAI, self.model, None),
+                lambda: ChatOpenAI(
+                    model_name=self.model, 
+                    temperature=0 if not 'gpt-5' in self.model.lower() else 1,
+                    disable_streaming=True,
+                )
             )
             agent = create_openai_tools_agent(
                 llm=llm,
@@ -240,10 +258,14 @@ class AdminStaffAgent:
             )
         # vLLM open sources
         else:
-            llm = ChatOpenAI(
-                model=self.model,
-                temperature=0,
-                base_url=f"{self.client.vllm_endpoint}/v1",
+            llm = get_shared_object(
+                (ChatOpenAI, self.model, self.client.vllm_endpoint),
+                lambda: ChatOpenAI(
+                    model=self.model,
+                    temperature=0,
+                    base_url=f"{self.client.vllm_endpoint}/v1",
+                    disable_streaming=True,
+                )
             )
             agent = create_openai_tools_agent(
                 llm=llm,
@@ -258,6 +280,7 @@ class AdminStaffAgent:
             max_iterations=1,
             return_intermediate_steps=True,
         )
+        executor.agent.stream_runnable = False      # Call the chat model through the cached (i.e., recorded and replayed) path
         return executor
         
 
@@ -275,7 +298,7 @@ class AdminStaffAgent:
             verbose (bool, optional): Whether to print verbose output. Defaults to True.
 
         Returns:
-            str: The response from the patient agent.
+            str: The response from the patient agent. If the agent uses the asynchronous client, an awaitable of the response is returned.
         """
         response = self.client(
             user_prompt=user_prompt,
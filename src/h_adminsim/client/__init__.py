@@ -1,3 +1,6 @@
-from .google_client import GeminiClient
-from .openai_client import GPTClient
-from .vllm_client import VLLMClient
\ No newline at end of file
+from .google_client import GeminiClient, AsyncGeminiClient
+from .openai_client import GPTClient, AsyncGPTClient
+from .vllm_client import VLLMClient, AsyncVLLMClient
+from .client_registry import get_shared_object, get_client, clear_client_registry, SharedClientMixin
+from .response_cache import LLMResponseCache, LangChainResponseCache, enable_response_cache, disable_response_cache, get_response_cache
+from .trace import LLMTraceRecorder, LLMTraceReplayer, LangChainTraceCache, enable_trace_recording, enable_trace_replay, disable_trace, set_trace_source
\ No newline at end of file
@@ -0,0 +1,97 @@
+import threading
+from copy import copy
+from typing import Any, Callable, Hashable
+
+from h_adminsim.client.response_cache import cache_sdk_client
+from h_adminsim.client.trace import offline_model_list
+
+
+
+# Process-wide registry of the objects which are expensive to construct (API clients, LangChain chat models, etc.)
+_SHARED_OBJECTS = dict()
+_REGISTRY_LOCK = threading.RLock()
+
+
+
+def get_shared_object(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Get a process-wide shared object, constructing it only once per key.
+
+    Args:
+        key (Hashable): Registry key of the object (e.g., (provider, model, endpoint)).
+        factory (Callable[[], Any]): Function which constructs the object when it is not registered yet.
+
+    Returns:
+        Any: The shared object.
+    """
+    with _REGISTRY_LOCK:
+        if key not in _SHARED_OBJECTS:
+            _SHARED_OBJECTS[key] = factory()
+        return _SHARED_OBJECTS[key]
+
+
+
+def fresh_client(template: Any) -> Any:
+    """
+    Make a conversation client from a template client.
+    The returned client shares the underlying SDK client (and its HTTP connection pool) with the template,
+    while the conversation history and token usages are created fresh.
+
+    Args:
+        template (Any): A registered client which is never called directly.
+
+    Returns:
+        Any: A client for a new conversation.
+    """
+    client = copy(template)
+    client.histories = list()
+    client.token_usages = dict()
+    return client
+
+
+
+def get_client(client_cls: type, model: str, *args) -> Any:
+    """
+    Get a client for a new conversation, sharing the underlying SDK client per (provider, model, endpoint).
+    The template client is constructed once per process, so that the connection setup and the model-list validation
+    of the vLLM server (`GET /v1/models`) are not repeated for every patient.
+
+    Args:
+        client_cls (type): Client class of the provider (e.g., GPTClient, GeminiClient and VLLMClient).
+        model (str): Model name.
+        *args: The remaining arguments of the client class (e.g., API key or vLLM endpoint).
+
+    Returns:
+        Any: A client for a new conversation.
+    """
+    template = get_shared_object((client_cls, model, *args), lambda: client_cls(model, *args))
+    return fresh_client(template)
+
+
+
+def clear_client_registry():
+    """
+    Remove every registered object of the process (e.g., after the API key or the vLLM server has changed).
+    """
+    with _REGISTRY_LOCK:
+        _SHARED_OBJECTS.clear()
+
+
+
+class SharedClientMixin:
+    """
+    Mixin for the agents whose `_init_model` only constructs `self.client` (e.g., the agents of PatientSim).
+    The client is constructed once per process for the same model arguments, and every agent gets a fresh conversation client from it.
+    Its SDK client is also routed through the LLM response cache (see `enable_response_cache`).
+    """
+    def _init_model(self, *args, **kwargs):
+        base_cls = next(c for c in type(self).__mro__[1:] if c is not SharedClientMixin and '_init_model' in c.__dict__)
+        key = (base_cls, args, tuple(sorted(kwargs.items())))
+
+        def factory():
+            with offline_model_list(kwargs.get('model', args[0] if args else None)):
+                base_cls._init_model(self, *args, **kwargs)
+            cache_sdk_client(self.client.client)
+            return self.client
+
+        self.client = fresh_client(get_shared_object(key, factory))
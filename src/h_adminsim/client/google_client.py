@@ -1,11 +1,13 @@
 import os
 import time
+import asyncio
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv, find_dotenv
 from typing import List, Tuple, Optional
 
 from h_adminsim.utils import log
+from h_adminsim.client.response_cache import cache_sdk_client
 from h_adminsim.utils.common_utils import exponential_backoff
 from h_adminsim.utils.image_preprocess_utils import *
 
@@ -40,7 +42,7 @@ class GeminiClient:
             dotenv_path = find_dotenv(usecwd=True)
             load_dotenv(dotenv_path, override=True)
             api_key = os.environ.get("GOOGLE_API_KEY", None)
-        self.client = genai.Client(api_key=api_key)
+        self.client = cache_sdk_client(genai.Client(api_key=api_key))
 
 
     def reset_history(self, verbose: bool = True):
@@ -91,6 +93,67 @@ class GeminiClient:
         return payloads
 
 
+    def _prepare_request(self,
+                         user_prompt: str,
+                         image_path: Optional[str] = None,
+                         image_size: Optional[Tuple[int]] = None,
+                         using_multi_turn: bool = False,
+                         verbose: bool = True):
+        """
+        Append the user prompt of a request to the conversation history.
+
+        Args:
+            user_prompt (str): The main user prompt or query to send to the model.
+            image_path (Optional[str], optional): Path to an image file to be included in the prompt. Defaults to None.
+            image_size (Optional[Tuple[int]], optional): The target image size in (width, height) format, if resizing is needed. Defaults to None.
+            using_multi_turn (bool): Whether to structure it as multi-turn. Defaults to False.
+            verbose (bool): Whether to print verbose output. Defaults to True.
+
+        Raises:
+            FileNotFoundError: If `image_path` is provided but the file does not exist.
+        """
+        if image_path and not os.path.exists(image_path):
+            raise FileNotFoundError
+        
+        # To ensure empty history
+        if not using_multi_turn:
+            self.reset_history(verbose)
+        
+        # User prompt
+        self.histories += self.__make_payload(user_prompt, image_path, image_size)
+
+
+    def _handle_response(self, response: types.GenerateContentResponse) -> Optional[str]:
+        """
+        Log the token usage of a model response.
+
+        Args:
+            response (types.GenerateContentResponse): The response of the model.
+
+        Returns:
+            Optional[str]: The model's response message. None if the model returned no text.
+        """
+        if response.usage_metadata:
+            self.token_usages.setdefault("prompt_tokens", []).append(response.usage_metadata.prompt_token_count)
+            self.token_usages.setdefault("completion_tokens", []).append(response.usage_metadata.candidates_token_count)
+            self.token_usages.setdefault("total_tokens", []).append(response.usage_metadata.total_token_count)
+        return response.text
+
+
+    def _append_response(self, text: str) -> str:
+        """
+        Append the final model response to the conversation history.
+
+        Args:
+            text (str): The model's response message.
+
+        Returns:
+            str: The model's response message.
+        """
+        self.histories.append(types.Content(role='model', parts=[types.Part.from_text(text=text)]))
+        return text
+
+
     def __call__(self,
                  user_prompt: str,
                  system_prompt: Optional[str] = None,
@@ -117,16 +180,8 @@ class GeminiClient:
         Returns:
             str: The model's response message.
         """
-        if image_path and not os.path.exists(image_path):
-            raise FileNotFoundError
-    
         try:
-            # To ensure empty history
-            if not using_multi_turn:
-                self.reset_history(verbose)
-            
-            # User prompt
-            self.histories += self.__make_payload(user_prompt, image_path, image_size)
+            self._prepare_request(user_prompt, image_path, image_size, using_multi_turn, verbose)
 
             # System prompt and model response, including handling None cases
             count = 0
@@ -140,21 +195,14 @@ class GeminiClient:
                         **kwargs
                     )
                 )
-
-                # Logging token usage
-                if response.usage_metadata:
-                    self.token_usages.setdefault("prompt_tokens", []).append(response.usage_metadata.prompt_token_count)
-                    self.token_usages.setdefault("completion_tokens", []).append(response.usage_metadata.candidates_token_count)
-                    self.token_usages.setdefault("total_tokens", []).append(response.usage_metadata.total_token_count)
+                text = self._handle_response(response)
 
                 # After the maximum retries
                 if count >= max_retry:
-                    replace_text = 'None'
-                    self.histories.append(types.Content(role='model', parts=[types.Part.from_text(text=replace_text)]))
-                    return replace_text
+                    return self._append_response('None')
                 
                 # Exponential backoff logic
-                if response.text == None:
+                if text == None:
                     wait_time = exponential_backoff(count)
                     time.sleep(wait_time)
                     count += 1
@@ -162,8 +210,72 @@ class GeminiClient:
                 else:
                     break
 
-            self.histories.append(types.Content(role='model', parts=[types.Part.from_text(text=response.text)]))
-            return response.text
+            return self._append_response(text)
+        
+        except Exception as e:
+            raise e
+
+
+
+class AsyncGeminiClient(GeminiClient):
+    async def __call__(self,
+                       user_prompt: str,
+                       system_prompt: Optional[str] = None,
+                       image_path: Optional[str] = None,
+                       image_size:Optional[Tuple[int]] = None,
+                       using_multi_turn: bool = False,
+                       verbose: bool = True,
+                       **kwargs) -> str:
+        """
+        Sends a chat completion request to the model through the async Gemini client without blocking the event loop.
+        The conversation history and token usages are kept in the same way as `GeminiClient`.
+
+        Args:
+            user_prompt (str): The main user prompt or query to send to the model.
+            system_prompt (Optional[str], optional): An optional system-level prompt to set context or behavior. Defaults to None.
+            image_path (Optional[str], optional): Path to an image file to be included in the prompt. Defaults to None.
+            image_size (Optional[Tuple[int]], optional): The target image size in (width, height) format, if resizing is needed. Defaults to None.
+            using_multi_turn (bool): Whether to structure it as multi-turn. Defaults to False.
+            verbose (bool): Whether to print verbose output. Defaults to True.
+
+        Raises:
+            FileNotFoundError: If `image_path` is provided but the file does not exist.
+            e: Any exception raised during the API call is re-raised.
+
+        Returns:
+            str: The model's response message.
+        """
+        try:
+            self._prepare_request(user_prompt, image_path, image_size, using_multi_turn, verbose)
+
+            # System prompt and model response, including handling None cases
+            count = 0
+            max_retry = kwargs.get('max_retry', 5)
+            while 1:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=self.histories,
+                    config=types.GenerateContentConfig(
+                        system_instruction=system_prompt,
+                        **kwargs
+                    )
+                )
+                text = self._handle_response(response)
+
+                # After the maximum retries
+                if count >= max_retry:
+                    return self._append_response('None')
+                
+                # Exponential backoff logic
+                if text == None:
+                    wait_time = exponential_backoff(count)
+                    await asyncio.sleep(wait_time)
+                    count += 1
+                    continue
+                else:
+                    break
+
+            return self._append_response(text)
         
         except Exception as e:
             raise e
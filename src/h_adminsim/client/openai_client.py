@@ -1,9 +1,10 @@
 import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv, find_dotenv
 from typing import List, Tuple, Optional
 
 from h_adminsim.utils import log
+from h_adminsim.client.response_cache import cache_sdk_client
 from h_adminsim.utils.image_preprocess_utils import *
 
 
@@ -38,7 +39,7 @@ class GPTClient:
             dotenv_path = find_dotenv(usecwd=True)
             load_dotenv(dotenv_path, override=True)
             api_key = os.environ.get("OPENAI_API_KEY", None)
-        self.client = OpenAI(api_key=api_key)
+        self.client = cache_sdk_client(OpenAI(api_key=api_key))
 
     
     def reset_history(self, verbose: bool = True):
@@ -94,6 +95,67 @@ class GPTClient:
         return payloads
 
 
+    def _prepare_request(self,
+                         user_prompt: str,
+                         system_prompt: Optional[str] = None,
+                         image_path: Optional[str] = None,
+                         image_size: Optional[Tuple[int]] = None,
+                         using_multi_turn: bool = False,
+                         verbose: bool = True):
+        """
+        Append the system and user prompts of a request to the conversation history.
+
+        Args:
+            user_prompt (str): The main user prompt or query to send to the model.
+            system_prompt (Optional[str], optional): An optional system-level prompt to set context or behavior. Defaults to None.
+            image_path (Optional[str], optional): Path to an image file to be included in the prompt. Defaults to None.
+            image_size (Optional[Tuple[int]], optional): The target image size in (width, height) format, if resizing is needed. Defaults to None.
+            using_multi_turn (bool): Whether to structure it as multi-turn. Defaults to False.
+            verbose (bool): Whether to print verbose output. Defaults to True.
+
+        Raises:
+            FileNotFoundError: If `image_path` is provided but the file does not exist.
+        """
+        if image_path and not os.path.exists(image_path):
+            raise FileNotFoundError
+        
+        # To ensure empty history
+        if not using_multi_turn:
+            self.reset_history(verbose)
+        
+        if self.__first_turn:
+            # System prompt
+            if system_prompt:
+                self.histories.append({"role": "system", "content": [{"type": "text", "text": system_prompt}]})
+            self.__first_turn = False
+        
+        # User prompt
+        self.histories += self.__make_payload(user_prompt, image_path, image_size)
+
+
+    def _handle_response(self, response) -> str:
+        """
+        Append the model response to the conversation history and log its token usage.
+
+        Args:
+            response (ChatCompletion): The chat completion response of the model.
+
+        Returns:
+            str: The model's response message.
+        """
+        assistant_msg = response.choices[0].message
+        self.histories.append({"role": assistant_msg.role, "content": [{"type": "text", "text": assistant_msg.content}]})
+
+        # Logging token usage
+        if response.usage:
+            self.token_usages.setdefault("prompt_tokens", []).append(response.usage.prompt_tokens)
+            self.token_usages.setdefault("completion_tokens", []).append(response.usage.completion_tokens)
+            self.token_usages.setdefault("total_tokens", []).append(response.usage.total_tokens)
+            self.token_usages.setdefault("reasoning_tokens", []).append(response.usage.completion_tokens_details.reasoning_tokens)
+
+        return assistant_msg.content
+
+
     def __call__(self,
                  user_prompt: str,
                  system_prompt: Optional[str] = None,
@@ -120,22 +182,8 @@ class GPTClient:
         Returns:
             str: The model's response message.
         """
-        if image_path and not os.path.exists(image_path):
-            raise FileNotFoundError
-        
         try:
-            # To ensure empty history
-            if not using_multi_turn:
-                self.reset_history(verbose)
-            
-            if self.__first_turn:
-                # System prompt
-                if system_prompt:
-                    self.histories.append({"role": "system", "content": [{"type": "text", "text": system_prompt}]})
-                self.__first_turn = False
-            
-            # User prompt
-            self.histories += self.__make_payload(user_prompt, image_path, image_size)
+            self._prepare_request(user_prompt, system_prompt, image_path, image_size, using_multi_turn, verbose)
 
             # Model response
             response = self.client.chat.completions.create(
@@ -143,17 +191,66 @@ class GPTClient:
                 messages=self.histories,
                 **kwargs
             )
-            assistant_msg = response.choices[0].message
-            self.histories.append({"role": assistant_msg.role, "content": [{"type": "text", "text": assistant_msg.content}]})
+            return self._handle_response(response)
+        
+        except Exception as e:
+            raise e
+
 
-            # Logging token usage
-            if response.usage:
-                self.token_usages.setdefault("prompt_tokens", []).append(response.usage.prompt_tokens)
-                self.token_usages.setdefault("completion_tokens", []).append(response.usage.completion_tokens)
-                self.token_usages.setdefault("total_tokens", []).append(response.usage.total_tokens)
-                self.token_usages.setdefault("reasoning_tokens", []).append(response.usage.completion_tokens_details.reasoning_tokens)
 
-            return assistant_msg.content
+class AsyncGPTClient(GPTClient):
+    def _init_environment(self, api_key: Optional[str] = None):
+        """
+        Initialize asynchronous OpenAI client.
+
+        Args:
+            api_key (Optional[str]): API key for OpenAI. If not provided, it will
+                                     be loaded from environment variables.
+        """
+        if not api_key:
+            dotenv_path = find_dotenv(usecwd=True)
+            load_dotenv(dotenv_path, override=True)
+            api_key = os.environ.get("OPENAI_API_KEY", None)
+        self.client = cache_sdk_client(AsyncOpenAI(api_key=api_key))
+
+
+    async def __call__(self,
+                       user_prompt: str,
+                       system_prompt: Optional[str] = None,
+                       image_path: Optional[str] = None,
+                       image_size: Optional[Tuple[int]] = None,
+                       using_multi_turn: bool = False,
+                       verbose: bool = True,
+                       **kwargs) -> str:
+        """
+        Sends a chat completion request to the model without blocking the event loop.
+        The conversation history and token usages are kept in the same way as `GPTClient`.
+
+        Args:
+            user_prompt (str): The main user prompt or query to send to the model.
+            system_prompt (Optional[str], optional): An optional system-level prompt to set context or behavior. Defaults to None.
+            image_path (Optional[str], optional): Path to an image file to be included in the prompt. Defaults to None.
+            image_size (Optional[Tuple[int]], optional): The target image size in (width, height) format, if resizing is needed. Defaults to None.
+            using_multi_turn (bool): Whether to structure it as multi-turn. Defaults to False.
+            verbose (bool): Whether to print verbose output. Defaults to True.
+
+        Raises:
+            FileNotFoundError: If `image_path` is provided but the file does not exist.
+            e: Any exception raised during the API call is re-raised.
+
+        Returns:
+            str: The model's response message.
+        """
+        try:
+            self._prepare_request(user_prompt, system_prompt, image_path, image_size, using_multi_turn, verbose)
+
+            # Model response
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self.histories,
+                **kwargs
+            )
+            return self._handle_response(response)
         
         except Exception as e:
             raise e
@@ -0,0 +1,514 @@
+import os
+import json
+import zlib
+import time
+import base64
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from google import genai
+from pydantic import BaseModel
+from google.genai import types
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+from h_adminsim.utils import colorstr, log
+
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Convert the objects of the LLM request arguments which are not JSON serializable (e.g., pydantic models of the Gemini SDK and image bytes).
+
+    Args:
+        obj (Any): An object which is not JSON serializable.
+
+    Returns:
+        Any: JSON-compatible representation of the object.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json', exclude_none=True)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode()
+    return str(obj)
+
+
+
+class LLMResponseCache:
+    def __init__(self,
+                 path: Union[str, Path],
+                 max_size_mb: float = 1024,
+                 read_only: bool = False):
+        """
+        On-disk LLM response cache, content-addressed by the hash of the request (model, system prompt, messages, temperature, and the other API arguments).
+        Responses are stored compressed in a SQLite database, and the least recently used responses are evicted when the database exceeds `max_size_mb`.
+
+        Args:
+            path (Union[str, Path]): Path of the SQLite database file.
+            max_size_mb (float, optional): Maximum total size of the stored responses in MB. Defaults to 1024.
+            read_only (bool, optional): Replay mode. Cached responses are served, but nothing is written to the database,
+                                        so that the cache of a reference run is kept intact. Defaults to False.
+        """
+        # Initialize
+        self.path = str(path)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._init_db()
+
+        # Statistics
+        self.hits, self.misses, self.writes, self.evictions = 0, 0, 0, 0
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+    def _init_db(self):
+        """
+        Open the SQLite database and create the response table if it does not exist.
+        """
+        if self.read_only and not os.path.exists(self.path):
+            raise FileNotFoundError(colorstr("red", f"LLM response cache not found: {self.path}"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+        if not self.read_only:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+
+    @staticmethod
+    def make_key(namespace: str, request: dict) -> str:
+        """
+        Make the cache key of a request.
+
+        Args:
+            namespace (str): Namespace of the request (e.g., API type and endpoint).
+            request (dict): Every argument of the request, including the model, messages, and sampling parameters.
+
+        Returns:
+            str: SHA-256 hex digest of the canonical JSON of the request.
+        """
+        payload = json.dumps([namespace, request], sort_keys=True, ensure_ascii=False, default=json_default)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached response.
+
+        Args:
+            key (str): Cache key of the request.
+
+        Returns:
+            Optional[Any]: The JSON-compatible cached response, or None if the request is not cached.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if not self.read_only:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+
+    def put(self, key: str, value: Any):
+        """
+        Store a response, evicting the least recently used responses if the cache exceeds its maximum size.
+        Nothing is stored in the replay (read-only) mode.
+
+        Args:
+            key (str): Cache key of the request.
+            value (Any): JSON-compatible response.
+        """
+        if self.read_only:
+            return
+
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode())
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time())
+            )
+            self._size += len(blob) - (old[0] if old else 0)
+            self.writes += 1
+
+            # Size-based eviction
+            while self._size > self.max_size:
+                rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 64").fetchall()
+                if not rows:
+                    break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in rows])
+                self._size -= sum(size for _, size in rows)
+                self.evictions += len(rows)
+
+
+    def clear(self):
+        """
+        Remove every cached response.
+        """
+        if self.read_only:
+            return
+
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the cache in this process.
+
+        Returns:
+            dict: Hit, miss, write, and eviction counts, hit rate, and the number and total size of the stored responses.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_mb': round(self._size / 1024 / 1024, 3),
+        }
+
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+
+# Process-wide response cache, which is consulted by every API client at call time
+_RESPONSE_CACHE: Optional[LLMResponseCache] = None
+
+
+
+def enable_response_cache(path: Union[str, Path],
+                          max_size_mb: float = 1024,
+                          read_only: bool = False) -> LLMResponseCache:
+    """
+    Enable the on-disk LLM response cache in this process.
+    Both the API clients (including those of the PatientSim agents) and the LangChain chat models used for tool calling are cached.
+
+    Args:
+        path (Union[str, Path]): Path of the SQLite database file.
+        max_size_mb (float, optional): Maximum total size of the stored responses in MB. Defaults to 1024.
+        read_only (bool, optional): Replay mode, which serves the cached responses without writing new ones. Defaults to False.
+
+    Returns:
+        LLMResponseCache: The enabled response cache.
+    """
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is not None:
+        _RESPONSE_CACHE.close()
+    _RESPONSE_CACHE = LLMResponseCache(path, max_size_mb, read_only)
+    set_llm_cache(LangChainResponseCache(_RESPONSE_CACHE))
+    log(f"LLM response cache enabled: {_RESPONSE_CACHE.path} ({'replay' if read_only else 'read-write'} mode)")
+    return _RESPONSE_CACHE
+
+
+
+def disable_response_cache():
+    """
+    Disable the LLM response cache in this process.
+    """
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is not None:
+        _RESPONSE_CACHE.close()
+    _RESPONSE_CACHE = None
+    set_llm_cache(None)
+
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Get the response cache of this process.
+
+    Returns:
+        Optional[LLMResponseCache]: The enabled response cache, or None if it is disabled.
+    """
+    return _RESPONSE_CACHE
+
+
+
+class _CachedMethod:
+    def __init__(self,
+                 method: Callable,
+                 namespace: str,
+                 response_cls: type,
+                 is_async: bool = False,
+                 cacheable: Callable[[Any], bool] = lambda response: True):
+        """
+        Wrapper of an SDK request method which serves the responses from the process-wide response cache,
+        and records (or replays) them to (or from) the LLM trace (see `h_adminsim.client.trace`).
+        Responses are cached with the latency of their API call, so that the responses served by the cache are recorded with it as well.
+
+        Args:
+            method (Callable): Bound SDK method (e.g., `OpenAI().chat.completions.create`).
+            namespace (str): Namespace of the requests used in the cache key.
+            response_cls (type): Pydantic response class of the method, used to restore the cached responses.
+            is_async (bool, optional): Whether the method returns an awaitable. Defaults to False.
+            cacheable (Callable[[Any], bool], optional): Whether a response may be stored (e.g., not an empty one). Defaults to always True.
+        """
+        self.method = method
+        self.namespace = namespace
+        self.response_cls = response_cls
+        self.cacheable = cacheable
+        self.is_async = is_async
+
+
+    def __call__(self, *args, **kwargs):
+        from h_adminsim.client.trace import get_trace_replayer
+        
+        if args or kwargs.get('stream'):
+            return self.method(*args, **kwargs)
+        if self.is_async:
+            return self.__acall(kwargs)
+
+        # Serve the recorded responses while replaying an LLM trace
+        replayer = get_trace_replayer()
+        if replayer is not None:
+            response, latency = replayer.next(self.namespace, kwargs)
+            time.sleep(latency)
+            return self.response_cls.model_validate(response)
+
+        cache, key, response, latency = self.__lookup(kwargs)
+        if response is None:
+            start = time.perf_counter()
+            response = self.method(**kwargs)
+            latency = time.perf_counter() - start
+            self.__store(cache, key, response, latency)
+        self.__record(kwargs, response, latency)
+        return response
+
+
+    async def __acall(self, kwargs: dict):
+        from h_adminsim.client.trace import get_trace_replayer
+        
+        # Serve the recorded responses while replaying an LLM trace
+        replayer = get_trace_replayer()
+        if replayer is not None:
+            response, latency = replayer.next(self.namespace, kwargs)
+            await asyncio.sleep(latency)
+            return self.response_cls.model_validate(response)
+
+        cache, key, response, latency = self.__lookup(kwargs)
+        if response is None:
+            start = time.perf_counter()
+            response = await self.method(**kwargs)
+            latency = time.perf_counter() - start
+            self.__store(cache, key, response, latency)
+        self.__record(kwargs, response, latency)
+        return response
+
+
+    def __lookup(self, kwargs: dict) -> Tuple[Optional[LLMResponseCache], Optional[str], Optional[Any], Optional[float]]:
+        """
+        Look up the response of a request in the response cache.
+
+        Args:
+            kwargs (dict): Arguments of the request.
+
+        Returns:
+            Tuple[Optional[LLMResponseCache], Optional[str], Optional[Any], Optional[float]]: The enabled response cache, cache key, 
+                                                                                              the cached response, and the latency of its original API call 
+                                                                                              (None if not cached).
+        """
+        cache = get_response_cache()
+        if cache is None:
+            return None, None, None, None
+        
+        key = cache.make_key(self.namespace, kwargs)
+        cached = cache.get(key)
+        if cached is None:
+            return cache, key, None, None
+        return cache, key, self.response_cls.model_validate(cached['response']), cached['latency']
+
+
+    def __store(self, cache: Optional[LLMResponseCache], key: Optional[str], response: Any, latency: float):
+        """
+        Store the response of a request which was not cached in the response cache if it is enabled.
+
+        Args:
+            cache (Optional[LLMResponseCache]): The enabled response cache.
+            key (Optional[str]): Cache key of the request.
+            response (Any): Response of the request.
+            latency (float): Latency of the API call in seconds.
+        """
+        if cache is not None and self.cacheable(response):
+            cache.put(key, {'response': response.model_dump(mode='json'), 'latency': latency})
+
+
+    def __record(self, kwargs: dict, response: Any, latency: float):
+        """
+        Record a request/response pair to the LLM trace if it is recorded.
+
+        Args:
+            kwargs (dict): Arguments of the request.
+            response (Any): Response of the request.
+            latency (float): Latency of the API call in seconds, including the calls whose responses were served by the cache.
+        """
+        from h_adminsim.client.trace import get_trace_recorder
+
+        recorder = get_trace_recorder()
+        if recorder is not None:
+            recorder.record(self.namespace, kwargs, response.model_dump(mode='json'), latency)
+
+
+
+def cache_sdk_client(client: Any) -> Any:
+    """
+    Route the chat requests of an OpenAI (or vLLM) or Google GenAI SDK client through the process-wide response cache.
+    The requests are sent as usual while the cache is disabled.
+
+    Args:
+        client (Any): `OpenAI`, `AsyncOpenAI`, or `genai.Client` instance. Other clients are returned unchanged.
+
+    Returns:
+        Any: The same client.
+    """
+    if getattr(client, '_h_adminsim_cached', False):
+        return client
+
+    if isinstance(client, (OpenAI, AsyncOpenAI)):
+        completions = client.chat.completions
+        completions.create = _CachedMethod(completions.create, f'openai:{client.base_url}', ChatCompletion, isinstance(client, AsyncOpenAI))
+    elif isinstance(client, genai.Client):
+        cacheable = lambda response: response.text is not None
+        for models, is_async in [(client.models, False), (client.aio.models, True)]:
+            models.generate_content = _CachedMethod(models.generate_content, 'genai', types.GenerateContentResponse, is_async, cacheable)
+    else:
+        return client
+
+    client._h_adminsim_cached = True
+    return client
+
+
+
+def dump_generations(generations: Sequence[Generation]) -> List[dict]:
+    """
+    Convert LangChain generations to JSON-compatible dictionaries.
+
+    Args:
+        generations (Sequence[Generation]): Generations of a LangChain model.
+
+    Returns:
+        List[dict]: JSON-compatible generations.
+    """
+    return [
+        {'message': message_to_dict(g.message), 'generation_info': g.generation_info} if isinstance(g, ChatGeneration) \
+            else {'text': g.text, 'generation_info': g.generation_info}
+        for g in generations
+    ]
+
+
+
+def load_generations(data: List[dict]) -> List[Generation]:
+    """
+    Restore LangChain generations from the dictionaries made by `dump_generations`.
+
+    Args:
+        data (List[dict]): JSON-compatible generations.
+
+    Returns:
+        List[Generation]: LangChain generations.
+    """
+    return [
+        ChatGeneration(message=messages_from_dict([g['message']])[0], generation_info=g['generation_info']) if 'message' in g \
+            else Generation(text=g['text'], generation_info=g['generation_info'])
+        for g in data
+    ]
+
+
+
+class LangChainResponseCache(BaseCache):
+    def __init__(self, cache: LLMResponseCache):
+        """
+        LangChain cache adapter of `LLMResponseCache`, which caches the chat models used by the tool calling agents.
+        The generations are cached with the latency of their chat model call, measured from the missed lookup to the update.
+
+        Args:
+            cache (LLMResponseCache): The response cache to store the generations.
+        """
+        self.cache = cache
+        self._local = threading.local()
+
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """
+        Look up the generations of a prompt.
+
+        Args:
+            prompt (str): Serialized prompt of the chat model.
+            llm_string (str): Serialized chat model and its parameters (e.g., model, temperature, and bound tools).
+
+        Returns:
+            Optional[Sequence[Generation]]: The cached generations, or None if the prompt is not cached.
+        """
+        entry = self.lookup_entry(prompt, llm_string)
+        return None if entry is None else entry[0]
+
+
+    def lookup_entry(self, prompt: str, llm_string: str) -> Optional[Tuple[List[Generation], float]]:
+        """
+        Look up the generations of a prompt and the latency of their original chat model call.
+
+        Args:
+            prompt (str): Serialized prompt of the chat model.
+            llm_string (str): Serialized chat model and its parameters.
+
+        Returns:
+            Optional[Tuple[List[Generation], float]]: The cached generations and the latency in seconds, or None if the prompt is not cached.
+        """
+        cached = self.cache.get(self.cache.make_key('langchain', {'prompt': prompt, 'llm': llm_string}))
+        if cached is None:
+            self._local.start = time.perf_counter()
+            return None
+        
+        return load_generations(cached['generations']), cached['latency']
+
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        """
+        Store the generations of a prompt.
+
+        Args:
+            prompt (str): Serialized prompt of the chat model.
+            llm_string (str): Serialized chat model and its parameters.
+            return_val (Sequence[Generation]): Generations of the chat model.
+        """
+        start = getattr(self._local, 'start', None)
+        self._local.start = None
+        self.cache.put(
+            self.cache.make_key('langchain', {'prompt': prompt, 'llm': llm_string}),
+            {'generations': dump_generations(return_val), 'latency': 0.0 if start is None else time.perf_counter() - start}
+        )
+
+
+    def clear(self, **kwargs):
+        """
+        Remove every cached response.
+        """
+        self.cache.clear()
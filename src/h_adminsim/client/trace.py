@@ -0,0 +1,403 @@
+import os
+import json
+import time
+import requests
+import threading
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Optional, Sequence, Tuple, Union
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+from langchain_core.globals import get_llm_cache, set_llm_cache
+
+from h_adminsim.utils import colorstr, log
+from h_adminsim.client.response_cache import LLMResponseCache, LangChainResponseCache, dump_generations, load_generations, json_default
+
+
+
+class LLMTraceRecorder:
+    def __init__(self, path: Union[str, Path]):
+        """
+        Recorder which appends every LLM request/response pair and its latency to a JSONL trace file.
+        Several processes (e.g., simulation workers) may append to the same trace file, since each record is appended with a single write.
+        Every record is tagged with the trace source of the process (e.g., the hospital being simulated, see `set_trace_source`),
+        so that the records of the processes are not mixed up when they are replayed.
+
+        Args:
+            path (Union[str, Path]): Path of the trace file.
+        """
+        self.path = str(path)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self.n_records = 0
+
+
+    def record(self, namespace: str, request: dict, response: Any, latency: Optional[float]):
+        """
+        Append a request/response pair to the trace.
+
+        Args:
+            namespace (str): Namespace of the request (e.g., API type and endpoint).
+            request (dict): Every argument of the request.
+            response (Any): JSON-compatible response.
+            latency (Optional[float]): Latency of the API call in seconds. For a response served by a cache, it is the latency of the original call.
+                                       None if it is unknown (e.g., served by a LangChain cache of another kind).
+        """
+        key = LLMResponseCache.make_key(namespace, request)
+        request = json.loads(json.dumps(request, ensure_ascii=False, default=json_default))
+        with self._lock:
+            line = json.dumps(
+                {
+                    'seq': self.n_records, 'pid': os.getpid(), 'source': get_trace_source(), 'namespace': namespace, 'key': key, 
+                    'latency': None if latency is None else round(latency, 6), 'request': request, 'response': response
+                },
+                ensure_ascii=False
+            )
+            os.write(self._fd, (line + '\n').encode())
+            self.n_records += 1
+
+
+    def close(self):
+        """
+        Close the trace file.
+        """
+        with self._lock:
+            os.close(self._fd)
+
+
+
+class LLMTraceReplayer:
+    def __init__(self, path: Union[str, Path], latency: Optional[Union[str, float]] = None, strict: bool = False):
+        """
+        Replayer which serves the recorded LLM responses of a trace file back in order, without any network access.
+        Only the records of the current trace source of the process (see `set_trace_source`) are served, so that several processes
+        (e.g., simulation workers of different hospitals) can replay the same trace file.
+        A request is served the oldest unused response recorded for the identical request. If the request was not recorded
+        (e.g., a prompt has changed), the next unused response of the same namespace in the recorded order is served instead,
+        or an error is raised in the strict mode.
+
+        Args:
+            path (Union[str, Path]): Path of the trace file made by `LLMTraceRecorder`.
+            latency (Optional[Union[str, float]], optional): Latency injected into every replayed response.
+                                                             'recorded' sleeps for the recorded latency (none if it is unknown), and a number sleeps for that many seconds.
+                                                             Defaults to None (no latency).
+            strict (bool, optional): If True, a request which was not recorded raises an error instead of being served in the recorded order. Defaults to False.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(colorstr("red", f"LLM trace not found: {path}"))
+        if isinstance(latency, str) and latency != 'recorded':
+            try:
+                latency = float(latency)
+            except ValueError:
+                raise ValueError(colorstr("red", f"Invalid latency: {latency}. It must be 'recorded', a number of seconds, or None."))
+
+        # Initialize
+        self.path = str(path)
+        self.latency = latency
+        self.strict = strict
+        self._lock = threading.Lock()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+
+        # Index variables
+        self._used = [False] * len(self.records)
+        self._by_key, self._by_namespace, self._by_source, self._cursor = dict(), dict(), dict(), dict()
+        for i, record in enumerate(self.records):
+            source = record.get('source')
+            self._by_key.setdefault((source, record['namespace'], record['key']), deque()).append(i)
+            self._by_namespace.setdefault((source, record['namespace']), list()).append(i)
+            self._by_source[source] = self._by_source.get(source, 0) + 1
+        self._sources = set()
+
+        # Statistics
+        self.served, self.mismatches = 0, 0
+
+
+    def next(self, namespace: str, request: dict) -> Tuple[Any, float]:
+        """
+        Get the recorded response of a request.
+
+        Args:
+            namespace (str): Namespace of the request.
+            request (dict): Every argument of the request.
+
+        Raises:
+            ValueError: If every recorded response of the namespace has already been served,
+                        or if the request was not recorded in the strict mode.
+
+        Returns:
+            Tuple[Any, float]: The recorded JSON-compatible response and the latency to be injected in seconds.
+        """
+        key = LLMResponseCache.make_key(namespace, request)
+        source = get_trace_source()
+        with self._lock:
+            self._sources.add(source)
+
+            # Identical request
+            queue = self._by_key.get((source, namespace, key))
+            while queue and self._used[queue[0]]:
+                queue.popleft()
+
+            # Fallback to the recorded order
+            if queue:
+                idx = queue.popleft()
+            else:
+                if self.strict:
+                    raise ValueError(colorstr("red", f"The request was not recorded in the trace for {namespace} (source: {source})."))
+                candidates = self._by_namespace.get((source, namespace), [])
+                cursor = self._cursor.get((source, namespace), 0)
+                while cursor < len(candidates) and self._used[candidates[cursor]]:
+                    cursor += 1
+                self._cursor[(source, namespace)] = cursor
+                if cursor >= len(candidates):
+                    raise ValueError(colorstr("red", f"No more recorded LLM responses in the trace for {namespace} (source: {source})."))
+                idx = candidates[cursor]
+                self.mismatches += 1
+
+            self._used[idx] = True
+            self.served += 1
+
+        record = self.records[idx]
+        if self.latency == 'recorded':
+            latency = record['latency'] or 0.0
+        else:
+            latency = float(self.latency) if self.latency else 0.0
+        return record['response'], latency
+
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the replay.
+
+        Returns:
+            dict: The number of the served, mismatched (served in the recorded order), and remaining responses of the trace sources replayed in this process.
+        """
+        return {
+            'served': self.served,
+            'mismatches': self.mismatches,
+            'remaining': sum(self._by_source.get(source, 0) for source in self._sources) - self.served,
+        }
+
+
+
+class LangChainTraceCache(BaseCache):
+    def __init__(self, inner: Optional[BaseCache] = None):
+        """
+        LangChain cache adapter which records (or replays) the chat model calls of the tool calling agents (`AgentExecutor`) to (or from) the LLM trace.
+
+        Args:
+            inner (Optional[BaseCache], optional): The LangChain cache which was set before (e.g., `LangChainResponseCache`).
+                                                   It is still used while recording. Defaults to None.
+        """
+        self.inner = inner
+        self._local = threading.local()
+
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """
+        Serve the recorded generations while replaying, or start timing the chat model call while recording.
+
+        Args:
+            prompt (str): Serialized prompt of the chat model.
+            llm_string (str): Serialized chat model and its parameters.
+
+        Returns:
+            Optional[Sequence[Generation]]: The generations, or None if the chat model has to be called.
+        """
+        request = {'prompt': prompt, 'llm': llm_string}
+        replayer = get_trace_replayer()
+        if replayer is not None:
+            response, latency = replayer.next('langchain', request)
+            time.sleep(latency)
+            return load_generations(response)
+
+        # Cache hits are recorded with the latency of the original chat model call
+        start = time.perf_counter()
+        if isinstance(self.inner, LangChainResponseCache):
+            generations, latency = self.inner.lookup_entry(prompt, llm_string) or (None, None)
+        else:
+            generations, latency = self.inner.lookup(prompt, llm_string) if self.inner is not None else None, None
+        if generations is not None:
+            self.__record(request, generations, latency)
+        else:
+            self._local.start = start
+        return generations
+
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        """
+        Record the generations of a chat model call.
+
+        Args:
+            prompt (str): Serialized prompt of the chat model.
+            llm_string (str): Serialized chat model and its parameters.
+            return_val (Sequence[Generation]): Generations of the chat model.
+        """
+        if get_trace_replayer() is not None:
+            return
+
+        if self.inner is not None:
+            self.inner.update(prompt, llm_string, return_val)
+        start = getattr(self._local, 'start', time.perf_counter())
+        self.__record({'prompt': prompt, 'llm': llm_string}, return_val, time.perf_counter() - start)
+
+
+    def clear(self, **kwargs):
+        """
+        Clear the inner cache. The trace file is kept.
+        """
+        if self.inner is not None:
+            self.inner.clear(**kwargs)
+
+
+    def __record(self, request: dict, generations: Sequence[Generation], latency: Optional[float]):
+        recorder = get_trace_recorder()
+        if recorder is not None:
+            recorder.record('langchain', request, dump_generations(generations), latency)
+
+
+
+# Process-wide LLM trace, which is consulted by every API client at call time
+_TRACE_RECORDER: Optional[LLMTraceRecorder] = None
+_TRACE_REPLAYER: Optional[LLMTraceReplayer] = None
+_TRACE_SOURCE: Optional[str] = None
+
+
+
+def enable_trace_recording(path: Union[str, Path]) -> LLMTraceRecorder:
+    """
+    Record every LLM request/response pair of this process to a trace file.
+    Both the API clients (including those of the PatientSim agents) and the LangChain chat models used for tool calling are recorded.
+
+    Args:
+        path (Union[str, Path]): Path of the trace file. New records are appended if it already exists.
+
+    Returns:
+        LLMTraceRecorder: The trace recorder.
+    """
+    global _TRACE_RECORDER
+    disable_trace()
+    _TRACE_RECORDER = LLMTraceRecorder(path)
+    set_llm_cache(LangChainTraceCache(get_llm_cache()))
+    log(f"LLM traffic is recorded to {_TRACE_RECORDER.path}")
+    return _TRACE_RECORDER
+
+
+
+def enable_trace_replay(path: Union[str, Path], latency: Optional[Union[str, float]] = None, strict: bool = False) -> LLMTraceReplayer:
+    """
+    Serve every LLM request of this process from a recorded trace file, without network access or API keys.
+    Placeholder API keys are set if they are not given, so that the API clients can be constructed offline.
+
+    Args:
+        path (Union[str, Path]): Path of the trace file made by `enable_trace_recording`.
+        latency (Optional[Union[str, float]], optional): Latency injected into every replayed response.
+                                                         'recorded' sleeps for the recorded latency, and a number sleeps for that many seconds.
+                                                         Defaults to None (no latency).
+        strict (bool, optional): If True, a request which was not recorded raises an error. Defaults to False.
+
+    Returns:
+        LLMTraceReplayer: The trace replayer.
+    """
+    global _TRACE_REPLAYER
+    disable_trace()
+    _TRACE_REPLAYER = LLMTraceReplayer(path, latency, strict)
+    set_llm_cache(LangChainTraceCache(get_llm_cache()))
+    for env_key in ['OPENAI_API_KEY', 'GOOGLE_API_KEY']:
+        os.environ.setdefault(env_key, 'replay')
+    log(f"LLM traffic is replayed from {_TRACE_REPLAYER.path} ({len(_TRACE_REPLAYER.records)} records)")
+    return _TRACE_REPLAYER
+
+
+
+def disable_trace():
+    """
+    Stop recording or replaying the LLM trace in this process.
+    """
+    global _TRACE_RECORDER, _TRACE_REPLAYER
+    if _TRACE_RECORDER is not None:
+        _TRACE_RECORDER.close()
+
+    llm_cache = get_llm_cache()
+    if isinstance(llm_cache, LangChainTraceCache):
+        set_llm_cache(llm_cache.inner)
+    _TRACE_RECORDER, _TRACE_REPLAYER = None, None
+
+
+
+def set_trace_source(source: Optional[str]):
+    """
+    Set the trace source of this process (e.g., the hospital being simulated, see `Simulator.run`).
+    Records are tagged with it while recording, and only the records of the same source are served while replaying.
+
+    Args:
+        source (Optional[str]): Name of the trace source.
+    """
+    global _TRACE_SOURCE
+    _TRACE_SOURCE = source
+
+
+
+def get_trace_source() -> Optional[str]:
+    """
+    Get the trace source of this process.
+
+    Returns:
+        Optional[str]: The trace source, or None if it is not set.
+    """
+    return _TRACE_SOURCE
+
+
+
+def get_trace_recorder() -> Optional[LLMTraceRecorder]:
+    """
+    Get the trace recorder of this process.
+
+    Returns:
+        Optional[LLMTraceRecorder]: The trace recorder, or None if the LLM traffic is not recorded.
+    """
+    return _TRACE_RECORDER
+
+
+
+def get_trace_replayer() -> Optional[LLMTraceReplayer]:
+    """
+    Get the trace replayer of this process.
+
+    Returns:
+        Optional[LLMTraceReplayer]: The trace replayer, or None if the LLM traffic is not replayed.
+    """
+    return _TRACE_REPLAYER
+
+
+
+@contextmanager
+def offline_model_list(model: str):
+    """
+    While replaying a trace, answer the model list requests of the vLLM clients (`GET {vllm_endpoint}/v1/models`) offline
+    with the given model, so that the clients can be constructed without a vLLM server. Otherwise, nothing is changed.
+
+    Args:
+        model (str): The model name to be listed.
+    """
+    if get_trace_replayer() is None:
+        yield
+        return
+
+    get = requests.get
+    def _get(url, *args, **kwargs):
+        if str(url).endswith('/v1/models'):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps({'data': [{'id': model}]}).encode()
+            return response
+        return get(url, *args, **kwargs)
+
+    requests.get = _get
+    try:
+        yield
+    finally:
+        requests.get = get
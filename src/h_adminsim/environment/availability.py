@@ -0,0 +1,286 @@
+import copy
+import bisect
+from decimal import Decimal, getcontext
+from typing import Optional, Iterator
+
+from h_adminsim.utils.time_utils import TimeGrid, HospitalClock
+from h_adminsim.utils.common_utils import hour_to_hhmmss
+
+
+
+class AvailabilityIndex:
+    """
+    Bitmap-backed availability index of a single hospital.
+
+    Each doctor keeps one integer bitmap per date over the hospital segment grid, where a set bit marks an occupied segment.
+    The bitmaps are built once from the doctor information and then updated incrementally whenever an appointment is booked or cancelled.
+    """
+    def __init__(self, grid: TimeGrid, clock: HospitalClock):
+
+        # Initialize
+        getcontext().prec = 10
+        self.grid = grid
+        self.clock = clock
+        self._TIME_UNIT = grid.interval_hour
+        self._SEGMENT_N = grid.segment_n
+        self._FULL_MASK = (1 << self._SEGMENT_N) - 1
+
+        # Segment tables
+        self._segment_seconds = [self.clock.hour_to_seconds(hour) for hour in grid.segment_start_hours]
+        self._segment_hhmmss = [hour_to_hhmmss(hour) for hour in grid.segment_start_hours]
+
+        # Index variables
+        self._source = None
+        self.occupied = dict()
+        self.slot_length = dict()
+        self.department = dict()
+
+
+    def is_synced(self, doctor_information: Optional[dict] = None) -> bool:
+        """
+        Check whether the index was built from the given doctor information.
+
+        Args:
+            doctor_information (Optional[dict], optional): Doctor information to compare with. If not given,
+                                                           only checks whether the index was built at all. Defaults to None.
+
+        Returns:
+            bool: True if the index reflects the given doctor information.
+        """
+        if doctor_information is None:
+            return self._source is not None
+        return self._source is doctor_information
+
+
+    def sync(self, doctor_information: dict) -> 'AvailabilityIndex':
+        """
+        Build the index from the doctor information only if it has not been built from the same object yet.
+
+        Args:
+            doctor_information (dict): Dictionary of doctor data including their existing schedules.
+                                       Each key is a doctor's name, and each value includes a 'schedule' field.
+
+        Returns:
+            AvailabilityIndex: The synchronized index itself.
+        """
+        if not self.is_synced(doctor_information):
+            self.build(doctor_information)
+        return self
+
+
+    def build(self, doctor_information: dict):
+        """
+        Build the bitmaps of all doctors from scratch.
+
+        Args:
+            doctor_information (dict): Dictionary of doctor data including their existing schedules. Both the raw doctor
+                                       information and the department-filtered one (i.e., with `outpatient_duration`) are supported.
+        """
+        self._source = doctor_information
+        self.occupied, self.slot_length, self.department = dict(), dict(), dict()
+
+        for doctor, info in doctor_information.items():
+            duration = info['outpatient_duration'] if 'outpatient_duration' in info else 1 / info['capacity_per_hour']
+            self.slot_length[doctor] = int(Decimal(str(duration)) / Decimal(str(self._TIME_UNIT)))
+            self.department[doctor] = info.get('department')
+            self.occupied[doctor] = {date: self.to_bitmap(info['schedule'][date]) for date in sorted(info['schedule'].keys())}
+
+
+    def copy(self) -> 'AvailabilityIndex':
+        """
+        Copy the index, so that the copy can be rebuilt or updated without affecting this one.
+
+        Returns:
+            AvailabilityIndex: The copied index.
+        """
+        index = copy.copy(self)
+        index.occupied = {doctor: dict(bitmaps) for doctor, bitmaps in self.occupied.items()}
+        index.slot_length = dict(self.slot_length)
+        index.department = dict(self.department)
+        return index
+
+
+    def to_bitmap(self, schedule: list[list[float]]) -> int:
+        """
+        Convert a list of time ranges into an occupied segment bitmap.
+
+        Args:
+            schedule (list[list[float]]): A list of [start, end] time ranges in hours.
+
+        Returns:
+            int: Bitmap whose i-th bit is set when the i-th segment is occupied.
+        """
+        bitmap = 0
+        for time_range in schedule:
+            st, tr = self.grid.to_segment_range(time_range)
+            if tr > st:
+                bitmap |= ((1 << (tr - st)) - 1) << st
+        return bitmap
+
+
+    def book(self, doctor: str, date: str, time_range: list[float]):
+        """
+        Mark a newly booked time range as occupied.
+
+        Args:
+            doctor (str): Doctor name.
+            date (str): Date of the appointment (YYYY-MM-DD).
+            time_range (list[float]): [start, end] time range of the appointment in hours.
+        """
+        self.occupied[doctor][date] |= self.to_bitmap([time_range])
+
+
+    def release(self, doctor: str, date: str, schedule: list[list[float]]):
+        """
+        Refresh the bitmap of a single date after a time range has been removed from the doctor's schedule.
+
+        Args:
+            doctor (str): Doctor name.
+            date (str): Date of the cancelled appointment (YYYY-MM-DD).
+            schedule (list[list[float]]): The remaining time ranges of the doctor on that date.
+        """
+        self.occupied[doctor][date] = self.to_bitmap(schedule)
+
+
+    def doctors(self, department: Optional[str] = None) -> list[str]:
+        """
+        Get the doctors in the index.
+
+        Args:
+            department (Optional[str], optional): If given, only doctors in this department are returned. Defaults to None.
+
+        Returns:
+            list[str]: Doctor names.
+        """
+        if department is None:
+            return list(self.occupied.keys())
+        return [doctor for doctor, dept in self.department.items() if dept == department]
+
+
+    def dates(self, doctor: str) -> list[str]:
+        """
+        Get the working dates of a doctor in ascending order.
+
+        Args:
+            doctor (str): Doctor name.
+
+        Returns:
+            list[str]: Sorted dates (YYYY-MM-DD).
+        """
+        return list(self.occupied[doctor].keys())
+
+
+    def start_bitmap(self, 
+                     doctor: str, 
+                     date: str, 
+                     from_segment: int = 0, 
+                     head_only: bool = False) -> int:
+        """
+        Get a bitmap of feasible start segments, i.e., segments from which the doctor's whole outpatient duration is free.
+
+        Args:
+            doctor (str): Doctor name.
+            date (str): Target date (YYYY-MM-DD).
+            from_segment (int, optional): Start segments earlier than this one are ignored. Defaults to 0.
+            head_only (bool, optional): If True, only the first segment of each free run is kept. Defaults to False.
+
+        Returns:
+            int: Bitmap whose i-th bit is set when an appointment can start at the i-th segment.
+        """
+        free = ~self.occupied[doctor][date] & self._FULL_MASK
+        starts = free
+        for i in range(1, self.slot_length[doctor]):
+            starts &= free >> i
+        if head_only:
+            starts &= ~(free << 1)
+        return (starts >> from_segment) << from_segment
+
+
+    def earliest_start(self, 
+                       doctor: str, 
+                       date: str, 
+                       from_segment: int = 0, 
+                       head_only: bool = False) -> Optional[int]:
+        """
+        Get the earliest feasible start segment of a doctor on the given date.
+
+        Args:
+            doctor (str): Doctor name.
+            date (str): Target date (YYYY-MM-DD).
+            from_segment (int, optional): Start segments earlier than this one are ignored. Defaults to 0.
+            head_only (bool, optional): If True, only the first segment of each free run is considered. Defaults to False.
+
+        Returns:
+            Optional[int]: The earliest start segment, or None if no slot is available.
+        """
+        starts = self.start_bitmap(doctor, date, from_segment, head_only)
+        if not starts:
+            return None
+        return (starts & -starts).bit_length() - 1
+
+
+    def iter_starts(self, doctor: str, date: str, from_segment: int = 0) -> Iterator[int]:
+        """
+        Iterate over the feasible start segments of a doctor on the given date in ascending order.
+
+        Args:
+            doctor (str): Doctor name.
+            date (str): Target date (YYYY-MM-DD).
+            from_segment (int, optional): Start segments earlier than this one are ignored. Defaults to 0.
+
+        Yields:
+            int: Feasible start segment.
+        """
+        starts = self.start_bitmap(doctor, date, from_segment)
+        while starts:
+            lowest = starts & -starts
+            yield lowest.bit_length() - 1
+            starts ^= lowest
+
+
+    def first_segment_after(self, date: str, current_timestamp: int) -> Optional[int]:
+        """
+        Get the first segment on the given date that starts strictly after the current time.
+
+        Args:
+            date (str): Target date (YYYY-MM-DD).
+            current_timestamp (int): Current hospital time in epoch seconds.
+
+        Returns:
+            Optional[int]: The first segment index, or None if the whole date has already passed.
+        """
+        elapsed = current_timestamp - self.clock.date_to_epoch(date)
+        if elapsed < 0:
+            return 0
+        segment = bisect.bisect_right(self._segment_seconds, elapsed)
+        return segment if segment < self._SEGMENT_N else None
+
+
+    def segment_to_hour(self, segment: int) -> float:
+        """
+        Convert a start segment into its start time in hours.
+
+        Args:
+            segment (int): Segment index.
+
+        Returns:
+            float: Start time in hours.
+        """
+        return self.grid.segment_start_hours[segment]
+
+
+    def segment_to_iso(self, date: str, segment: int, utc_offset: Optional[str] = None) -> str:
+        """
+        Convert a start segment on the given date into an ISO 8601 time string.
+
+        Args:
+            date (str): Date (YYYY-MM-DD).
+            segment (int): Segment index.
+            utc_offset (Optional[str], optional): UTC offset in '+HH:MM' or '-HH:MM' format. Defaults to no offset.
+
+        Returns:
+            str: ISO 8601 formatted datetime string.
+        """
+        if utc_offset:
+            return f'{date}T{self._segment_hhmmss[segment]}{utc_offset}'
+        return f'{date}T{self._segment_hhmmss[segment]}'
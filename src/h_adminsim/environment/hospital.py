@@ -1,13 +1,17 @@
+import copy
 import time
 import random
-from copy import deepcopy
+import threading
 from decimal import getcontext
 from datetime import timedelta
-from typing import Union, Tuple, Optional
+from typing import Union, Optional
 
-from h_adminsim.task.fhir_manager import FHIRManager
+from h_adminsim.task.fhir_manager import FHIRManager, FHIRWriteQueue
+from h_adminsim.environment.availability import AvailabilityIndex
+from h_adminsim.environment.schedule_store import PatientScheduleStore, WaitingList
 from h_adminsim.utils import log, colorstr
-from h_adminsim.utils.fhir_utils import get_all_doctor_info
+from h_adminsim.utils.fhir_utils import get_all_doctor_info, get_hospital_tag_param, sanitize_id
+from h_adminsim.utils.time_utils import HospitalClock, get_time_grid
 from h_adminsim.utils.common_utils import (
     iso_to_date,
     iso_to_hour,
@@ -16,10 +20,7 @@ from h_adminsim.utils.common_utils import (
     get_utc_offset,
     str_to_datetime,
     datetime_to_str,
-    compare_iso_time,
     exponential_backoff,
-    generate_random_iso_time_between,
-    convert_time_list_to_merged_time,
 )
 
 
@@ -29,15 +30,21 @@ class HospitalEnvironment:
                  agent_test_data: dict,
                  fhir_url: Optional[str] = None,
                  fhir_max_connection_retries: int = 5,
-                 start_day_before: float = 3):
+                 start_day_before: float = 3,
+                 fhir_manager: Optional[FHIRManager] = None,
+                 fhir_reconcile_interval: int = 10,
+                 fhir_write_behind: bool = False):
         
-        # FHIR manager
-        self.fhir_manager = FHIRManager(fhir_url) if fhir_url else None
+        # FHIR manager (shared with the other components if given)
+        self.fhir_manager = fhir_manager if fhir_manager is not None else (FHIRManager(fhir_url) if fhir_url else None)
+        self.fhir_write_queue = FHIRWriteQueue(self.fhir_manager, on_failure=self.__on_fhir_write_failure) \
+            if fhir_write_behind and self.fhir_manager is not None else None
         
         # Basic
         getcontext().prec = 10
         self._epsilon = 1e-6
         self.max_retries = fhir_max_connection_retries
+        self.fhir_reconcile_interval = fhir_reconcile_interval
         self._days_before = start_day_before
         self.HOSPITAL_NAME = agent_test_data.get('metadata').get('hospital_name')
         self._START_DATE = agent_test_data.get('metadata').get('start_date')
@@ -51,23 +58,72 @@ class HospitalEnvironment:
         
         # Time setting
         self._utc_offset = get_utc_offset(_country_code)
+        self.clock = HospitalClock(self._utc_offset)
         self.current_time = get_iso_time(
             time_hour=random.uniform(max(0, self._START_HOUR - 6), max(0, self._START_HOUR - self._epsilon)),
             date=datetime_to_str(str_to_datetime(self._START_DATE) - timedelta(days=self._days_before), "%Y-%m-%d"),
             utc_offset=self._utc_offset
         )
         self.avg_gap = self.__calculate_max_time_increment()
+        self._avg_gap_seconds = int(timedelta(hours=self.avg_gap).total_seconds())
+
+        # Availability index of the doctor schedules
+        self.time_grid = get_time_grid(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
+        self.availability = AvailabilityIndex(self.time_grid, self.clock)
         
         # Misc.
-        self.patient_schedules = list()
-        self.waiting_list = list()
+        self.patient_schedules = PatientScheduleStore(self.clock)
+        self.waiting_list = WaitingList()
+        self.freed_slots = list()
         self.first_verbose_flag = True
 
         # Cache variables
+        self._department_view_source = None
+        self._department_view_cache = dict()
         self._fhir_practitioner_cache = None
         self._fhir_practitionerrole_cache = None
         self._fhir_schedule_cache = None
         self._fhir_slot_cache = None
+        self._fhir_tag_filter = None
+        self._fhir_appointment_cache = None
+        self._fhir_last_updated = None
+        self._fhir_read_count = 0
+        self._fhir_cache_dirty = False
+        self._fhir_cache_lock = threading.Lock()
+
+
+    @property
+    def current_time(self) -> str:
+        """
+        Current hospital time in ISO 8601 format.
+        The time is internally kept as integer epoch seconds (i.e., `current_timestamp`).
+
+        Returns:
+            str: ISO 8601 formatted datetime string with the hospital UTC offset.
+        """
+        return self._current_time_iso
+    
+
+    @current_time.setter
+    def current_time(self, iso_time: str):
+        self.current_timestamp = self.clock.from_iso(iso_time)
+
+
+    @property
+    def current_timestamp(self) -> int:
+        """
+        Current hospital time in epoch seconds.
+
+        Returns:
+            int: Epoch seconds.
+        """
+        return self._current_timestamp
+    
+
+    @current_timestamp.setter
+    def current_timestamp(self, epoch: int):
+        self._current_timestamp = epoch
+        self._current_time_iso = self.clock.to_iso(epoch)
 
 
     def __calculate_max_time_increment(self) -> float:
@@ -77,19 +133,86 @@ class HospitalEnvironment:
         Returns:
             float: The average time gap (in hours) between patients.
         """
-        st = str_to_datetime(get_iso_time(self._START_HOUR, self._START_DATE, self._utc_offset))
-        tr = str_to_datetime(get_iso_time(self._END_HOUR, self._END_DATE, self._utc_offset))
-        total_hours = (tr - st).total_seconds() / 3600
+        st = self.clock.to_epoch(self._START_HOUR, self._START_DATE)
+        tr = self.clock.to_epoch(self._END_HOUR, self._END_DATE)
+        total_hours = (tr - st) / 3600
         avg_gap = total_hours / self._PATIENT_NUM
         return avg_gap
 
 
+    def __use_fhir_tag_filter(self) -> bool:
+        """
+        Check once whether the FHIR server keeps the hospital tags, i.e., whether a tagged Practitioner of this hospital exists.
+
+        Returns:
+            bool: True if the hospital `_tag` can be used as a search parameter.
+        """
+        if self._fhir_tag_filter is None:
+            tag_param = get_hospital_tag_param(self.HOSPITAL_NAME)
+            self._fhir_tag_filter = len(next(self.fhir_manager.iter_all('Practitioner', count=1, verbose=False, params={'_tag': tag_param}), [])) > 0
+            if not self._fhir_tag_filter:
+                log(f'No FHIR resources are tagged with {tag_param}. Resources are filtered on the client side.', level='warning')
+        return self._fhir_tag_filter
+
+
+    def read_hospital_resources(self, resource_types: Union[list[str], dict[str, Optional[dict]]]) -> dict[str, list[dict]]:
+        """
+        Read the FHIR resources of this hospital only, fetching the resource types concurrently.
+        The hospital `_tag` is pushed down to the server as a search parameter, so that the resources of the other hospitals are not downloaded.
+        If the server has no tagged Practitioner of this hospital (e.g., resources uploaded without `meta.tag`), 
+        every resource is read and filtered by the hospital ID prefix on the client side instead.
+
+        Args:
+            resource_types (Union[list[str], dict[str, Optional[dict]]]): FHIR resource types to read (e.g., ['Practitioner', 'Slot']),
+                                                                           or additional search parameters of each resource type 
+                                                                           (e.g., {'Schedule': {'actor': ['Practitioner/a', 'Practitioner/b']}}).
+
+        Returns:
+            dict[str, list[dict]]: List of bundle entry dicts of each resource type.
+        """
+        id_prefix = f'{sanitize_id(self.HOSPITAL_NAME)}-'
+        tag_param = get_hospital_tag_param(self.HOSPITAL_NAME)
+        
+        if not isinstance(resource_types, dict):
+            resource_types = {resource_type: None for resource_type in resource_types}
+        queries = {resource_type: dict(params or {}) for resource_type, params in resource_types.items()}
+        if self.__use_fhir_tag_filter():
+            for query in queries.values():
+                query['_tag'] = tag_param
+        
+        resources = self.fhir_manager.read_many(queries, verbose=False)
+        return {
+            resource_type: [x for x in entries if x['resource']['id'].startswith(id_prefix)] 
+                for resource_type, entries in resources.items()
+        }
+
+
+    def reset_fhir(self, resource_types: Optional[list[str]] = None):
+        """
+        Delete the simulation FHIR resources of this hospital only, so that several simulations can share a FHIR server.
+        The deletion is scoped by the hospital `_tag` (if the server keeps the tags) and the hospital ID prefix.
+
+        Args:
+            resource_types (Optional[list[str]], optional): FHIR resource types to delete. If None, Appointment and Patient resources are deleted. Defaults to None.
+        """
+        self.flush_fhir()
+        self.fhir_manager.reset(
+            ['Appointment', 'Patient'] if resource_types is None else resource_types,
+            params={'_tag': get_hospital_tag_param(self.HOSPITAL_NAME)} if self.__use_fhir_tag_filter() else None,
+            id_prefix=f'{sanitize_id(self.HOSPITAL_NAME)}-',
+            verbose=False,
+        )
+        self._fhir_appointment_cache, self._fhir_last_updated = None, None
+
+
     def get_general_doctor_info_from_fhir(self, use_cache: bool = True) -> dict:
         """
         Build a doctor information dictionary from FHIR resources for simulation.
+        Appointments created or deleted through `update_fhir` and `delete_fhir` are applied to the local cache immediately,
+        and the cache is reconciled with the server by a `_lastUpdated` delta query every `fhir_reconcile_interval` calls.
 
         Args:
-            use_cache (bool): If True, reuse cached FHIR resources if available. Defaults to True.
+            use_cache (bool): If True, reuse cached FHIR resources if available. Otherwise, every resource is read from the server again. Defaults to True.
 
         Returns:
             dict: doctor_information (dict): Dictionary of doctor data including their existing schedules.
@@ -99,7 +222,6 @@ class HospitalEnvironment:
             log('Build doctor information from the FHIR resources..')
             self.first_verbose_flag = False
 
-        hospital_id = self.HOSPITAL_NAME.replace('_', '')
         cache_ready = all([
             self._fhir_practitioner_cache,
             self._fhir_practitionerrole_cache,
@@ -108,34 +230,66 @@ class HospitalEnvironment:
         ])
         
         if not use_cache or not cache_ready:
-            self._fhir_practitioner_cache = [
-                x for x in self.fhir_manager.read_all('Practitioner', verbose=False)
-                if hospital_id in x['resource']['id']
-            ]
-            self._fhir_practitionerrole_cache = [
-                x for x in self.fhir_manager.read_all('PractitionerRole', verbose=False)
-                if hospital_id in x['resource']['id']
-            ]
-            self._fhir_schedule_cache = [
-                x for x in self.fhir_manager.read_all('Schedule', verbose=False)
-                if hospital_id in x['resource']['id']
-            ]
-            self._fhir_slot_cache = [
-                x for x in self.fhir_manager.read_all('Slot', verbose=False)
-                if hospital_id in x['resource']['id']
-            ]
-
-        # Get Appointment resources from the FHIR server
+            resources = self.read_hospital_resources(['Practitioner', 'PractitionerRole', 'Schedule', 'Slot'])
+            self._fhir_practitioner_cache = resources['Practitioner']
+            self._fhir_practitionerrole_cache = resources['PractitionerRole']
+            self._fhir_schedule_cache = resources['Schedule']
+            self._fhir_slot_cache = resources['Slot']
+
+        # Appointment resources are kept by a write-through cache and are reconciled with the FHIR server only periodically
+        self.__drop_dirty_fhir_cache()
+        if not use_cache or self._fhir_appointment_cache is None:
+            self.__sync_fhir_appointments(full=True)
+        else:
+            self._fhir_read_count += 1
+            if self.fhir_reconcile_interval > 0 and self._fhir_read_count % self.fhir_reconcile_interval == 0:
+                self.__sync_fhir_appointments()
+        self.fhir_appointment = list(self._fhir_appointment_cache.values())
+
+        # Convert resources regardless of whether they came from cache or fresh read
+        doctor_information = get_all_doctor_info(
+            self._fhir_practitioner_cache,
+            self._fhir_practitionerrole_cache,
+            self._fhir_schedule_cache,
+            self._fhir_slot_cache,
+            self.fhir_appointment,
+            **{'start': self._START_HOUR, 'end': self._END_HOUR, 'interval': self._TIME_UNIT}
+        )
+        return doctor_information
+    
+
+    def __sync_fhir_appointments(self, full: bool = False):
+        """
+        Reconcile the local Appointment cache with the FHIR server.
+        A delta sync reads only the appointments updated since the last known `meta.lastUpdated`,
+        and falls back to a full sync if the number of cached appointments does not match the valid patient schedules.
+
+        Args:
+            full (bool, optional): If True, read every appointment of the hospital again. Defaults to False.
+        """
+        valid_len = len(self.patient_schedules) - self.patient_schedules.count_status('cancelled')
+        self.flush_fhir()
+        
+        # Delta sync
+        if not full and self._fhir_appointment_cache is not None and self._fhir_last_updated is not None:
+            params = {'_lastUpdated': f'ge{self._fhir_last_updated}'}
+            for entry in self.read_hospital_resources({'Appointment': params})['Appointment']:
+                self.__cache_fhir_appointment(entry['resource'])
+            if len(self._fhir_appointment_cache) == valid_len:
+                return
+            log(f"Mismatch in appointment count after the delta sync: expected {valid_len}, got {len(self._fhir_appointment_cache)}", level='warning')
+
+        # Full sync
         # NOTE: Sometimes, a FHIR resource is accessed before it gets updated, so the operation is performed with a retry flag 
         retry_count = 0
         while 1:
             try:
-                self.fhir_appointment = [
-                    x for x in self.fhir_manager.read_all('Appointment', verbose=False)
-                    if hospital_id in x['resource']['id']
-                ]
-                valid_len = len(list(filter(lambda x: x['status'] != 'cancelled', self.patient_schedules)))
-                assert len(self.fhir_appointment) == valid_len, f"Mismatch in appointment count: expected {valid_len}, got {len(self.fhir_appointment)}"
+                self._fhir_appointment_cache, self._fhir_last_updated = dict(), None
+                for entry in self.read_hospital_resources(['Appointment'])['Appointment']:
+                    self.__cache_fhir_appointment(entry['resource'])
+                assert len(self._fhir_appointment_cache) == valid_len, f"Mismatch in appointment count: expected {valid_len}, got {len(self._fhir_appointment_cache)}"
+                if self.fhir_write_queue is not None:
+                    self.fhir_write_queue.mark_existing('Appointment', list(self._fhir_appointment_cache.keys()))
                 break
             except AssertionError as e:
                 if retry_count >= self.max_retries:
@@ -147,17 +301,19 @@ class HospitalEnvironment:
                 retry_count += 1
                 continue
 
-        # Convert resources regardless of whether they came from cache or fresh read
-        doctor_information = get_all_doctor_info(
-            self._fhir_practitioner_cache,
-            self._fhir_practitionerrole_cache,
-            self._fhir_schedule_cache,
-            self._fhir_slot_cache,
-            self.fhir_appointment,
-            **{'start': self._START_HOUR, 'end': self._END_HOUR, 'interval': self._TIME_UNIT}
-        )
-        return doctor_information
-    
+
+    def __cache_fhir_appointment(self, resource: dict):
+        """
+        Put an Appointment resource into the local cache and keep the latest `meta.lastUpdated` of the server.
+
+        Args:
+            resource (dict): FHIR Appointment resource.
+        """
+        self._fhir_appointment_cache[resource['id']] = {'resource': resource}
+        last_updated = resource.get('meta', {}).get('lastUpdated')
+        if last_updated and (self._fhir_last_updated is None or str_to_datetime(last_updated) > str_to_datetime(self._fhir_last_updated)):
+            self._fhir_last_updated = last_updated
+
 
     def get_doctor_schedule(self,
                             doctor_information: Optional[dict] = None,
@@ -177,68 +333,6 @@ class HospitalEnvironment:
         Returns:
             dict: Filtered doctor scheduling information.
         """
-        def __build_single_doctor_schedule(practitioner_role: dict) -> Tuple[str, dict]:
-            """
-            Build scheduling information for a single doctor.
-
-            Args:
-                practitioner_role (dict): A FHIR PractitionerRole resource for a doctor, already filtered by department.
-
-            Returns:
-                Tuple[str, dict]: Doctor name and his (or her) information dictionary containing the constructed scheduling information.
-            """
-            schedule, appointments = dict(), list()
-            practitioner_id = practitioner_role['practitioner']['reference']
-            practitioner = self.fhir_manager.read('Practitioner', practitioner_id.split('/')[-1], verbose=False).json()
-            practitioner_schedule_id = self.fhir_manager.read_all('Schedule', params={'actor': practitioner_id}, verbose=False)[0]['resource']['id']
-            fixed_slots = [slot['resource'] for slot in self.fhir_manager.read_all('Slot', params={'schedule': f'Schedule/{practitioner_schedule_id}'}, verbose=False)]
-
-            # Append fixed schedules of a doctor
-            for slot in fixed_slots:
-                date = iso_to_date(slot['start'])
-                schedule.setdefault(date, [])
-                if slot['status'] != 'free':
-                    schedule[date].append([iso_to_hour(slot['start']), iso_to_hour(slot['end'])])
-                
-                # Get all appointments related to this slot
-                appointment_resources = self.fhir_manager.read_all('Appointment', params={'slot': f'Slot/{slot["id"]}'}, verbose=False)
-                if len(appointment_resources) > 0:
-                    appointments.append(appointment_resources[0]['resource'])
-            
-            # Merge fixed schedule times
-            for date, time_list in schedule.items():
-                schedule[date] = convert_time_list_to_merged_time(
-                    time_list=sort_schedule(time_list),
-                    start=self._START_HOUR,
-                    end=self._END_HOUR,
-                    interval=self._TIME_UNIT
-                )
-
-            # Append patient appointments of a doctor
-            for appointment in appointments:
-                date = iso_to_date(appointment['start'])
-                schedule.setdefault(date, [])
-                schedule[date].append([iso_to_hour(appointment['start']), iso_to_hour(appointment['end'])])            
-            
-            # Collect doctor's information
-            name = f"{practitioner['name'][0]['prefix'][0]} {practitioner['name'][0]['given'][0]} {practitioner['name'][0]['family']}"
-            department = practitioner_role['specialty'][0]['text']
-            specialty = {
-                'name': practitioner_role['specialty'][0]['coding'][0]['display'],
-                'code': practitioner_role['specialty'][0]['coding'][0]['code']
-            }
-            capacity_attributes = {attr['text']: attr['coding'][0]['display'] for attr in practitioner_role['characteristic']}
-            workload = f"{round(self.booking_num[name] / int(capacity_attributes['capacity']) * 100, 2)}%"
-            outpatient_duration = 1 / int(capacity_attributes['capacity_per_hour'])
-            information = {
-                'department': department,
-                'specialty': specialty,
-                'schedule': sort_schedule(schedule),
-                'workload': workload,
-                'outpatient_duration': outpatient_duration
-            } 
-            return name, information
-
         filtered_doctor_information = {'doctor': {}}
 
         # Get filtered doctor information directly from FHIR
@@ -248,35 +342,191 @@ class HospitalEnvironment:
                 self.first_verbose_flag = False
             
             # Get doctors belonging to the department
-            params={"specialty:text": department}
-            practitioner_roles = [resource['resource'] for resource in self.fhir_manager.read_all('PractitionerRole', params=params, verbose=False)]
-
-            for practitioner_role in practitioner_roles:
-                doctor_name, doctor_schedule = __build_single_doctor_schedule(practitioner_role)
-                filtered_doctor_information['doctor'][doctor_name] = doctor_schedule
+            practitioner_roles = self.read_hospital_resources({'PractitionerRole': {'specialty:text': department}})['PractitionerRole']
+            practitioner_refs = [x['resource']['practitioner']['reference'] for x in practitioner_roles]
+
+            # Set-based retrieval of the related resources, which are joined in memory
+            if len(practitioner_refs):
+                resources = self.read_hospital_resources({
+                    'Practitioner': {'_id': [ref.split('/')[-1] for ref in practitioner_refs]},
+                    'Schedule': {'actor': practitioner_refs},
+                    'Appointment': {'actor': practitioner_refs},
+                })
+                schedule_refs = [f"Schedule/{x['resource']['id']}" for x in resources['Schedule']]
+                slots = self.read_hospital_resources({'Slot': {'schedule': schedule_refs}})['Slot'] if len(schedule_refs) else list()
+                doctor_information = get_all_doctor_info(
+                    resources['Practitioner'],
+                    practitioner_roles,
+                    resources['Schedule'],
+                    slots,
+                    resources['Appointment'],
+                    **{'start': self._START_HOUR, 'end': self._END_HOUR, 'interval': self._TIME_UNIT}
+                )
+                
+                # Collect doctor's information
+                for doctor_name, info in doctor_information.items():
+                    filtered_doctor_information['doctor'][doctor_name] = {
+                        'department': info['department'],
+                        'specialty': info['specialty'],
+                        'schedule': info['schedule'],
+                        'workload': f"{round(self.booking_num[doctor_name] / info['capacity'] * 100, 2)}%",
+                        'outpatient_duration': 1 / info['capacity_per_hour']
+                    }
         
         # Get filtered doctor information from the simulation data
         else:
-            for k, v in doctor_information.items():
-                if v['department'] == department:
-                    tmp_schedule = deepcopy(v)
-                    del tmp_schedule['capacity_per_hour'], tmp_schedule['capacity'], tmp_schedule['gender'], tmp_schedule['telecom'], tmp_schedule['birthDate']
-                    tmp_schedule['workload'] = f"{round(self.booking_num[k] / v['capacity'] * 100, 2)}%"
-                    tmp_schedule['outpatient_duration'] = 1 / v['capacity_per_hour']
-                    filtered_doctor_information['doctor'][k] = tmp_schedule
-
+            self.availability.sync(doctor_information)
+            filtered_doctor_information = self.__get_department_view(doctor_information, department)
 
         # Whether express more details in the built schedules
         if express_detail:
-            for _, info in filtered_doctor_information['doctor'].items():
-                info['schedule'] = {
-                    date: [{'start': s[0], 'end': s[1]} for s in schedule]
-                    for date, schedule in info['schedule'].items()
+            filtered_doctor_information = {
+                'doctor': {
+                    k: {
+                        **info,
+                        'schedule': {
+                            date: [{'start': s[0], 'end': s[1]} for s in schedule]
+                            for date, schedule in info['schedule'].items()
+                        }
+                    } for k, info in filtered_doctor_information['doctor'].items()
                 }
+            }
         
         return filtered_doctor_information
     
 
+    def __get_department_view(self, doctor_information: dict, department: Optional[str]) -> dict:
+        """
+        Get the department view of the simulation doctor data, which is built once and cached until the next booking or cancellation.
+        Each doctor entry is a shallow projection that shares its schedules with `doctor_information`, so the view must be treated as read-only.
+
+        Args:
+            doctor_information (dict): Simulation doctor data.
+            department (Optional[str]): Target department name.
+
+        Returns:
+            dict: Filtered doctor scheduling information.
+        """
+        if self._department_view_source is not doctor_information:
+            self._department_view_source = doctor_information
+            self._department_view_cache = dict()
+
+        if department not in self._department_view_cache:
+            filtered_doctor_information = {'doctor': {}}
+            for k, v in doctor_information.items():
+                if v['department'] == department:
+                    tmp_schedule = {key: value for key, value in v.items() if key not in ['capacity_per_hour', 'capacity', 'gender', 'telecom', 'birthDate']}
+                    tmp_schedule['workload'] = f"{round(self.booking_num[k] / v['capacity'] * 100, 2)}%"
+                    tmp_schedule['outpatient_duration'] = 1 / v['capacity_per_hour']
+                    filtered_doctor_information['doctor'][k] = tmp_schedule
+            self._department_view_cache[department] = filtered_doctor_information
+        
+        return self._department_view_cache[department]
+    
+
+    def invalidate_department_views(self):
+        """
+        Invalidate the cached department views after the doctor schedules or booking numbers are changed.
+        """
+        self._department_view_cache = dict()
+    
+
+    def snapshot(self) -> 'HospitalEnvironment':
+        """
+        Make a read-only view of the current environment for a patient simulated concurrently with others (see `Simulator`).
+        The view shares the patient schedules, the waiting list, the booking numbers, and the FHIR manager with the environment,
+        while it owns the current time, the availability index, and the caches that are lazily built during a simulation,
+        so that those caches are never shared across threads. Every change must be committed to the environment itself, not to the view.
+
+        Returns:
+            HospitalEnvironment: The view of the environment.
+        """
+        view = copy.copy(self)
+        view.availability = self.availability.copy()
+        view._department_view_source = None
+        view._department_view_cache = dict()
+        if self._fhir_appointment_cache is not None:
+            view._fhir_appointment_cache = dict(self._fhir_appointment_cache)
+        return view
+
+
+    def build_availability(self, doctor_information: dict) -> AvailabilityIndex:
+        """
+        Build a standalone availability index on the hospital segment grid.
+        This is used for doctor information that is not maintained by the environment (e.g., rebuilt from FHIR resources).
+
+        Args:
+            doctor_information (dict): Dictionary of doctor data including their existing schedules.
+
+        Returns:
+            AvailabilityIndex: A newly built availability index.
+        """
+        return AvailabilityIndex(self.time_grid, self.clock).sync(doctor_information)
+
+
+    def add_doctor_schedule(self, 
+                            doctor_information: dict, 
+                            doctor: str, 
+                            date: str, 
+                            time_range: list[float]):
+        """
+        Add a booked time range to the doctor's schedule and reflect it on the availability index.
+
+        Args:
+            doctor_information (dict): Dictionary of doctor data including their existing schedules.
+            doctor (str): Doctor name.
+            date (str): Date of the appointment (YYYY-MM-DD).
+            time_range (list[float]): [start, end] time range of the appointment in hours.
+        """
+        schedule_list = doctor_information[doctor]['schedule'][date]
+        schedule_list.append(time_range)
+        schedule_list.sort()
+        self.invalidate_department_views()
+        if self.availability.is_synced(doctor_information):
+            self.availability.book(doctor, date, time_range)
+
+
+    def remove_doctor_schedule(self, 
+                               doctor_information: dict, 
+                               doctor: str, 
+                               date: str, 
+                               time_range: list[float]):
+        """
+        Remove a time range from the doctor's schedule and reflect it on the availability index.
+
+        Args:
+            doctor_information (dict): Dictionary of doctor data including their existing schedules.
+            doctor (str): Doctor name.
+            date (str): Date of the appointment (YYYY-MM-DD).
+            time_range (list[float]): [start, end] time range of the appointment in hours.
+        """
+        schedule_list = doctor_information[doctor]['schedule'][date]
+        schedule_list.remove(time_range)  # In-place logic
+        self.invalidate_department_views()
+        if self.availability.is_synced(doctor_information):
+            self.availability.release(doctor, date, schedule_list)
+
+        # Freed-slot event for the reactive waiting list update
+        self.freed_slots.append({
+            'doctor': doctor,
+            'department': doctor_information[doctor].get('department'),
+            'date': date,
+            'segments': self.time_grid.to_segment_range(time_range),
+        })
+
+
+    def pop_freed_slots(self) -> list[dict]:
+        """
+        Get and clear the slots freed since the last call.
+
+        Returns:
+            list[dict]: Freed-slot events in order of occurrence. Each event has 'doctor', 'department', 'date',
+                        and 'segments' (the half-open segment index range of the freed time range) fields.
+        """
+        freed_slots, self.freed_slots = self.freed_slots, list()
+        return freed_slots
+
+
     def resume(self, agent_results: dict):
         """
         Resume the hospital environment from previously saved agent results.
@@ -298,12 +548,14 @@ class HospitalEnvironment:
                     if 'status' in pred and not pred['status'] == 'cancelled':
                         self.booking_num[pred['attending_physician']] += 1
             
-            self.waiting_list = sorted([(i, s) for i, s in enumerate(self.patient_schedules) if s['waiting_order'] >= 0], key=lambda x: x[1]['waiting_order'])
+            self.waiting_list.restore(enumerate(self.patient_schedules))
+            self.freed_slots = list()
             
             log(f"Resumed hospital time set to {self.current_time}.")
             log(f"Resumed hospital environment with {len(self.patient_schedules)} patient schedules.")
             log(f"Resumed waiting list with {len(self.waiting_list)} patient schedules.")
             log(f"Current booking numbers per doctor: {self.booking_num}")
+            self.invalidate_department_views()
 
             self.update_current_time()
             self.update_patient_status()
@@ -320,13 +572,11 @@ class HospitalEnvironment:
             verbose (bool, optional): Whether logging the each result or not. Defaults to False.
         """
         if idx >= 0:
-            for turn, (i, _) in enumerate(self.waiting_list):
-                if i == idx:
-                    self.pop_waiting_list(turn, verbose)
-                    break
-            self.patient_schedules[idx]['status'] = 'cancelled'
+            self.pop_waiting_list(idx, verbose)
+            self.patient_schedules.set_status(idx, 'cancelled')
             self.patient_schedules[idx]['last_updated_time'] = self.current_time
             self.booking_num[self.patient_schedules[idx]['attending_physician']] -= 1
+            self.invalidate_department_views()
             if verbose:
                 log(f'{colorstr("[CANCELLED]")}: {self.patient_schedules[idx]} schedule is cancelled.')
     
@@ -341,94 +591,149 @@ class HospitalEnvironment:
         """
         if idx >= 0:
             requested_schedule = self.patient_schedules[idx]
-            if all(requested_schedule != s[1] for s in self.waiting_list):
-                requested_schedule['waiting_order'] = len(self.waiting_list)
-                self.waiting_list.append((idx, requested_schedule))
+            if self.waiting_list.add(idx, requested_schedule):
                 if verbose:
                     log(f'{colorstr("[WAITING LIST ADDED]")}: {requested_schedule} schedule is appended to the waiting list.')
 
     
     def pop_waiting_list(self, idx: Union[list[int], int], verbose: bool = False):
         """
-        Pop a schedule to the waiting list.
+        Pop schedules from the waiting list.
 
         Args:
-            idx (Union[list[int], int]): The index list (or index) of the schedule to pop from the waiting list.
+            idx (Union[list[int], int]): The patient schedule index list (or index) to pop from the waiting list.
+                                         Schedules that are not in the waiting list are ignored.
             verbose (bool, optional): Whether logging the each result or not. Defaults to False.
         """
-        if isinstance(idx, int) and idx >= 0:
+        if isinstance(idx, int):
             idx = [idx]
 
-        if len(idx):
-            idx = sorted(idx, reverse=True)
-            for _id in idx:
-                schedule = self.waiting_list.pop(_id)
-                schedule[1]['waiting_order'] = -1
-                if verbose:
-                    log(f'{colorstr("[WAITING LIST POPPED]")}: {schedule[1]} schedule is popped from the waiting list.')
-        
-            for i, (_, schedule) in enumerate(self.waiting_list):
-                schedule['waiting_order'] = i
+        for _id in idx:
+            schedule = self.waiting_list.remove(_id)
+            if schedule is not None and verbose:
+                log(f'{colorstr("[WAITING LIST POPPED]")}: {schedule} schedule is popped from the waiting list.')
 
 
     def update_fhir(self, fhir_resources: dict):
         """
         Update resources on the FHIR server.
+        If the write-behind queue is enabled, the resources are only enqueued and written by its background worker.
 
         fhir_resources (dict): Dictionary where each key is a FHIR resource type (e.g., 'Appointment', 'Slot'),
                                and each value is the corresponding FHIR resource data to be updated.
         """
         # Update new FHIR resources
+        self.__drop_dirty_fhir_cache()
         for resource_type, resource in fhir_resources.items():
             if resource and resource_type.lower() in ['patient', 'appointment']:
-                self.fhir_manager.create(resource_type, resource, verbose=False)
+                if self.fhir_write_queue is not None:
+                    self.fhir_write_queue.put(resource_type, resource)
+                    if resource_type.lower() == 'appointment' and self._fhir_appointment_cache is not None:
+                        self._fhir_appointment_cache[resource['id']] = {'resource': resource}
+                    continue
+
+                response = self.fhir_manager.create(resource_type, resource, verbose=False)
+                
+                # Write-through to the local Appointment cache
+                if resource_type.lower() == 'appointment' and self._fhir_appointment_cache is not None:
+                    if response is not None and 200 <= response.status_code < 300:
+                        created = response.json()
+                        self.__cache_fhir_appointment(created if created.get('resourceType') == 'Appointment' else resource)
+                    else:
+                        self._fhir_appointment_cache = None     # Full sync at the next read
                 
 
     def delete_fhir(self, fhir_resources: dict):
         """
         Delete resources on the FHIR server.
+        If the write-behind queue is enabled, the deletions are only enqueued and sent by its background worker.
 
         Args:
             fhir_resources (dict): Dictionary where each key is a FHIR resource type (e.g., 'Appointment', 'Slot'),
                                    and each value is the corresponding FHIR resource data to be updated.
         """
         # Delete the existing FHIR resources
+        self.__drop_dirty_fhir_cache()
         for resource_type, resource in fhir_resources.items():
             if resource and resource_type.lower() in ['patient', 'appointment']:
-                self.fhir_manager.delete(resource_type, resource['id'], verbose=False)
-    
+                if self.fhir_write_queue is not None:
+                    self.fhir_write_queue.delete(resource_type, resource)
+                    if resource_type.lower() == 'appointment' and self._fhir_appointment_cache is not None:
+                        self._fhir_appointment_cache.pop(resource['id'], None)
+                    continue
+
+                # A 2xx response (including 204 without a body), 404, or 410 means that the resource is deleted
+                failed = self.fhir_manager.delete_many([{'resourceType': resource_type, 'id': resource['id']}], batch_size=1, max_retries=0, verbose=False)
+
+                # Write-through to the local Appointment cache
+                if resource_type.lower() == 'appointment' and self._fhir_appointment_cache is not None:
+                    if not failed:
+                        self._fhir_appointment_cache.pop(resource['id'], None)
+                    else:
+                        self._fhir_appointment_cache = None     # Full sync at the next read
+
+
+    def flush_fhir(self, close: bool = False):
+        """
+        Flush barrier of the FHIR write-behind queue. It blocks until every enqueued write has reached the FHIR server.
+        Nothing happens if the write-behind queue is disabled.
+
+        Args:
+            close (bool, optional): If True, also stop the background worker of the queue (e.g., at the end of the hospital simulation). Defaults to False.
+        """
+        if self.fhir_write_queue is not None:
+            if close:
+                self.fhir_write_queue.close()
+                self.fhir_write_queue = None
+            else:
+                self.fhir_write_queue.flush()
+            self.__drop_dirty_fhir_cache()
+
+
+    def __on_fhir_write_failure(self, failed: list[dict]):
+        """
+        Callback of the write-behind queue for the writes that could not reach the FHIR server.
+        It runs on the worker thread, so it only marks the local Appointment cache as dirty.
+        The cache is dropped by the main thread at its next flush, write, or read (see `__drop_dirty_fhir_cache`).
+
+        Args:
+            failed (list[dict]): FHIR resources that could not be written.
+        """
+        failed_ids = [f"{r['resourceType']}/{r['id']}" for r in failed]
+        log(f'FHIR write-behind failed for {failed_ids}', level='warning')
+        with self._fhir_cache_lock:
+            self._fhir_cache_dirty = True
+
+
+    def __drop_dirty_fhir_cache(self):
+        """
+        Drop the local Appointment cache if a write-behind write has failed since the last check,
+        so that it is fully synchronized with the server at the next read.
+        """
+        with self._fhir_cache_lock:
+            dirty, self._fhir_cache_dirty = self._fhir_cache_dirty, False
+        if dirty:
+            self._fhir_appointment_cache = None
+
 
     def update_current_time(self):
         """
         Update the current hospital time.
         """
-        min_iso_time = self.current_time
-        max_iso_time = (str_to_datetime(self.current_time) + timedelta(hours=self.avg_gap)).isoformat(timespec='seconds')
-        self.current_time = generate_random_iso_time_between(min_iso_time, max_iso_time)
+        if self._avg_gap_seconds <= 2 * self._epsilon:
+            raise ValueError(colorstr("red", "Time range is too small for the given epsilon to exclude both bounds."))
+        
+        # Exclude both bounds by starting from epsilon and ending at the average gap - epsilon
+        random_seconds = random.uniform(self._epsilon, self._avg_gap_seconds - self._epsilon)
+        self.current_timestamp += int(timedelta(seconds=random_seconds).total_seconds())
 
     
     def update_patient_status(self):
         """
         Update the status of each patient based on the current hospital time.
+        Only the newly added schedules and the schedules whose start or end time has been passed are updated.
         """
-        for schedule in self.patient_schedules:
-            if schedule.get('waiting_order', -1) < 0:
-                schedule['waiting_order'] = -1
-
-            if schedule.get('status') == 'cancelled':
-                continue
-
-            tmp_st_iso_time = get_iso_time(schedule['schedule'][0], date=schedule['date'], utc_offset=self._utc_offset)
-            tmp_tr_iso_time = get_iso_time(schedule['schedule'][-1], date=schedule['date'], utc_offset=self._utc_offset)
-
-            if compare_iso_time(self.current_time, tmp_tr_iso_time):
-                status = 'completed'
-            elif compare_iso_time(tmp_st_iso_time, self.current_time):
-                status = 'scheduled'
-            else: 
-                status = 'in_progress'
-            
-            schedule['status'] = status
+        self.patient_schedules.advance(self.current_timestamp)
 
 
     def reset_variable(self):
@@ -457,6 +762,7 @@ class HospitalEnvironment:
             self.patient_schedules.append(patient_schedule)
             self.update_patient_status()
             self.booking_num[patient_schedule['attending_physician']] += 1
+            self.invalidate_department_views()
 
         self.reset_variable()
  
\ No newline at end of file
@@ -5,7 +5,7 @@ import random
 from importlib import resources
 from patientsim import PatientAgent
 from decimal import Decimal, getcontext
-from typing import Tuple, Union, Optional
+from typing import Tuple, Union, Optional, Iterator
 from langchain.agents import AgentExecutor
 from langchain_core.messages import HumanMessage, AIMessage
 
@@ -31,8 +31,10 @@ class OPScehdulingSimulation:
                  preference_rejection_prob: float = 0.3,
                  preference_rejection_prob_decay: float = 0.5,
                  fhir_integration: bool = False,
+                 waiting_list_strategy: str = 'full',
                  schedule_rejection_prompt_path: Optional[str] = None,
-                 sanity_checker: Optional[SanityChecker] = None):
+                 sanity_checker: Optional[SanityChecker] = None,
+                 rng: Optional[random.Random] = None):
         
         # Initialize simulation parameters
         getcontext().prec = 10
@@ -47,8 +49,10 @@ class OPScehdulingSimulation:
         self.preference_rejection_prob = preference_rejection_prob
         self.preference_rejection_prob_decay = preference_rejection_prob_decay
         self.fhir_integration = fhir_integration
+        self.waiting_list_strategy = waiting_list_strategy
         self.rejection_system_prompt_template = self._init_prompt(schedule_rejection_prompt_path)
         self.sanity_checker = sanity_checker
+        self.rng = rng if rng is not None else random     # Per-patient random generator when patients are simulated concurrently
         self.rules = SchedulingRule(metadata, department_data, self.environment, self.fhir_integration)
         self.end_phrase = "Thank you."
         self._init_history()
@@ -90,8 +94,10 @@ class OPScehdulingSimulation:
         Args:
             verbose (bool, optional): Whether to print verbose output. Defaults to True.
         """
-        self.patient_agent.reset_history(verbose=verbose)
-        self.admin_staff_agent.reset_history(verbose=verbose)
+        if self.patient_agent is not None:
+            self.patient_agent.reset_history(verbose=verbose)
+        if self.admin_staff_agent is not None:
+            self.admin_staff_agent.reset_history(verbose=verbose)
 
 
     def _init_history(self):
@@ -231,7 +237,7 @@ class OPScehdulingSimulation:
             department=known_condition['department'],
             fhir_integration=self.fhir_integration,
         )
-        _schedule_client = self.admin_staff_agent.build_agent(
+        _schedule_client = None if self.scheduling_strategy == 'oracle' else self.admin_staff_agent.build_agent(
             rule=self.rules, 
             doctor_info=filtered_doctor_information,
             only_schedule_tool=True
@@ -265,9 +271,9 @@ class OPScehdulingSimulation:
             Optional[dict]: New schedule if the rescheduling available; otherwise None.
         """
         pred_doctor_name = list(new_schedule['schedule'].keys())[0]
-        old_iso_time = get_iso_time(original_schedule['schedule'][0], original_schedule['date'])
-        new_iso_time = get_iso_time(new_schedule['schedule'][pred_doctor_name]['start'], new_schedule['schedule'][pred_doctor_name]['date'])
-        if compare_iso_time(old_iso_time, new_iso_time):
+        old_timestamp = self.environment.clock.to_epoch(original_schedule['schedule'][0], original_schedule['date'])
+        new_timestamp = self.environment.clock.to_epoch(new_schedule['schedule'][pred_doctor_name]['start'], new_schedule['schedule'][pred_doctor_name]['date'])
+        if old_timestamp > new_timestamp:
             self.rules.cancel_schedule(idx, doctor_information, original_schedule)
             final_schedule = {
                 'patient': original_schedule['patient'],
@@ -288,11 +294,63 @@ class OPScehdulingSimulation:
         return None
     
 
+    def _could_take_slot(self, schedule: dict, freed_slot: dict) -> bool:
+        """
+        Check whether a waiting schedule could be moved to a freed slot.
+        The doctor and department are already matched by the waiting list index.
+
+        Args:
+            schedule (dict): A schedule in the waiting list.
+            freed_slot (dict): A freed-slot event of the hospital environment.
+
+        Returns:
+            bool: False if the freed slot can never give an earlier appointment that meets the patient's preference.
+        """
+        clock, grid = self.environment.clock, self.environment.time_grid
+        st, tr = freed_slot['segments']
+        freed_start = clock.to_epoch(grid.segment_start_hours[st], freed_slot['date'])
+        freed_end = clock.to_epoch(grid.segment_end_hours[tr - 1], freed_slot['date'])
+
+        # Already passed slot
+        if freed_end <= self.environment.current_timestamp:
+            return False
+        
+        # valid_from > date case (preference == 'date' case)
+        if schedule.get('preference') == 'date' and schedule.get('valid_from'):
+            if clock.from_iso(schedule['valid_from']) > clock.date_to_epoch(freed_slot['date']):
+                return False
+        
+        # A new appointment overlaps the freed slot and lasts as long as the cancelled one, so it starts after `2 * freed_start - freed_end`
+        return clock.to_epoch(schedule['schedule'][0], schedule['date']) > 2 * freed_start - freed_end
+
+
+    def _freed_slot_candidates(self) -> Iterator[Tuple[int, dict]]:
+        """
+        Iterate over the waiting schedules that could take the slots freed since the last update.
+        Slots freed while iterating (e.g., the original slots of the rescheduled patients) are handled in the following rounds.
+
+        Yields:
+            Tuple[int, dict]: (schedule index, schedule) pairs in waiting order.
+        """
+        freed_slots = self.environment.pop_freed_slots()
+        while len(freed_slots):
+            candidates = dict()
+            for freed_slot in freed_slots:
+                for idx, schedule in self.environment.waiting_list.candidates(freed_slot['doctor'], freed_slot['department']):
+                    if idx not in candidates and self._could_take_slot(schedule, freed_slot):
+                        candidates[idx] = schedule
+            
+            yield from sorted(candidates.items(), key=lambda x: x[1]['waiting_order'])
+            freed_slots = self.environment.pop_freed_slots()
+
+
     def automatic_waiting_list_update(self,
                                       doctor_information: dict,
                                       **kwargs):
         """
         Update waiting list availability automatically.
+        With the `full` strategy, every schedule in the waiting list is re-evaluated.
+        With the `reactive` strategy, only the schedules that could take one of the slots freed since the last update are re-evaluated.
 
         Args:
             doctor_information (Optional[dict], optional): A dictionary containing information about the doctor(s) involved, 
@@ -301,8 +359,14 @@ class OPScehdulingSimulation:
         Yields:
             dict: Updated (or not updated) doctor information and a result dictionary.
         """
-        for turn, (idx, original) in enumerate(self.environment.waiting_list):
-            if original['status'] == 'scheduled':
+        if self.waiting_list_strategy == 'reactive':
+            waiting_schedules = self._freed_slot_candidates()
+        else:
+            self.environment.pop_freed_slots()
+            waiting_schedules = self.environment.waiting_list
+
+        for idx, original in waiting_schedules:
+            if idx in self.environment.waiting_list and original['status'] == 'scheduled':
                 new_schedule = self._get_rescheduled_result(
                     known_condition=original,
                     doctor_information=doctor_information,
@@ -397,6 +461,10 @@ class OPScehdulingSimulation:
             department=department,
             fhir_integration=self.fhir_integration,
         )
+
+        # Ground-truth preference is directly mapped to the scheduling rule
+        if self.scheduling_strategy == 'oracle':
+            return self._oracle_scheduling(known_condition, filtered_doctor_information)
         
         # First, try to use the tool calling
         try:
@@ -472,6 +540,40 @@ class OPScehdulingSimulation:
         return prediction
     
 
+    def _oracle_scheduling(self, known_condition: dict, filtered_doctor_information: dict) -> dict:
+        """
+        Make an appointment by calling the scheduling rule that matches the ground-truth preference, without any LLM inference.
+        The result is the same as when the staff agent picks the right scheduling tool.
+
+        Args:
+            known_condition (dict): Patient conditions including 'department', 'preference', 'preferred_doctor', and 'valid_from'.
+            filtered_doctor_information (dict): Department-filtered doctor information.
+
+        Returns:
+            dict: Scheduling processed result. Its type is `text` when no slot is available.
+        """
+        department, preference = known_condition['department'], known_condition['preference']
+        try:
+            if preference == 'doctor':
+                candidates = self.rules.earliest_available(department, doctor=known_condition['preferred_doctor'], filtered_doctor_information=filtered_doctor_information)
+            elif preference == 'date':
+                candidates = self.rules.earliest_available(department, valid_from=known_condition['valid_from'], filtered_doctor_information=filtered_doctor_information)
+            else:
+                candidates = self.rules.earliest_available(department, filtered_doctor_information=filtered_doctor_information)
+        except KeyError:
+            candidates = list()
+
+        if not len(candidates):
+            return {'type': 'text', 'result': 'There are no available times.', 'raw': None}
+        
+        schedule = self.postprocessing(
+            strategy='tool_calling',
+            data=self.rules.to_tool_result(candidates),
+            filtered_doctor_information=filtered_doctor_information,
+        )
+        return {'type': 'tool', 'result': schedule, 'raw': None}
+
+
     def canceling(self, 
                   client: AgentExecutor,
                   patient_intention: str,
@@ -518,6 +620,80 @@ class OPScehdulingSimulation:
             raise TypeError(colorstr("red", "Error: Unexpected return type from canceling method."))
     
 
+    def _reschedule_identified(self,
+                               prediction: dict,
+                               doctor_information: Optional[dict] = None,
+                               **kwargs) -> dict:
+        """
+        Reschedule the appointment identified by the reschedule tool, or add it to the waiting list.
+
+        Args:
+            prediction (dict): Tool calling result of the reschedule tool.
+            doctor_information (Optional[dict], optional): A dictionary containing information about the doctor(s) involved, 
+                                                           including availability and other relevant details. Defaults to None.
+
+        Returns:
+            dict: Rescheduling processed result with a `tmp_flag` (`retrieve`, `schedule`, `reschedule`, or `waiting_list`).
+        """
+        # Step 1: Retrieved original schedule
+        original_schedule = prediction['result']['original_schedule']
+        if prediction['result']['result_dict']['status'][0] == False:  # Case of failure to identify the schedule
+            prediction['tmp_flag'] = 'retrieve'
+            return prediction
+
+        # Step 2: Try to reschedule based on the patient record (or the memo)
+        new_schedule = self._get_rescheduled_result(
+            known_condition=original_schedule,
+            doctor_information=doctor_information,
+            **kwargs
+        )
+        prediction['result']['new_schedule'] = new_schedule
+
+        # Sanity check
+        ## No GT case
+        if self.sanity_checker is not None:
+            status, status_code = self.sanity_checker.schedule_check(
+                prediction=new_schedule,
+                gt_patient_condition=original_schedule,
+                doctor_information=doctor_information,
+                environment=self.environment
+            )
+            if not status:
+                prediction['result']['result_dict']['pred'] = [new_schedule]
+                prediction['result']['result_dict']['status'] = [False]
+                prediction['result']['result_dict']['status_code'] = [STATUS_CODES['reschedule']['schedule'].format(status_code=status_code)]
+                prediction['tmp_flag'] = 'schedule'
+                return prediction
+            
+        # Step 3: Check the validity of the rescheduled result
+        try:
+            # Successful case
+            pred_idx = prediction['result']['result_dict']['pred'][0]['reschedule']
+            final_schedule = self._check_reschedule_validity(
+                idx=pred_idx,
+                new_schedule=new_schedule,
+                original_schedule=original_schedule,
+                doctor_information=doctor_information,
+            )
+            if final_schedule is not None:
+                prediction['result']['new_schedule'] = final_schedule
+                prediction['result']['result_dict']['pred'] = [final_schedule]
+                prediction['tmp_flag'] = 'reschedule'
+            else:
+                self.environment.add_waiting_list(pred_idx, True)
+                prediction['tmp_flag'] = 'waiting_list'
+        
+        except:
+            log('No sanity checker is available; an error occurred while parsing the prediction. Returning a failure result.', level='warning')
+            prediction['result']['result_dict']['pred'] = [new_schedule]
+            prediction['result']['result_dict']['status'] = [False]
+            prediction['result']['result_dict']['status_code'] = [STATUS_CODES['reschedule']['schedule'].format(status_code=STATUS_CODES['format'])]
+            prediction['tmp_flag'] = 'schedule'
+            return prediction
+
+        return prediction
+
+
     def rescheduling(self, 
                      client: AgentExecutor, 
                      patient_intention: str,
@@ -561,63 +737,7 @@ class OPScehdulingSimulation:
         
             # Successfully retrieve the original schedule -> return: dict
             else:
-                # Step 1: Retrieved original schedule
-                original_schedule = prediction['result']['original_schedule']
-                if prediction['result']['result_dict']['status'][0] == False:  # Case of failure to identify the schedule
-                    prediction['tmp_flag'] = 'retrieve'
-                    return prediction
-
-                # Step 2: Try to reschedule based on the patient record (or the memo)
-                new_schedule = self._get_rescheduled_result(
-                    known_condition=original_schedule,
-                    doctor_information=doctor_information,
-                    **kwargs
-                )
-                prediction['result']['new_schedule'] = new_schedule
-
-                # Sanity check
-                ## No GT case
-                if self.sanity_checker is not None:
-                    status, status_code = self.sanity_checker.schedule_check(
-                        prediction=new_schedule,
-                        gt_patient_condition=original_schedule,
-                        doctor_information=doctor_information,
-                        environment=self.environment
-                    )
-                    if not status:
-                        prediction['result']['result_dict']['pred'] = [new_schedule]
-                        prediction['result']['result_dict']['status'] = [False]
-                        prediction['result']['result_dict']['status_code'] = [STATUS_CODES['reschedule']['schedule'].format(status_code=status_code)]
-                        prediction['tmp_flag'] = 'schedule'
-                        return prediction
-                    
-                # Step 3: Check the validity of the rescheduled result
-                try:
-                    # Successful case
-                    pred_idx = prediction['result']['result_dict']['pred'][0]['reschedule']
-                    final_schedule = self._check_reschedule_validity(
-                        idx=pred_idx,
-                        new_schedule=new_schedule,
-                        original_schedule=original_schedule,
-                        doctor_information=doctor_information,
-                    )
-                    if final_schedule is not None:
-                        prediction['result']['new_schedule'] = final_schedule
-                        prediction['result']['result_dict']['pred'] = [final_schedule]
-                        prediction['tmp_flag'] = 'reschedule'
-                    else:
-                        self.environment.add_waiting_list(pred_idx, True)
-                        prediction['tmp_flag'] = 'waiting_list'
-                
-                except:
-                    log('No sanity checker is available; an error occurred while parsing the prediction. Returning a failure result.', level='warning')
-                    prediction['result']['result_dict']['pred'] = [new_schedule]
-                    prediction['result']['result_dict']['status'] = [False]
-                    prediction['result']['result_dict']['status_code'] = [STATUS_CODES['reschedule']['schedule'].format(status_code=STATUS_CODES['format'])]
-                    prediction['tmp_flag'] = 'schedule'
-                    return prediction
-
-                return prediction
+                return self._reschedule_identified(prediction, doctor_information, **kwargs)
 
         # Clarification message case -> return: str
         elif prediction['type'] == 'text':
@@ -658,6 +778,10 @@ class OPScehdulingSimulation:
         if not self.fhir_integration:
             assert doctor_information is not None, log(f"Doctor information must be provided if you don't use FHIR.", level="error")
 
+        # Rule-based simulation without LLM inference
+        if self.scheduling_strategy == 'oracle':
+            return self._oracle_scheduling_simulate(gt_data, staff_known_data, doctor_information)
+
         # Initialize agents and result dictionary
         self._init_agents(verbose=verbose)
         filtered_doctor_information = self.environment.get_doctor_schedule(
@@ -760,7 +884,7 @@ class OPScehdulingSimulation:
 
             # Preference rejection logic
             ## Rejection case
-            if random.random() < preference_reject_prob and i != len(gt_data) - 1:
+            if self.rng.random() < preference_reject_prob and i != len(gt_data) - 1:
                 preference_reject_prob *= self.preference_rejection_prob_decay
             ## Non-rejection case
             else:
@@ -770,6 +894,30 @@ class OPScehdulingSimulation:
                 break
 
         # Oranize the result
+        result_dict = self._organize_scheduling_result(gt_data[i], staff_known_data[i], pred_schedule, status, status_code)
+        log("Simulation completed.", color=True)
+        return doctor_information, result_dict
+
+
+    def _organize_scheduling_result(self,
+                                    gt_patient_condition: dict,
+                                    staff_known_condition: dict,
+                                    pred_schedule: Union[str, dict],
+                                    status: bool,
+                                    status_code: str) -> dict:
+        """
+        Organize the scheduling result of the last preference of the patient.
+
+        Args:
+            gt_patient_condition (dict): Ground-truth patient condition of the last preference.
+            staff_known_condition (dict): Patient information known to the staff agent at the last preference.
+            pred_schedule (Union[str, dict]): Predicted schedule.
+            status (bool): Sanity check status of the predicted schedule.
+            status_code (str): Sanity check status code of the predicted schedule.
+
+        Returns:
+            dict: A result dictionary.
+        """
         ## Defaults to failure case dictionary
         result_dict = {
             'gt': [gt_patient_condition],
@@ -784,15 +932,15 @@ class OPScehdulingSimulation:
                 pred_doctor_name = list(pred_schedule['schedule'].keys())[0]
                 schedule = pred_schedule['schedule'][pred_doctor_name]
                 prediction = {
-                    'patient': staff_known_data[i]['patient'],
+                    'patient': staff_known_condition['patient'],
                     'attending_physician': pred_doctor_name,
-                    'department': staff_known_data[i]['department'],
+                    'department': staff_known_condition['department'],
                     'date': schedule['date'],
                     'schedule': [schedule['start'], schedule['end']],
-                    'patient_intention': staff_known_data[i]['patient_intention'],
-                    'preference': gt_data[i].get('preference'),
-                    'preferred_doctor': gt_data[i].get('preferred_doctor'),
-                    'valid_from': gt_data[i].get('valid_from'),
+                    'patient_intention': staff_known_condition['patient_intention'],
+                    'preference': gt_patient_condition.get('preference'),
+                    'preferred_doctor': gt_patient_condition.get('preferred_doctor'),
+                    'valid_from': gt_patient_condition.get('valid_from'),
                     'last_updated_time': self.environment.current_time
                 }
                 result_dict['pred'] = [prediction]
@@ -800,11 +948,111 @@ class OPScehdulingSimulation:
             except:
                 result_dict['status_code'] = [STATUS_CODES['format']]
                 log('No sanity checker is available; an error occurred while parsing the prediction. Returning a failure result.', level='warning')
+        
+        return result_dict
 
-        log("Simulation completed.", color=True)
+
+    def _oracle_scheduling_simulate(self,
+                                    gt_data: dict,
+                                    staff_known_data: dict,
+                                    doctor_information: Optional[dict] = None) -> Tuple[dict, dict]:
+        """
+        Simulate the outpatient scheduling without patient and staff agents.
+        Each ground-truth preference is directly mapped to its scheduling rule, and the preference rejection logic is the same as the dialogue simulation.
+
+        Args:
+            gt_data (dict): Ground-truth patient condition(s) for each preference.
+            staff_known_data (dict): Patient information known to the staff agent at each preference.
+            doctor_information (Optional[dict], optional): A dictionary containing information about the doctor(s) involved, 
+                                                           including availability and other relevant details. Defaults to None.
+
+        Returns:
+            Tuple[dict, dict]: Doctor information and a result dictionary after scheduling a new appointment.
+        """
+        preference_reject_prob = 0.0 if len(gt_data) <= 1 else self.preference_rejection_prob
+        for i, (gt_patient_condition, staff_known_condition) in enumerate(zip(gt_data, staff_known_data)):
+            preference = gt_patient_condition['preference']
+            staff_known_condition.update({
+                'patient_intention': PREFERENCE_PHRASE_STAFF[preference] if preference != 'date' \
+                    else PREFERENCE_PHRASE_STAFF[preference].format(date=gt_patient_condition.get('valid_from'))
+            })
+            staff_response = self.scheduling(
+                None,
+                {**staff_known_condition, **{k: gt_patient_condition.get(k) for k in ['preference', 'preferred_doctor', 'valid_from']}},
+                doctor_information,
+            )
+            pred_schedule = staff_response['result']
+
+            # Sanity check
+            ## No GT case
+            if self.sanity_checker is None:
+                status, status_code = True, STATUS_CODES['correct']
+            ## GT existing case
+            else:
+                status, status_code = self.sanity_checker.schedule_check(
+                    prediction=pred_schedule,
+                    gt_patient_condition=gt_patient_condition,
+                    doctor_information=doctor_information,
+                    environment=self.environment
+                )
+
+            if not status:
+                break
+
+            # Preference rejection logic
+            if self.rng.random() < preference_reject_prob and i != len(gt_data) - 1:
+                preference_reject_prob *= self.preference_rejection_prob_decay
+            else:
+                break
+
+        result_dict = self._organize_scheduling_result(gt_data[i], staff_known_data[i], pred_schedule, status, status_code)
         return doctor_information, result_dict
 
     
+    def _oracle_request_simulate(self,
+                                 task: str,
+                                 gt_idx: int,
+                                 doctor_information: dict,
+                                 patient_schedules: list[dict],
+                                 **kwargs) -> Tuple[dict, dict]:
+        """
+        Simulate a cancellation or rescheduling request without patient and staff agents.
+        The ground-truth appointment is looked up and processed in the same way as the cancel and reschedule tools.
+
+        Args:
+            task (str): Request type. It must be either `cancel` or `reschedule`.
+            gt_idx (int): Ground-truth index of the requested appointment.
+            doctor_information (dict): A dictionary containing information about the doctor(s).
+            patient_schedules (list[dict]): List of patient appointment schedules.
+
+        Returns:
+            Tuple[dict, dict]: Updated doctor information and a result dictionary.
+        """
+        assert gt_idx is not None, log("Ground-truth schedule index must be provided for the `oracle` strategy.", level="error")
+
+        requested_schedule = patient_schedules[gt_idx]
+        index, result_dict = self.rules.identify_schedule(
+            task,
+            patient_schedules,
+            requested_schedule['patient'],
+            requested_schedule['attending_physician'],
+            requested_schedule['date'],
+            gt_idx
+        )
+        schedule = patient_schedules[index] if result_dict['status'][0] is not False else None
+
+        if task == 'cancel':
+            if schedule is not None:
+                doctor_information = self.rules.cancel_schedule(index, doctor_information, schedule)
+        else:
+            prediction = {'type': 'tool', 'result': {'original_schedule': schedule, 'result_dict': result_dict}, 'raw': None}
+            result_dict = self._reschedule_identified(prediction, doctor_information, **kwargs)['result']['result_dict']
+
+        result_dict['dialog'].append(preprocess_dialog(self.dialog_history[task]))
+        log("Simulation completed.", color=True)
+        return doctor_information, result_dict
+
+
     def canceling_simulate(self, 
                            gt_idx: Optional[int] = None,
                            doctor_information: Optional[dict] = None,
@@ -842,6 +1090,11 @@ class OPScehdulingSimulation:
         self._init_agents(verbose=verbose)
         patient_schedules = self.environment.patient_schedules if patient_schedules is None else patient_schedules
         doctor_information = self.environment.get_general_doctor_info_from_fhir() if self.fhir_integration else doctor_information
+
+        # Rule-based simulation without LLM inference
+        if self.scheduling_strategy == 'oracle':
+            return self._oracle_request_simulate('cancel', gt_idx, doctor_information, patient_schedules)
+        
         client = self.admin_staff_agent.build_agent(
             rule=self.rules, 
             doctor_info=doctor_information,
@@ -991,6 +1244,11 @@ class OPScehdulingSimulation:
         self._init_agents(verbose=verbose)
         patient_schedules = self.environment.patient_schedules if patient_schedules is None else patient_schedules
         doctor_information = self.environment.get_general_doctor_info_from_fhir() if self.fhir_integration else doctor_information
+
+        # Rule-based simulation without LLM inference
+        if self.scheduling_strategy == 'oracle':
+            return self._oracle_request_simulate('reschedule', gt_idx, doctor_information, patient_schedules, **staff_kwargs)
+        
         client = self.admin_staff_agent.build_agent(
             rule=self.rules, 
             doctor_info=doctor_information,
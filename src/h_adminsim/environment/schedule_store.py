@@ -0,0 +1,334 @@
+import heapq
+from collections import OrderedDict
+from typing import Optional, Iterable, Iterator, Tuple
+
+from h_adminsim.utils.time_utils import HospitalClock
+
+
+
+class PatientScheduleStore(list):
+    """
+    Append-only list of patient schedules with secondary indices.
+
+    The store behaves like the plain list it replaces (indexing, iteration, `len`, and `enumerate` are unchanged),
+    and additionally keeps schedule indices by status, by patient name, and by (doctor, date).
+    Status transitions (scheduled → in_progress → completed) are driven by two time-ordered heaps,
+    so that only the schedules whose start or end boundary has been crossed by the hospital clock are touched.
+    Statuses must be changed through `set_status` (or `advance`) to keep the indices consistent.
+    """
+    def __init__(self, clock: HospitalClock, schedules: Optional[Iterable[dict]] = None):
+        super().__init__()
+
+        # Initialize
+        self.clock = clock
+        self._last_advanced = None
+        self._pending = list()
+        self._start_heap = list()
+        self._end_heap = list()
+
+        # Index variables
+        self._by_status = dict()
+        self._by_patient = dict()
+        self._by_doctor_date = dict()
+
+        if schedules is not None:
+            self.extend(schedules)
+
+
+    def append(self, schedule: dict):
+        """
+        Append a patient schedule and register it to the indices.
+        Its status is evaluated at the next `advance` call.
+
+        Args:
+            schedule (dict): Patient schedule including 'patient', 'attending_physician', 'date', and 'schedule' fields.
+        """
+        idx = len(self)
+        super().append(schedule)
+        self._by_patient.setdefault(schedule['patient'].lower(), list()).append(idx)
+        self._by_doctor_date.setdefault((schedule['attending_physician'].lower(), schedule['date']), list()).append(idx)
+        if 'status' in schedule:
+            self._by_status.setdefault(schedule['status'], set()).add(idx)
+        self._pending.append(idx)
+
+
+    def extend(self, schedules: Iterable[dict]):
+        """
+        Append multiple patient schedules.
+
+        Args:
+            schedules (Iterable[dict]): Patient schedules.
+        """
+        for schedule in schedules:
+            self.append(schedule)
+
+
+    def set_status(self, idx: int, status: str):
+        """
+        Set the status of a schedule and update the status index.
+
+        Args:
+            idx (int): Index of the schedule.
+            status (str): New status.
+        """
+        schedule = self[idx]
+        if 'status' in schedule:
+            self._by_status.get(schedule['status'], set()).discard(idx)
+        schedule['status'] = status
+        self._by_status.setdefault(status, set()).add(idx)
+
+
+    def indices(self, status: str) -> list[int]:
+        """
+        Get the indices of the schedules with the given status in ascending order.
+
+        Args:
+            status (str): Target status (e.g., 'scheduled').
+
+        Returns:
+            list[int]: Sorted schedule indices.
+        """
+        return sorted(self._by_status.get(status, set()))
+
+
+    def count_status(self, status: str) -> int:
+        """
+        Count the schedules with the given status.
+
+        Args:
+            status (str): Target status (e.g., 'cancelled').
+
+        Returns:
+            int: The number of schedules.
+        """
+        return len(self._by_status.get(status, set()))
+
+
+    def by_patient(self, patient_name: str) -> list[int]:
+        """
+        Get the indices of the schedules of a patient (case-insensitive).
+
+        Args:
+            patient_name (str): Patient name.
+
+        Returns:
+            list[int]: Schedule indices in ascending order.
+        """
+        return list(self._by_patient.get(patient_name.lower(), list()))
+
+
+    def find(self,
+             patient_name: str,
+             doctor_name: str,
+             date: str,
+             status: str = 'scheduled') -> int:
+        """
+        Find the first schedule matching the patient, doctor (both case-insensitive), date, and status.
+
+        Args:
+            patient_name (str): Patient name.
+            doctor_name (str): Doctor name.
+            date (str): Date of the schedule (YYYY-MM-DD).
+            status (str, optional): Status of the schedule. Defaults to 'scheduled'.
+
+        Returns:
+            int: The index of the schedule, or -1 if not found.
+        """
+        patient_name = patient_name.lower()
+        for idx in self._by_doctor_date.get((doctor_name.lower(), date), list()):
+            schedule = self[idx]
+            if schedule['status'] == status and schedule['patient'].lower() == patient_name:
+                return idx
+        return -1
+
+
+    def __evaluate(self, idx: int, current_timestamp: int):
+        """
+        Evaluate the status of a schedule from scratch and register its upcoming transitions.
+
+        Args:
+            idx (int): Index of the schedule.
+            current_timestamp (int): Current hospital time in epoch seconds.
+        """
+        schedule = self[idx]
+        if schedule.get('waiting_order', -1) < 0:
+            schedule['waiting_order'] = -1
+
+        if schedule.get('status') == 'cancelled':
+            return
+
+        st = self.clock.to_epoch(schedule['schedule'][0], schedule['date'])
+        tr = self.clock.to_epoch(schedule['schedule'][-1], schedule['date'])
+
+        if current_timestamp > tr:
+            status = 'completed'
+        elif st > current_timestamp:
+            status = 'scheduled'
+            heapq.heappush(self._start_heap, (st, idx))
+            heapq.heappush(self._end_heap, (tr, idx))
+        else:
+            status = 'in_progress'
+            heapq.heappush(self._end_heap, (tr, idx))
+
+        self.set_status(idx, status)
+
+
+    def advance(self, current_timestamp: int):
+        """
+        Update the statuses of the schedules according to the current hospital time.
+        Newly appended schedules are evaluated once, and the others are changed only when the clock crosses their boundaries.
+        If the clock has moved backwards, every schedule is evaluated again.
+
+        Args:
+            current_timestamp (int): Current hospital time in epoch seconds.
+        """
+        if self._last_advanced is not None and current_timestamp < self._last_advanced:
+            self._start_heap, self._end_heap = list(), list()
+            self._pending = list(range(len(self)))
+        self._last_advanced = current_timestamp
+
+        # Newly appended schedules
+        pending, self._pending = self._pending, list()
+        for idx in pending:
+            self.__evaluate(idx, current_timestamp)
+
+        # scheduled → in_progress
+        while self._start_heap and not self._start_heap[0][0] > current_timestamp:
+            _, idx = heapq.heappop(self._start_heap)
+            if self[idx]['status'] == 'scheduled':
+                self.set_status(idx, 'in_progress')
+
+        # in_progress → completed
+        while self._end_heap and current_timestamp > self._end_heap[0][0]:
+            _, idx = heapq.heappop(self._end_heap)
+            if self[idx]['status'] == 'in_progress':
+                self.set_status(idx, 'completed')
+
+
+
+class WaitingList:
+    """
+    Waiting list of patient schedules keyed by schedule index.
+
+    Entries are kept in an ordered dict, so that adding, removing, and membership checks are O(1) regardless of the list length.
+    Each added schedule receives a monotonically increasing `waiting_order` that is written only once and reset to -1 on removal.
+    The values therefore keep the waiting order but are not contiguous.
+    Iteration yields (schedule index, schedule) tuples in waiting order, as the former list of tuples did,
+    over a snapshot of the entries so that schedules can be removed while iterating.
+    Entries are also indexed by department and, for doctor-preferring patients, by the preferred doctor,
+    so that only the patients who could take a freed slot are looked up (see `candidates`).
+    """
+    def __init__(self):
+
+        # Initialize
+        self._entries = OrderedDict()
+        self._next_order = 0
+
+        # Index variables
+        self._by_department = dict()
+        self._by_doctor = dict()
+
+
+    def add(self, idx: int, schedule: dict) -> bool:
+        """
+        Append a schedule to the end of the waiting list.
+
+        Args:
+            idx (int): Index of the schedule in the patient schedules.
+            schedule (dict): Patient schedule.
+
+        Returns:
+            bool: True if the schedule is newly added, False if it was already waiting.
+        """
+        if idx in self._entries:
+            return False
+        schedule['waiting_order'] = self._next_order
+        self._next_order += 1
+        self.__register(idx, schedule)
+        return True
+
+
+    def restore(self, schedules: Iterable[Tuple[int, dict]]):
+        """
+        Rebuild the waiting list from schedules with saved `waiting_order` values (e.g., when resuming a simulation).
+        Schedules whose `waiting_order` is negative are ignored, and the saved values are kept as they are.
+
+        Args:
+            schedules (Iterable[Tuple[int, dict]]): (schedule index, schedule) pairs.
+        """
+        self._entries, self._next_order = OrderedDict(), 0
+        self._by_department, self._by_doctor = dict(), dict()
+        for idx, schedule in sorted(schedules, key=lambda x: x[1].get('waiting_order', -1)):
+            if schedule.get('waiting_order', -1) >= 0:
+                self._next_order = schedule['waiting_order'] + 1
+                self.__register(idx, schedule)
+
+
+    def remove(self, idx: int) -> Optional[dict]:
+        """
+        Remove a schedule from the waiting list.
+
+        Args:
+            idx (int): Index of the schedule in the patient schedules.
+
+        Returns:
+            Optional[dict]: The removed schedule, or None if it was not waiting.
+        """
+        schedule = self._entries.pop(idx, None)
+        if schedule is not None:
+            self.__index_of(schedule).get(self.__index_key(schedule), set()).discard(idx)
+            schedule['waiting_order'] = -1
+        return schedule
+
+
+    def candidates(self, doctor: str, department: str) -> list[Tuple[int, dict]]:
+        """
+        Get the waiting schedules that could be moved to a slot of the given doctor, in waiting order.
+        These are the schedules of the same department without a doctor preference and
+        the schedules whose preferred doctor is the given doctor.
+
+        Args:
+            doctor (str): Doctor name of the freed slot.
+            department (str): Department of the doctor.
+
+        Returns:
+            list[Tuple[int, dict]]: (schedule index, schedule) pairs.
+        """
+        indices = self._by_department.get(department, set()) | self._by_doctor.get(doctor, set())
+        return sorted([(idx, self._entries[idx]) for idx in indices], key=lambda x: x[1]['waiting_order'])
+
+
+    def __register(self, idx: int, schedule: dict):
+        """
+        Append a schedule to the entries and the candidate indices.
+
+        Args:
+            idx (int): Index of the schedule in the patient schedules.
+            schedule (dict): Patient schedule.
+        """
+        self._entries[idx] = schedule
+        self.__index_of(schedule).setdefault(self.__index_key(schedule), set()).add(idx)
+
+
+    def __index_of(self, schedule: dict) -> dict:
+        return self._by_doctor if schedule.get('preference') == 'doctor' else self._by_department
+
+
+    @staticmethod
+    def __index_key(schedule: dict) -> str:
+        if schedule.get('preference') == 'doctor':
+            preferred_doctor = schedule.get('preferred_doctor')
+            return preferred_doctor if preferred_doctor and preferred_doctor != "Doesn't matter" else schedule['attending_physician']
+        return schedule.get('department')
+
+
+    def __contains__(self, idx: int) -> bool:
+        return idx in self._entries
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def __iter__(self) -> Iterator[Tuple[int, dict]]:
+        return iter(list(self._entries.items()))
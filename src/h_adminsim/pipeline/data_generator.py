@@ -6,11 +6,11 @@ from pathlib import Path
 from importlib import resources
 from typing import Optional, Union
 
-from h_adminsim.task.fhir_manager import FHIRManager
+from h_adminsim.task.fhir_manager import FHIRManager, UploadReport
 from h_adminsim.tools import DataSynthesizer, DataConverter, AgentDataBuilder
 from h_adminsim.utils import Information, colorstr, log
 from h_adminsim.utils.random_utils import random_uuid
-from h_adminsim.utils.filesys_utils import get_files, json_load
+from h_adminsim.utils.filesys_utils import iter_json_records
 
 
 
@@ -84,7 +84,8 @@ class DataGenerator:
     def build(self, 
               sanity_check: bool = True,
               convert_to_fhir: bool = False,
-              build_agent_data: bool = True) -> Information:
+              build_agent_data: bool = True,
+              fhir_output_format: str = 'json') -> Information:
         """
         Build the complete information bundle for the administrative simulation pipeline.
 
@@ -94,6 +95,8 @@ class DataGenerator:
                                               in the configured output directory. Defaults to False.
             build_agent_data (bool, optional): If True, generates additional derived data required for agent-based
                                                simulations (e.g., patient profiles, department assignments, task inputs). Defaults to True.
+            fhir_output_format (str, optional): File format of the converted FHIR resources, either `json` (one file per resource)
+                                                or `ndjson` (one file per resource type and hospital). Defaults to 'json'.
 
         Raises:
             Exception: Propagates any exception encountered during:
@@ -121,7 +124,7 @@ class DataGenerator:
         if convert_to_fhir:
             converter = DataConverter(self.config)
             try:
-                all_resource_list = converter(self.save_dir / 'fhir_data', sanity_check)
+                all_resource_list = converter(self.save_dir / 'fhir_data', sanity_check, fhir_output_format)
                 log(f"Data FHIR conversion completed successfully", color=True)
             except Exception as e:
                 log("Data FHIR conversion failed.", level='error')
@@ -149,44 +152,46 @@ class DataGenerator:
 
     def upload_to_fhir(self,
                        fhir_data_dir: str,
-                       fhir_url: Optional[str] = None):
+                       fhir_url: Optional[str] = None,
+                       fhir_manager: Optional[FHIRManager] = None,
+                       batch_size: int = 100,
+                       max_workers: int = 1):
         """
         Upload synthesized FHIR resources to the specified FHIR server.
+        Resources are grouped into `batch` Bundles of `batch_size` entries, and the failed entries are retried.
+        Resource types are uploaded in reference order (Practitioner → PractitionerRole/Schedule → Slot),
+        and the throughput, latency percentiles, and failures are logged at the end.
 
         Args:
-            fhir_data_dir (str): Directory containing FHIR resource JSON files (e.g., practitioner, practitionerrole, schedule, slot).
+            fhir_data_dir (str): Directory containing FHIR resource `.json` or `.ndjson` files (e.g., practitioner, practitionerrole, schedule, slot).
             fhir_url (Optional[str], optional): Base URL of the FHIR server. If not provided, the instance's default FHIR URL is used.
+            fhir_manager (Optional[FHIRManager], optional): Shared FHIR manager. If given, `fhir_url` is ignored. Defaults to None.
+            batch_size (int, optional): Number of resources per Bundle. If 1 or less, each resource is uploaded individually. Defaults to 100.
+            max_workers (int, optional): Maximum number of in-flight requests to the FHIR server. Defaults to 1.
         """
         # Initialize FHIR URL and manager
-        if not fhir_url:
-            fhir_url = self.fhir_url
-        assert fhir_url != None, log('')
-        
-        if not fhir_url.endswith('fhir'):
-            fhir_url = os.path.join(fhir_url, 'fhir')
+        if fhir_manager is None:
+            if not fhir_url:
+                fhir_url = self.fhir_url
+            assert fhir_url != None, log('')
+            
+            if not fhir_url.endswith('fhir'):
+                fhir_url = os.path.join(fhir_url, 'fhir')
 
-        fhir_manager = FHIRManager(fhir_url)
+            fhir_manager = FHIRManager(fhir_url)
 
         # FHIR resources
         fhir_data_dir = Path(fhir_data_dir)
         fhir_resources_dirs = [fhir_data_dir / resource for resource in ['practitioner', 'practitionerrole', 'schedule', 'slot']]
 
         # Upload resources to FHIR
+        resources = list()
         for path in fhir_resources_dirs:
-            files = get_files(path, ext='json')
-            error_files = list()
-
-            for file in files:
-                resource_data = json_load(file)
-                resource_type = resource_data.get('resourceType')
+            for resource_data in iter_json_records(path):
                 if 'id' not in resource_data:
                     resource_data['id'] = random_uuid(False)
-                
-                response = fhir_manager.create(resource_type, resource_data)
-                if 200 <= response.status_code < 300:
-                    log(f"Created {resource_type} with ID {response.json().get('id')}")
-                else:
-                    error_files.append(file)
-            
-            if len(error_files):
-                log(f'Error files during creating data: {error_files}', 'warning')
+                resources.append(resource_data)
+        
+        report = UploadReport()
+        fhir_manager.create_all(resources, batch_size=batch_size, max_workers=max_workers, report=report, verbose=False)
+        report.log()
@@ -2,9 +2,11 @@ import os
 import random
 import numpy as np
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 
 from h_adminsim.task.agent_task import *
 from h_adminsim.task.fhir_manager import FHIRManager
+from h_adminsim.client.trace import set_trace_source
 from h_adminsim.environment.hospital import HospitalEnvironment
 from h_adminsim.utils.filesys_utils import json_load, json_save_fast, get_files
 
@@ -18,35 +20,36 @@ class Simulator:
                  fhir_integration: bool = False,
                  fhir_url: Optional[str] = None,
                  fhir_max_connection_retries: int = 5,
-                 random_seed: int = 9999):
+                 random_seed: int = 9999,
+                 fhir_manager: Optional[FHIRManager] = None,
+                 fhir_write_behind: bool = False,
+                 patient_concurrency: int = 1):
         
         # Initialize
         self.simulation_start_day_before = simulation_start_day_before
         self.fhir_integration = fhir_integration
         self.fhir_url = fhir_url if self.fhir_integration else None
+        self.fhir_manager = None
+        if self.fhir_integration:
+            self.fhir_manager = fhir_manager if fhir_manager is not None else FHIRManager(self.fhir_url)
         self.fhir_max_connection_retries = fhir_max_connection_retries
+        self.fhir_write_behind = fhir_write_behind
+        self.patient_concurrency = max(1, patient_concurrency)
         self.task_queue, self.task_list = self._init_task(intake_task, scheduling_task)
         self.random_seed = random_seed
 
 
-    def __env_setup(self, random_seed: int, resume: bool):
+    def __env_setup(self, random_seed: int):
         """
         Initialize environment-level random seeds.
+        The FHIR resources of each hospital are reset when its simulation starts (see `HospitalEnvironment.reset_fhir`).
 
         Args:
             random_seed (int): Random seed.
-            resume (bool): Whether resumed simulation or not.
         """
         random.seed(random_seed)
         np.random.seed(random_seed)
 
-        if self.fhir_integration and not resume:
-            fhir_manager = FHIRManager(self.fhir_url)
-            appointment_entries = fhir_manager.read_all('Appointment')
-            patient_entries = fhir_manager.read_all('Patient')
-            fhir_manager.delete_all(appointment_entries, verbose=False)
-            fhir_manager.delete_all(patient_entries, verbose=False)
-
 
 
     def _init_task(self, 
@@ -137,6 +140,85 @@ class Simulator:
         return agent_simulation_data, agent_results, dialog_results, done_patients
 
     
+    @staticmethod
+    def append_result(task_name: str, gt: dict, result: dict, agent_results: dict, dialog_results: dict):
+        """
+        Append the result of a single patient to the results of a hospital.
+
+        Args:
+            task_name (str): Task name (e.g., 'intake' or 'schedule').
+            gt (dict): Ground truth data of the patient.
+            result (dict): Result dictionary of the task.
+            agent_results (dict): Results of the hospital.
+            dialog_results (dict): Intake dialogs of the hospital.
+        """
+        dialogs = result.pop('dialog')
+
+        # Append a single result 
+        agent_results.setdefault(task_name, {'gt': [], 'pred': [], 'status': [], 'status_code': [], 'trial': [], 'dialog': []})
+        for k in result:
+            agent_results[task_name][k] += result[k]
+        
+        if task_name == 'intake':
+            dialog_results[gt['patient']] = dialogs[0]
+        else:
+            agent_results[task_name]['dialog'] += dialogs
+
+
+    def __run_concurrently(self,
+                           agent_simulation_data: dict,
+                           agent_results: dict,
+                           dialog_results: dict,
+                           done_patients: dict,
+                           environment: HospitalEnvironment,
+                           verbose: bool = False):
+        """
+        Simulate the patients of a hospital in waves of `patient_concurrency` patients.
+        In each wave, the LLM dialogues of the patients are run concurrently on snapshots of the environment taken at the start of the wave,
+        and the results are then committed to the environment one by one in the original patient order.
+        A schedule that is no longer valid at its commit (e.g., its slot was taken by a preceding patient) is re-validated by the sanity checker
+        and simulated again on the current environment. Each patient uses its own random generator seeded by the simulation seed and the patient,
+        and the global random generator is used only by the commits, so that the results do not depend on the thread scheduling.
+
+        Args:
+            agent_simulation_data (dict): Agent test data of a hospital.
+            agent_results (dict): Results of the hospital.
+            dialog_results (dict): Intake dialogs of the hospital.
+            done_patients (dict): Patients that have already been processed for each task.
+            environment (HospitalEnvironment): Hospital environment.
+            verbose (bool, optional): Whether to print detailed logs during task execution. Defaults to False.
+        """
+        patients = agent_simulation_data['agent_data']
+        for task in self.task_queue:
+            task.setup_hospital(agent_simulation_data)
+        
+        with ThreadPoolExecutor(max_workers=self.patient_concurrency) as executor:
+            for st in range(0, len(patients), self.patient_concurrency):
+                wave = patients[st:st + self.patient_concurrency]
+                for task in self.task_queue:
+                    wave_data = [(gt, test_data) for gt, test_data in wave \
+                                 if not (task.name in done_patients and gt['patient'] in done_patients[task.name])]
+                    
+                    # Dialogue phase on the snapshots of the environment
+                    futures = [
+                        executor.submit(
+                            task.prepare,
+                            data_pair,
+                            agent_simulation_data,
+                            agent_results,
+                            environment.snapshot(),
+                            verbose,
+                            random.Random(f"{self.random_seed}-{task.name}-{data_pair[0]['patient']}"),
+                        ) for data_pair in wave_data
+                    ]
+                    contexts = [future.result() for future in futures]
+
+                    # Commit phase in the patient order
+                    for (gt, _), context in zip(wave_data, contexts):
+                        result = task.commit(context, agent_simulation_data, agent_results, environment, verbose)
+                        Simulator.append_result(task.name, gt, result, agent_results, dialog_results)
+
+    
     def run(self,
             simulation_data_path: str,
             output_dir: str,
@@ -155,7 +237,7 @@ class Simulator:
             Exception: Propagates any errors encountered during simulation or result saving.
         """
         # Initialize environment
-        self.__env_setup(self.random_seed, resume)
+        self.__env_setup(self.random_seed)
         
         # Load agent simulation data
         is_file = os.path.isfile(simulation_data_path)
@@ -173,36 +255,36 @@ class Simulator:
                     agent_simulation_data,
                     self.fhir_url,
                     self.fhir_max_connection_retries,
-                    self.simulation_start_day_before
+                    self.simulation_start_day_before,
+                    fhir_manager=self.fhir_manager,
+                    fhir_write_behind=self.fhir_write_behind,
                 )
                 basename = os.path.splitext(os.path.basename(path))[0]
                 save_path = os.path.join(output_dir, f'{basename}_result.json')
                 d_save_path = os.path.join(output_dir, f'{basename}_dialog.json')
+                set_trace_source(basename)      # LLM traces are recorded and replayed per hospital
                 log(f'{basename} simulation started..', color=True)
 
                 # Resume the results and the virtual hospital environment
                 if resume and os.path.exists(save_path):
                     agent_simulation_data, agent_results, dialog_results, done_patients = Simulator.resume_results(agent_simulation_data, save_path, d_save_path)
                     environment.resume(agent_results)
+                
+                # Delete the Patient and Appointment resources of this hospital only when starting a simulation
+                elif self.fhir_integration and not resume:
+                    environment.reset_fhir()
 
                 # Data per patient
-                for j, (gt, test_data) in enumerate(agent_simulation_data['agent_data']):
-                    for task in self.task_queue:
-                        if task.name in done_patients and gt['patient'] in done_patients[task.name]:
-                            continue
-
-                        result = task((gt, test_data), agent_simulation_data, agent_results, environment, verbose)
-                        dialogs = result.pop('dialog')
-
-                        # Append a single result 
-                        agent_results.setdefault(task.name, {'gt': [], 'pred': [], 'status': [], 'status_code': [], 'trial': [], 'dialog': []})
-                        for k in result:
-                            agent_results[task.name][k] += result[k]
-                        
-                        if task.name == 'intake':
-                            dialog_results[gt['patient']] = dialogs[0]
-                        else:
-                            agent_results[task.name]['dialog'] += dialogs
+                if self.patient_concurrency > 1:
+                    self.__run_concurrently(agent_simulation_data, agent_results, dialog_results, done_patients, environment, verbose)
+                else:
+                    for j, (gt, test_data) in enumerate(agent_simulation_data['agent_data']):
+                        for task in self.task_queue:
+                            if task.name in done_patients and gt['patient'] in done_patients[task.name]:
+                                continue
+
+                            result = task((gt, test_data), agent_simulation_data, agent_results, environment, verbose)
+                            Simulator.append_result(task.name, gt, result, agent_results, dialog_results)
 
                 # Logging the results
                 for task_name, result in agent_results.items():
@@ -212,6 +294,8 @@ class Simulator:
                     log(f'{basename} - {task_name} task results..', color=True)
                     log(f'   - accuracy: {accuracy:.3f}, length: {len(correctness)}, status_code: {status_code}')
 
+                # Flush barrier of the FHIR writes before saving the results
+                environment.flush_fhir(close=True)
                 json_save_fast(save_path, agent_results)
                 if 'intake' in self.task_list:
                     json_save_fast(d_save_path, dialog_results)
@@ -219,9 +303,17 @@ class Simulator:
             log(f"Agent completed the tasks successfully", color=True)
         
         except Exception as e:
+            # Save the partial results without hiding the original error (e.g., the FHIR server itself may have failed)
             if len(agent_results):
-                json_save_fast(save_path, agent_results)
-                if 'intake' in self.task_list:
-                    json_save_fast(d_save_path, dialog_results)
+                try:
+                    environment.flush_fhir(close=True)
+                except Exception as cleanup_error:
+                    log(f"Failed to flush the FHIR writes: {type(cleanup_error).__name__}: {cleanup_error}", level='error')
+                try:
+                    json_save_fast(save_path, agent_results)
+                    if 'intake' in self.task_list:
+                        json_save_fast(d_save_path, dialog_results)
+                except Exception as cleanup_error:
+                    log(f"Failed to save the partial results: {type(cleanup_error).__name__}: {cleanup_error}", level='error')
             log("Error occured while execute the tasks.", level='error')
             raise e
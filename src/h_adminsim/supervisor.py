@@ -3,7 +3,11 @@ from importlib import resources
 from typing import Optional, Tuple
 
 from h_adminsim.utils import colorstr, log
-from h_adminsim.client import GeminiClient, GPTClient, VLLMClient
+from h_adminsim.client import (
+    GeminiClient, GPTClient, VLLMClient,
+    AsyncGeminiClient, AsyncGPTClient, AsyncVLLMClient,
+    get_client,
+)
 
 
 
@@ -17,6 +21,7 @@ class SupervisorAgent:
                  system_prompt_path: Optional[str] = None,
                  user_prompt_path: Optional[str] = None,
                  reasoning_effort: str = 'low',
+                 use_async: bool = False,
                  **kwargs):
         
         # Initialize environment
@@ -30,6 +35,7 @@ class SupervisorAgent:
             api_key=api_key,
             use_vllm=use_vllm,
             vllm_endpoint=vllm_endpoint,
+            use_async=use_async,
             reasoning_effort=reasoning_effort
         )
         
@@ -55,6 +61,7 @@ class SupervisorAgent:
                     api_key: Optional[str] = None,
                     use_vllm: bool = False,
                     vllm_endpoint: Optional[str] = None,
+                    use_async: bool = False,
                     reasoning_effort: str = 'low'):
         """
         Initialize the model and API client based on the specified model type.
@@ -65,25 +72,26 @@ class SupervisorAgent:
                                                Defaults to None.
             use_vllm (bool): Whether to use vLLM client.
             vllm_endpoint (Optional[str], optional): Path to the vLLM server. Defaults to None.
+            use_async (bool, optional): Whether to use the asynchronous API client, which makes the agent call awaitable. Defaults to False.
             reasoning_effort (str, optional): Reasoning effort level for the model. Defaults to 'low'.
 
         Raises:
             ValueError: If the specified model is not supported.
         """
         if 'gemini' in model.lower():
-            self.client = GeminiClient(model, api_key)
+            self.client = get_client(AsyncGeminiClient, model, api_key) if use_async else get_client(GeminiClient, model, api_key)
             self.reasoning_kwargs = {}
             if reasoning_effort:
                 log("'reasoning_effort' is not supported for Gemini models and will be ignored.", level='warning')
         
         elif 'gpt' in model.lower():       # TODO: Support o3, o4 models etc.
-            self.client = GPTClient(model, api_key)
+            self.client = get_client(AsyncGPTClient, model, api_key) if use_async else get_client(GPTClient, model, api_key)
             self.reasoning_kwargs = {'reasoning_effort': reasoning_effort} if 'gpt-5' in model.lower() else {}
             if 'gpt-5' not in model.lower() and reasoning_effort:
                 log(f"'reasoning_effort' is not supported for {model} model and will be ignored.", level='warning')
         
         elif use_vllm:
-            self.client = VLLMClient(model, vllm_endpoint)
+            self.client = get_client(AsyncVLLMClient, model, vllm_endpoint) if use_async else get_client(VLLMClient, model, vllm_endpoint)
             self.reasoning_kwargs = {}
             if reasoning_effort:
                 log("'reasoning_effort' is not supported for vLLM models and will be ignored.", level='warning')
@@ -168,7 +176,7 @@ class SupervisorAgent:
             verbose (bool, optional): Whether to print verbose output. Defaults to True.
 
         Returns:
-            str: The response from the patient agent.
+            str: The response from the patient agent. If the agent uses the asynchronous client, an awaitable of the response is returned.
         """
         kwargs.update(self.reasoning_kwargs)
         response = self.client(
@@ -1,14 +1,15 @@
 import os
 import json
 import random
-from copy import deepcopy
+import threading
+from copy import copy, deepcopy
 from decimal import getcontext
 from importlib import resources
 from typing import Tuple, Union, Optional
 from dotenv import load_dotenv, find_dotenv
 
-from patientsim import PatientAgent
-from patientsim import AdminStaffAgent as IntakeAdminStaffAgent
+from patientsim import PatientAgent as _PatientAgent
+from patientsim import AdminStaffAgent as _IntakeAdminStaffAgent
 from patientsim.environment import OPSimulation as OPFVIntakeSimulation
 
 from h_adminsim import SupervisorAgent
@@ -16,7 +17,8 @@ from h_adminsim import AdminStaffAgent as SchedulingAdminStaffAgent
 from h_adminsim.environment.hospital import HospitalEnvironment
 from h_adminsim.environment import OPScehdulingSimulation as OPFVScheduleSimulation
 from h_adminsim.tools.sanity_checker import SanityChecker
-from h_adminsim.tools import DataConverter, SchedulingRule
+from h_adminsim.tools import DataConverter
+from h_adminsim.client import SharedClientMixin
 from h_adminsim.registry import STATUS_CODES, PREFERENCE_PHRASE_PATIENT
 from h_adminsim.utils import colorstr, log
 from h_adminsim.utils.fhir_utils import *
@@ -24,6 +26,22 @@ from h_adminsim.utils.common_utils import *
 
 
 
+class PatientAgent(SharedClientMixin, _PatientAgent):
+    """
+    PatientSim patient agent whose API client is shared in the process instead of being constructed for every patient.
+    """
+    pass
+
+
+
+class IntakeAdminStaffAgent(SharedClientMixin, _IntakeAdminStaffAgent):
+    """
+    PatientSim administrative staff agent whose API client is shared in the process instead of being constructed for every patient.
+    """
+    pass
+
+
+
 class FirstVisitOutpatientTask:
     def __init__(self):
         self.token_stats = {
@@ -31,6 +49,61 @@ class FirstVisitOutpatientTask:
             'admin_staff_token': {'input': [], 'output': [], 'reasoning': []}, 
             'supervisor_token': {'input':[], 'output': [], 'reasoning': []}
         }
+        self._local = threading.local()
+
+
+    def _local_agent(self, agent):
+        """
+        Get the calling thread's own copy of a stateful LLM agent.
+        Agents keep the conversation histories and token usages in their clients, so that the patients simulated concurrently
+        (see `Simulator`) must not share them. The main thread always uses the original agent.
+
+        Args:
+            agent (Any): An LLM agent with a `client` attribute (e.g., AdminStaffAgent and SupervisorAgent), or None.
+
+        Returns:
+            Any: The agent of the calling thread.
+        """
+        if agent is None or threading.current_thread() is threading.main_thread():
+            return agent
+        
+        agents = self._local.__dict__.setdefault('agents', dict())
+        if id(agent) not in agents:
+            local_agent = copy(agent)
+            local_agent.client = copy(agent.client)
+            local_agent.client.reset_history(verbose=False)
+            agents[id(agent)] = local_agent
+        return agents[id(agent)]
+
+
+    def __call__(self, data_pair: Tuple[dict, dict], agent_test_data: dict, agent_results: dict, environment, verbose: bool = False) -> dict:
+        """
+        Simulate a single patient: the dialogue phase (`prepare`) followed by the commit phase (`commit`).
+
+        Args:
+            data_pair (Tuple[dict, dict]): A pair of ground truth and patient data for agent simulation.
+            agent_test_data (dict): A dictionary containing test data for a single hospital.
+            agent_results (dict): A dictionary of the results of the previous tasks.
+            environment (HospitalEnvironment): Hospital environment instance to manage patient schedules.
+            verbose (bool, optional): Whether logging the each result or not. Defaults to False.
+
+        Returns:
+            dict: A result dictionary with 'gt', 'pred', 'status', 'status_code', 'trial', and 'dialog' fields.
+        """
+        self.setup_hospital(agent_test_data)
+        context = self.prepare(data_pair, agent_test_data, agent_results, environment, verbose)
+        return self.commit(context, agent_test_data, agent_results, environment, verbose)
+
+
+    def setup_hospital(self, agent_test_data: dict):
+        """
+        Set the per-hospital state of the task. It must be called on the main thread before the patients of a hospital are prepared,
+        since `prepare` may run concurrently on worker threads (see `Simulator`) and only reads the task state.
+
+        Args:
+            agent_test_data (dict): A dictionary containing test data for a single hospital.
+        """
+        pass
 
     
     def save_token_data(self, 
@@ -221,9 +294,16 @@ class OutpatientFirstIntake(FirstVisitOutpatientTask):
             return prediction_department, ['supervisor error']
         
 
-    def __call__(self, data_pair: Tuple[dict, dict], agent_test_data: dict, agent_results: dict, environment, verbose: bool = False) -> dict:
+    def prepare(self, 
+                data_pair: Tuple[dict, dict], 
+                agent_test_data: dict, 
+                agent_results: dict, 
+                environment, 
+                verbose: bool = False,
+                rng: Optional[random.Random] = None) -> dict:
         """
         Estimates the most appropriate medical department for each patient using an LLM agent.
+        The intake does not change the hospital environment, so that it can be run concurrently for multiple patients.
 
         Args:
             data_pair (Tuple[dict, dict]): A pair of ground truth and patient data for agent simulation.
@@ -231,11 +311,12 @@ class OutpatientFirstIntake(FirstVisitOutpatientTask):
                 Expected to include:
                     - 'department': Dictionary of available departments.
             agent_results (dict): Placeholder for compatibility; not used in this method.
-            environment (HospitalEnvironment): Hospital environment instance to manage patient schedules.
+            environment (HospitalEnvironment): Placeholder for compatibility; not used in this method.
             verbose (bool): Whether logging the each result or not.
+            rng (Optional[random.Random], optional): Placeholder for compatibility; not used in this method.
 
         Returns:
-            dict: A dictionary with:
+            dict: A context to be committed, including a result dictionary with:
                 - 'gt': List of ground-truth departments.
                 - 'pred': List of predicted departments from the LLM agent.
                 - 'status': List of booleans indicating whether each prediction correct.
@@ -314,13 +395,15 @@ class OutpatientFirstIntake(FirstVisitOutpatientTask):
         # LLM call: Agent which should extract demographic information of the patient and evaluation the department decision result
         dialogs = preprocess_dialog(dialogs)
         
+        supervisor_client = self._local_agent(self.supervisor_client)
         if self.use_supervisor:
-            user_prompt = self.supervisor_client.user_prompt_template.format(
+            supervisor_client.client.token_usages = dict()      # Token usages of this patient only
+            user_prompt = supervisor_client.user_prompt_template.format(
                 CONVERSATION=dialogs,
                 DEPARTMENTS=''.join([f'{i+1}. {department}\n' for i, department in enumerate(departments)])
             )
             prediction_supervision = run_with_retry(
-                self.supervisor_client,
+                supervisor_client,
                 user_prompt,
                 using_multi_turn=False,
                 verbose=False,
@@ -336,13 +419,7 @@ class OutpatientFirstIntake(FirstVisitOutpatientTask):
             )
 
         prediction_supervision = OutpatientFirstIntake.postprocessing_information(prediction_supervision)
-        
-        # Append token data
-        self.save_token_data(
-            patient_token, 
-            admin_staff_token, 
-            supervisor_token=self.supervisor_client.client.token_usages if self.use_supervisor else {}
-        )
+        supervisor_token = deepcopy(supervisor_client.client.token_usages) if self.use_supervisor else {}
 
         # Sanity check
         department, trial = self._department_decision(prediction_department, prediction_supervision, gt['department'])
@@ -365,7 +442,27 @@ class OutpatientFirstIntake(FirstVisitOutpatientTask):
         results['trial'].append(trial)
         results['dialog'].append(dialogs)
 
-        return results
+        return {'results': results, 'tokens': (patient_token, admin_staff_token, supervisor_token)}
+    
+
+    def commit(self, context: dict, agent_test_data: dict, agent_results: dict, environment, verbose: bool = False) -> dict:
+        """
+        Commit the intake result of a patient in the patient order.
+
+        Args:
+            context (dict): The context returned by `prepare`.
+            agent_test_data (dict): Placeholder for compatibility; not used in this method.
+            agent_results (dict): Placeholder for compatibility; not used in this method.
+            environment (HospitalEnvironment): Placeholder for compatibility; not used in this method.
+            verbose (bool, optional): Placeholder for compatibility; not used in this method.
+
+        Returns:
+            dict: A result dictionary.
+        """
+        # Append token data
+        patient_token, admin_staff_token, supervisor_token = context['tokens']
+        self.save_token_data(patient_token, admin_staff_token, supervisor_token=supervisor_token)
+        return context['results']
 
 
 
@@ -380,6 +477,7 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
                  fhir_integration: bool = False,
                  scheduling_max_inference: int = 5,
                  scheduling_strategy: str = 'tool_calling',
+                 waiting_list_strategy: str = 'full',
                  max_retries: int = 8,
                  patient_vllm_endpoint: Optional[str] = None,
                  admin_staff_vllm_endpoint: Optional[str] = None):
@@ -395,8 +493,8 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
         self.admin_staff_model, self.admin_staff_vllm_endpoint, self.admin_staff_use_vllm \
             = self._init_task_models(admin_staff_model, admin_staff_vllm_endpoint)
         
-        # Initialize scheduling methods and a staff agent
-        self.admin_staff_agent = SchedulingAdminStaffAgent(
+        # Initialize scheduling methods and a staff agent (not used by the `oracle` strategy)
+        self.admin_staff_agent = None if scheduling_strategy == 'oracle' else SchedulingAdminStaffAgent(
             target_task='first_outpatient_scheduling',
             model=self.admin_staff_model,
             use_vllm=self.admin_staff_use_vllm,
@@ -415,19 +513,43 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
         self.max_retries = max_retries
         self.max_inferences = scheduling_max_inference
         self.scheduling_strategy = scheduling_strategy
-        assert self.scheduling_strategy in ['reasoning', 'tool_calling'], \
-            log('Scheduling strategy must be either `reasoning` or `tool_calling`.', 'error')
+        assert self.scheduling_strategy in ['reasoning', 'tool_calling', 'oracle'], \
+            log('Scheduling strategy must be one of `reasoning`, `tool_calling`, or `oracle`.', 'error')
+        self.waiting_list_strategy = waiting_list_strategy
+        assert self.waiting_list_strategy in ['full', 'reactive'], \
+            log('Waiting list strategy must be either `full` or `reactive`.', 'error')
         self.schedule_patient_system_prompt_path = str(resources.files("h_adminsim.assets.prompts").joinpath('schedule_patient_system.txt'))
         self.cancel_patient_system_prompt_path = str(resources.files("h_adminsim.assets.prompts").joinpath('cancel_patient_system.txt'))
         self.reschedule_patient_system_prompt_path = str(resources.files("h_adminsim.assets.prompts").joinpath('reschedule_patient_system.txt'))
         self.patient_reasoning_kwargs = {'reasoning_effort': 'low'} if 'gpt-5' in self.patient_model.lower() else {}
         self.staff_reasoning_kwargs = {'reasoning_effort': 'low'} if 'gpt-5' in self.admin_staff_model.lower() else {}
+        self._metadata = None
+
+
+    def setup_hospital(self, agent_test_data: dict):
+        """
+        Set the hospital metadata, departments, operating hours, and the sanity checker of the hospital being simulated.
+        Nothing is changed if the task is already set up for the hospital.
+
+        Args:
+            agent_test_data (dict): Dictionary containing test data and metadata for a single hospital.
+        """
+        if agent_test_data.get('metadata') is self._metadata:
+            return
+        
+        self._metadata = agent_test_data.get('metadata')
+        self._department_data = agent_test_data.get('department')
+        self._START_HOUR = self._metadata.get('time').get('start_hour')
+        self._END_HOUR = self._metadata.get('time').get('end_hour')
+        self._TIME_UNIT = self._metadata.get('time').get('interval_hour')
+        self.sanity_checker = SanityChecker(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
 
     
     def _init_simulation(self,
                          system_prompt_path: str,
                          environment: HospitalEnvironment,
-                         additional_patient_conditions: dict = {}) -> OPFVScheduleSimulation:
+                         additional_patient_conditions: dict = {},
+                         rng: Optional[random.Random] = None) -> OPFVScheduleSimulation:
         """
         Initialize an outpatient first-visit intake and scheduling simulation.
 
@@ -435,11 +557,12 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
             system_prompt_path (str): Path to the system prompt used to initialize the patient agent.
             environment (HospitalEnvironment): Hospital environment configuration for the simulation.
             additional_patient_conditions (dict, optional): Additional patient-specific conditions for simulation control.
+            rng (Optional[random.Random], optional): Per-patient random generator. If not given, the global one is used. Defaults to None.
 
         Returns:
             OPFVIntakeSimulation: Configured outpatient intake and scheduling simulation instance.
         """
-        patient_agent = PatientAgent(
+        patient_agent = None if self.scheduling_strategy == 'oracle' else PatientAgent(
             self.patient_model,
             'outpatient',
             use_vllm=self.patient_use_vllm,
@@ -451,7 +574,7 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
         )
         sim_environment = OPFVScheduleSimulation(
             patient_agent=patient_agent, 
-            admin_staff_agent=self.admin_staff_agent, 
+            admin_staff_agent=self._local_agent(self.admin_staff_agent), 
             metadata=self._metadata,
             department_data=self._department_data,
             environment=environment,
@@ -459,7 +582,9 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
             preference_rejection_prob=self.preference_rejection_prob,
             preference_rejection_prob_decay=self.preference_rejection_prob_decay,
             fhir_integration=self.fhir_integration,
+            waiting_list_strategy=self.waiting_list_strategy,
             sanity_checker=self.sanity_checker, 
+            rng=rng,
         )
         return sim_environment
 
@@ -526,7 +651,7 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
             Tuple[dict, Optional[dict]]: Updated doctor information and a result dictionary after cancellation.
         """
         if idx is None:
-            candidate_idx = [i for i, schedule in enumerate(environment.patient_schedules) if schedule['status'] == 'scheduled']
+            candidate_idx = environment.patient_schedules.indices('scheduled')
             idx = random.choice(candidate_idx) if len(candidate_idx) else -1
 
         if idx >= 0:
@@ -599,12 +724,12 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
         """
         result_dict = init_result_dict()
         if idx is None:
-            candidate_idx = [i for i, schedule in enumerate(environment.patient_schedules) if schedule['status'] == 'scheduled']
+            candidate_idx = environment.patient_schedules.indices('scheduled')
             idx = random.choice(candidate_idx) if len(candidate_idx) else -1
         
         if idx >= 0:
             requested_schedule = environment.patient_schedules[idx]
-            if all(requested_schedule != s[1] for s in environment.waiting_list):
+            if idx not in environment.waiting_list:
                 # Ground-truth rescheduling requested schedule
                 patient = requested_schedule['patient']
                 doctor, date, time = requested_schedule['attending_physician'], requested_schedule['date'], requested_schedule['schedule']
@@ -637,8 +762,12 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
                 if result_dict['status'][0] is not False:   # No GT and correct case
                     if 'patient' in result_dict['pred'][0]:
                         new_schedule = result_dict['pred'][0]
-                        doctor_information[new_schedule['attending_physician']]['schedule'][new_schedule['date']].append(new_schedule['schedule'])
-                        doctor_information[new_schedule['attending_physician']]['schedule'][new_schedule['date']].sort()
+                        environment.add_doctor_schedule(
+                            doctor_information,
+                            new_schedule['attending_physician'],
+                            new_schedule['date'],
+                            new_schedule['schedule'],
+                        )
                         self.update_env(
                             status=True,
                             prediction=new_schedule,
@@ -677,8 +806,12 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
 
             if result_dict['status'][0]:
                 new_schedule, original = result_dict['pred'][0], result['original']
-                doctor_information[new_schedule['attending_physician']]['schedule'][new_schedule['date']].append(new_schedule['schedule'])
-                doctor_information[new_schedule['attending_physician']]['schedule'][new_schedule['date']].sort()
+                environment.add_doctor_schedule(
+                    doctor_information,
+                    new_schedule['attending_physician'],
+                    new_schedule['date'],
+                    new_schedule['schedule'],
+                )
                 self.update_env(
                     status=True,
                     prediction=new_schedule,
@@ -741,10 +874,18 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
         )
             
 
-    def __call__(self, data_pair: Tuple[dict, dict], agent_test_data: dict, agent_results: dict, environment, verbose: bool = False) -> dict:
+    def prepare(self, 
+                data_pair: Tuple[dict, dict], 
+                agent_test_data: dict, 
+                agent_results: dict, 
+                environment, 
+                verbose: bool = False,
+                rng: Optional[random.Random] = None) -> dict:
         """
         This method uses agent test data to prompt an LLM for scheduling decisions, post-processes
-        the output, runs sanity checks on predicted schedules, and collects the results for evaluation.
+        the output, and runs sanity checks on predicted schedules (i.e., the dialogue phase of the scheduling task).
+        The environment is only read here, so that it can be a snapshot of the hospital environment (see `HospitalEnvironment.snapshot`).
+        The task must be set up for the hospital by `setup_hospital` beforehand.
 
         Args:
             data_pair (Tuple[dict, dict]): A pair of ground truth and patient data for agent simulation.
@@ -755,27 +896,25 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
                     - 'doctor': A dictionary of doctor profiles with department and schedule info.
             agent_results (dict): Optional dictionary containing prior department predictions.
                 Used to extract department-level guidance per patient. Can be empty.
-            environment (HospitalEnvironment): Hospital environment instance to manage patient schedules.
+            environment (HospitalEnvironment): Hospital environment instance (or its snapshot) to manage patient schedules.
             verbose (bool, option): Whether logging the each result or not.
+            rng (Optional[random.Random], optional): Per-patient random generator. If not given, the global one is used. Defaults to None.
 
         Returns:
-            dict: A dictionary with three keys:
-                - 'gt': List of ground truth results, each including patient info, attending physician, department, and schedule.
-                - 'pred': List of predicted results (either valid dict or fallback string).
-                - 'status': List of booleans indicating whether each prediction passed sanity checks.
-                - 'status_code': List of status codes explaining each status.
+            dict: A context to be committed by `commit`.
         """
         gt, test_data = data_pair
-        self._metadata = agent_test_data.get('metadata')
-        self._department_data = agent_test_data.get('department')
-        self._START_HOUR = self._metadata.get('time').get('start_hour')
-        self._END_HOUR = self._metadata.get('time').get('end_hour')
-        self._TIME_UNIT = self._metadata.get('time').get('interval_hour')
-        self.sanity_checker = SanityChecker(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
+        rng_state = rng.getstate() if rng is not None else None
         doctor_information = environment.get_general_doctor_info_from_fhir() if self.fhir_integration else agent_test_data.get('doctor')
         patient_info, department, sanity = self.get_intake_information(gt, agent_results, doctor_information)
-        self.rules = SchedulingRule(self._metadata, self._department_data, environment, self.fhir_integration)
         results = init_result_dict()
+        context = {
+            'data_pair': data_pair,
+            'environment': environment,
+            'rng_state': rng_state,
+            'results': results,
+            'result_dict': None,
+        }
 
         # Make scheduling GT list
         gt_data = [
@@ -801,7 +940,7 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
             results['pred'].append({})
             results['status'].append(False)
             results['status_code'].append(STATUS_CODES['preceding'])
-            return results
+            return context
         
         #################################################### Regular Scheudling Simulation ####################################################
         # Initialize the simulation environment using the first preference data
@@ -815,7 +954,8 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
                 'preference': preference,
                 'preference_desc': preference_desc,
                 'preferred_doctor': gt_data[0]['preferred_doctor'],
-            }
+            },
+            rng=rng,
         )
     
         # Simulate the main scheduling task
@@ -829,6 +969,80 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
             staff_kwargs=self.staff_reasoning_kwargs,
             max_retries=self.max_retries,
         )
+        context.update({'doctor_information': doctor_information, 'patient_info': patient_info, 'result_dict': result_dict})
+        return context
+    
+
+    def revalidate(self, result_dict: dict, doctor_information: dict, environment: HospitalEnvironment) -> bool:
+        """
+        Check again whether a schedule predicted on a snapshot of the environment is still valid in the current environment,
+        since the slot may have been taken or an earlier slot may have been freed by the patients committed in the meantime.
+
+        Args:
+            result_dict (dict): The successful result dictionary of the scheduling simulation.
+            doctor_information (dict): Current doctor information including their existing schedules.
+            environment (HospitalEnvironment): Current hospital environment.
+
+        Returns:
+            bool: True if the predicted schedule passes the sanity checks again.
+        """
+        prediction = result_dict['pred'][0]
+        status, _ = self.sanity_checker.schedule_check(
+            prediction={
+                'schedule': {
+                    prediction['attending_physician']: {
+                        'date': prediction['date'],
+                        'start': prediction['schedule'][0],
+                        'end': prediction['schedule'][-1]
+                    }
+                }
+            },
+            gt_patient_condition=result_dict['gt'][0],
+            doctor_information=doctor_information,
+            environment=environment,
+        )
+        return status
+
+
+    def commit(self, context: dict, agent_test_data: dict, agent_results: dict, environment, verbose: bool = False) -> dict:
+        """
+        Commit the scheduling result of a patient to the hospital environment and simulate the other events
+        (i.e., cancellation and rescheduling requests). Patients must be committed in the patient order.
+        If the result was prepared on a snapshot of the environment and it is no longer valid, the patient is simulated again
+        on the current environment.
+
+        Args:
+            context (dict): The context returned by `prepare`.
+            agent_test_data (dict): Dictionary containing test data and metadata for a single hospital.
+            agent_results (dict): Optional dictionary containing prior department predictions.
+            environment (HospitalEnvironment): Hospital environment instance to manage patient schedules.
+            verbose (bool, option): Whether logging the each result or not.
+
+        Returns:
+            dict: A dictionary with three keys:
+                - 'gt': List of ground truth results, each including patient info, attending physician, department, and schedule.
+                - 'pred': List of predicted results (either valid dict or fallback string).
+                - 'status': List of booleans indicating whether each prediction passed sanity checks.
+                - 'status_code': List of status codes explaining each status.
+        """
+        results, result_dict = context['results'], context['result_dict']
+        if result_dict is None:
+            return results
+        doctor_information, patient_info = context['doctor_information'], context['patient_info']
+        
+        # Optimistic re-validation of the result prepared on a snapshot of the environment
+        if context['environment'] is not environment:
+            doctor_information = environment.get_general_doctor_info_from_fhir() if self.fhir_integration else agent_test_data.get('doctor')
+            if result_dict['status'][0]:
+                if not self.revalidate(result_dict, doctor_information, environment):
+                    log(f"{context['data_pair'][0]['patient']}'s schedule is outdated by the preceding patients. The patient is simulated again.", 'warning')
+                    rng = None
+                    if context['rng_state'] is not None:
+                        rng = random.Random()
+                        rng.setstate(context['rng_state'])
+                    context = self.prepare(context['data_pair'], agent_test_data, agent_results, environment, verbose, rng)
+                    return self.commit(context, agent_test_data, agent_results, environment, verbose)
+                result_dict['pred'][0]['last_updated_time'] = environment.current_time
 
         prediction, status, status_code = \
             result_dict['pred'][0], result_dict['status'][0], result_dict['status_code'][0]
@@ -840,8 +1054,12 @@ class OutpatientFirstScheduling(FirstVisitOutpatientTask):
 
         # Update the simulation environment and the doctor information in the agent test data
         if status:
-            doctor_information[prediction['attending_physician']]['schedule'][prediction['date']].append(prediction['schedule'])
-            doctor_information[prediction['attending_physician']]['schedule'][prediction['date']].sort()
+            environment.add_doctor_schedule(
+                doctor_information,
+                prediction['attending_physician'],
+                prediction['date'],
+                prediction['schedule'],
+            )
         
         self.update_env(
             status=status,
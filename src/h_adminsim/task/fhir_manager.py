@@ -1,14 +1,99 @@
+import time
+import threading
 import requests
-from typing import Optional
+import numpy as np
+from collections import OrderedDict
+from typing import Optional, Iterator, Callable, Tuple
 from urllib.parse import urlencode
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 from h_adminsim.utils import log
+from h_adminsim.task.fhir_memory import MEMORY_SCHEME, InMemoryFHIRAdapter, get_memory_server
 
 
 
 class FHIRManager:
-    def __init__(self, fhir_url):
+    # Upload order of the resource types that follows their references (e.g., a Slot refers to a Schedule)
+    RESOURCE_STAGES = {'Practitioner': 0, 'Patient': 0, 'PractitionerRole': 1, 'Schedule': 1, 'Slot': 2, 'Appointment': 3}
+
+    def __init__(self,
+                 fhir_url: str,
+                 pool_size: int = 10,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5):
+        """
+        Client of a FHIR server with a pooled keep-alive HTTP session.
+
+        A single manager is meant to be shared by all the components talking to the same server
+        (e.g., the hospital environments, the simulator, and the data uploader), so that TCP connections are reused across requests.
+        Idempotent requests (GET, PUT, and DELETE) are retried with exponential backoff on connection errors and 5xx responses.
+        A `memory://{name}/fhir` URL routes every request to an in-process FHIR server shared by the name (see `InMemoryFHIRServer`),
+        which is useful for testing and benchmarking without a running server.
+
+        Args:
+            fhir_url (str): Base URL of the FHIR server (e.g., 'http://localhost:8080/fhir' or 'memory://local/fhir').
+            pool_size (int, optional): Maximum number of connections kept alive in the pool. Defaults to 10.
+            connect_timeout (float, optional): Connection timeout in seconds. Defaults to 5.0.
+            read_timeout (float, optional): Read timeout in seconds. Defaults to 60.0.
+            max_retries (int, optional): Maximum number of retries of a request. Defaults to 3.
+            backoff_factor (float, optional): Backoff factor between retries (i.e., {backoff factor} * 2^(retry - 1) seconds). Defaults to 0.5.
+        """
         self.fhir_url = fhir_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self.__init_session(pool_size, max_retries, backoff_factor)
+        self.memory_server = None
+        if fhir_url.startswith(f'{MEMORY_SCHEME}://'):
+            self.memory_server = get_memory_server(fhir_url)
+            self.session.mount(f'{MEMORY_SCHEME}://', InMemoryFHIRAdapter(self.memory_server))
+
+
+    @staticmethod
+    def __init_session(pool_size: int, max_retries: int, backoff_factor: float) -> requests.Session:
+        """
+        Build an HTTP session with a connection pool and a retry policy.
+
+        Args:
+            pool_size (int): Maximum number of connections kept alive in the pool.
+            max_retries (int): Maximum number of retries of a request.
+            backoff_factor (float): Backoff factor between retries.
+
+        Returns:
+            requests.Session: The HTTP session.
+        """
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=['GET', 'PUT', 'DELETE'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+    def close(self):
+        """
+        Close the HTTP session and its pooled connections.
+        """
+        self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
         
     
     def __logging(self, response: requests.Response, verbose=True) -> Optional[requests.Response]:
@@ -59,10 +144,11 @@ class FHIRManager:
         """
         _id = resource_data.get('id')
         fhir_url = f'{self.fhir_url}/{resource_type}/{_id}'
-        response = requests.put(
+        response = self.session.put(
             fhir_url,
             headers={'Content-Type': 'application/fhir+json'} if headers is None else headers,
             json=resource_data,
+            timeout=self.timeout,
         )
 
         # Log and return the response
@@ -87,9 +173,10 @@ class FHIRManager:
             Optional[requests.Response]: The HTTP response object if JSON parsing is successful, else None.
         """
         fhir_url = f'{self.fhir_url}/{resource_type}/{id}'
-        response = requests.get(
+        response = self.session.get(
             fhir_url,
             headers={'Accept': 'application/fhir+json'} if headers is None else headers,
+            timeout=self.timeout,
         )
 
         # Log and return the response
@@ -116,10 +203,11 @@ class FHIRManager:
             Optional[requests.Response]: _description_
         """
         fhir_url = f'{self.fhir_url}/{resource_type}/{id}'
-        response = requests.put(
+        response = self.session.put(
             fhir_url,
             headers={'Content-Type': 'application/fhir+json'} if headers is None else headers,
             json=resource_data,
+            timeout=self.timeout,
         )
 
         # Log and return the response
@@ -128,44 +216,47 @@ class FHIRManager:
 
     def delete(self, resource_type: str, id: str, verbose=True):
         fhir_url = f'{self.fhir_url}/{resource_type}/{id}'
-        response = requests.delete(
-            fhir_url
+        response = self.session.delete(
+            fhir_url,
+            timeout=self.timeout,
         )
 
         # Log and return the response
         return self.__logging(response, verbose)
 
 
-    def read_all(self,
+    def iter_all(self,
                  resource_type: str,
                  headers: Optional[dict] = None,
-                 count: int = 100,
+                 count: int = 500,
                  verbose: bool = True,
-                 params: Optional[dict] = None) -> list[dict]:
+                 params: Optional[dict] = None) -> Iterator[list[dict]]:
         """
-        Read all resources of a given resource type using FHIR search with optional filtering.
+        Stream all resources of a given resource type page by page using FHIR search with optional filtering.
+        The next page is requested only after the current one has been consumed.
 
         Args:
             resource_type (str): FHIR resource type (e.g., "PractitionerRole").
             headers (dict, optional): HTTP headers to use.
-            count (int): Number of resources to fetch per page (default: 100).
+            count (int): Number of resources to fetch per page. The server may cap it (default: 500).
             verbose (bool): If True, log each response. Defaults to True.
-            params (dict, optional): FHIR search parameters (e.g., {"specialty": "IMALL-2"}).
+            params (dict, optional): FHIR search parameters pushed down to the server (e.g., {"specialty": "IMALL-2"} 
+                                     or {"_tag": "urn:h-adminsim:hospital|hospital001"}). 
+                                     A list value is sent as a comma-separated value, i.e., an OR search (e.g., {"_id": ["a", "b"]}).
 
-        Returns:
-            list[dict]: List of bundle entry dicts.
+        Yields:
+            list[dict]: Bundle entry dicts of each page.
         """
-        all_entries = []
         headers = {'Accept': 'application/fhir+json'} if headers is None else headers
 
         # Build first page URL with params
         q = {'_count': count}
         if params:
-            q.update({k: v for k, v in params.items() if v is not None})
+            q.update({k: ','.join(v) if isinstance(v, (list, tuple, set)) else v for k, v in params.items() if v is not None})
         url = f"{self.fhir_url}/{resource_type}?{urlencode(q, doseq=True)}"
 
         while url:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
             self.__logging(response, verbose)
             try:
                 bundle = response.json()
@@ -175,7 +266,7 @@ class FHIRManager:
             if bundle.get('resourceType') != 'Bundle' or 'entry' not in bundle:
                 break
 
-            all_entries.extend(bundle['entry'])
+            yield bundle['entry']
 
             # Check for next link (pagination)
             next_link = next(
@@ -184,9 +275,353 @@ class FHIRManager:
             )
             url = next_link  # Continue if next page exists, else break
 
+
+    def read_all(self,
+                 resource_type: str,
+                 headers: Optional[dict] = None,
+                 count: int = 500,
+                 verbose: bool = True,
+                 params: Optional[dict] = None) -> list[dict]:
+        """
+        Read all resources of a given resource type using FHIR search with optional filtering.
+
+        Args:
+            resource_type (str): FHIR resource type (e.g., "PractitionerRole").
+            headers (dict, optional): HTTP headers to use.
+            count (int): Number of resources to fetch per page. The server may cap it (default: 500).
+            verbose (bool): If True, log each response. Defaults to True.
+            params (dict, optional): FHIR search parameters (e.g., {"specialty": "IMALL-2"}). See `iter_all`.
+
+        Returns:
+            list[dict]: List of bundle entry dicts.
+        """
+        all_entries = []
+        for entries in self.iter_all(resource_type, headers, count, verbose, params):
+            all_entries.extend(entries)
         return all_entries
+
+
+    def read_many(self,
+                  queries: dict[str, Optional[dict]],
+                  count: int = 500,
+                  max_workers: int = 4,
+                  verbose: bool = True) -> dict[str, list[dict]]:
+        """
+        Read all resources of several independent searches concurrently.
+
+        Args:
+            queries (dict[str, Optional[dict]]): Search parameters of each resource type (e.g., {"Practitioner": {"_tag": ...}, "Slot": None}).
+            count (int, optional): Number of resources to fetch per page. Defaults to 500.
+            max_workers (int, optional): Maximum number of concurrent searches. Defaults to 4.
+            verbose (bool, optional): If True, log each response. Defaults to True.
+
+        Returns:
+            dict[str, list[dict]]: List of bundle entry dicts of each resource type.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as executor:
+            futures = {
+                resource_type: executor.submit(self.read_all, resource_type, None, count, verbose, params) 
+                    for resource_type, params in queries.items()
+            }
+            return {resource_type: future.result() for resource_type, future in futures.items()}
+
+
+    def bundle(self,
+               resources: list[dict],
+               bundle_type: str = 'batch',
+               headers: Optional[dict] = None,
+               verbose: bool = True,
+               method: str = 'PUT') -> list[int]:
+        """
+        Create (or overwrite) or delete multiple FHIR resources with a single `batch` or `transaction` Bundle request.
+        Each resource is sent as a PUT entry to its own ID like `create()`, or as a DELETE entry like `delete()`.
+
+        Args:
+            resources (list[dict]): FHIR resources. Each resource must have 'resourceType' and 'id'.
+            bundle_type (str, optional): Bundle type. It must be either `batch` or `transaction`. Defaults to 'batch'.
+            headers (Optional[dict], optional): HTTP headers to use. Defaults to None.
+            verbose (bool, optional): If True, log details. Defaults to True.
+            method (str, optional): HTTP method of the entries. It must be either `PUT` or `DELETE`. Defaults to 'PUT'.
+
+        Returns:
+            list[int]: HTTP status code of each entry in the same order as `resources`. 
+                       Entries without a response get the status code of the whole request if it failed (e.g., a rejected transaction), or 0 otherwise
+                       (e.g., a connection error or a successful response with missing entries).
+        """
+        assert bundle_type in ['batch', 'transaction'], log("Bundle type must be either `batch` or `transaction`.", "error")
+        assert method in ['PUT', 'DELETE'], log("Bundle entry method must be either `PUT` or `DELETE`.", "error")
+        bundle_data = {
+            'resourceType': 'Bundle',
+            'type': bundle_type,
+            'entry': [
+                {
+                    'fullUrl': f"{self.fhir_url.rstrip('/')}/{resource['resourceType']}/{resource['id']}",
+                    'resource': resource,
+                    'request': {'method': 'PUT', 'url': f"{resource['resourceType']}/{resource['id']}"}
+                } if method == 'PUT' else {
+                    'request': {'method': 'DELETE', 'url': f"{resource['resourceType']}/{resource['id']}"}
+                } for resource in resources
+            ]
+        }
+
+        try:
+            response = self.session.post(
+                self.fhir_url,
+                headers={'Content-Type': 'application/fhir+json'} if headers is None else headers,
+                json=bundle_data,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            if verbose:
+                log(f'Bundle request failed: {e}', level='error')
+            return [0] * len(resources)
+
+        # Per-entry statuses (e.g., "201 Created")
+        # Entries missing from a successful Bundle response are regarded as failed (0), so that they are retried
+        status_codes = [0 if 200 <= response.status_code < 300 else response.status_code] * len(resources)
+        try:
+            response_entries = response.json().get('entry', []) if 200 <= response.status_code < 300 else []
+        except ValueError:
+            response_entries = []
+        
+        for i, entry in enumerate(response_entries[:len(resources)]):
+            try:
+                status_codes[i] = int(str(entry.get('response', {}).get('status', '')).split()[0])
+            except (ValueError, IndexError):
+                status_codes[i] = 0
+        
+        if verbose:
+            success_n = sum(200 <= code < 300 for code in status_codes)
+            log(f'Bundle ({bundle_type}) status code: {response.status_code}, {success_n}/{len(resources)} entries succeeded', 
+                color=success_n == len(resources), level='info' if success_n == len(resources) else 'warning')
+        return status_codes
+
+
+    def create_all(self,
+                   resources: list[dict],
+                   batch_size: int = 100,
+                   bundle_type: str = 'batch',
+                   max_retries: int = 3,
+                   max_workers: int = 1,
+                   report: Optional['UploadReport'] = None,
+                   verbose: bool = True) -> list[dict]:
+        """
+        Create (or overwrite) FHIR resources in chunks of `batch_size` Bundles and retry the failed entries.
+        Resources are uploaded stage by stage following their references (Practitioner/Patient → PractitionerRole/Schedule → Slot → Appointment → others),
+        and the chunks of the same stage are sent concurrently by at most `max_workers` in-flight requests.
+        If `batch_size` is 1 or less, each resource is created with an individual request.
+
+        Args:
+            resources (list[dict]): FHIR resources. Each resource must have 'resourceType' and 'id'.
+            batch_size (int, optional): Number of resources per Bundle. Defaults to 100.
+            bundle_type (str, optional): Bundle type. It must be either `batch` or `transaction`. Defaults to 'batch'.
+            max_retries (int, optional): Maximum number of retries of the failed entries. Defaults to 3.
+            max_workers (int, optional): Maximum number of in-flight requests. 
+                                         Values larger than the connection pool size of the manager open extra, non-reused connections. Defaults to 1.
+            report (Optional[UploadReport], optional): If given, request latencies and results are accumulated into it. Defaults to None.
+            verbose (bool, optional): If True, log each Bundle response. Defaults to True.
+
+        Returns:
+            list[dict]: Resources that could not be created even after the retries.
+        """
+        return self.__run_staged(resources, 'PUT', batch_size, bundle_type, max_retries, max_workers, report, verbose)
+
+
+    def delete_many(self,
+                    resources: list[dict],
+                    batch_size: int = 100,
+                    bundle_type: str = 'batch',
+                    max_retries: int = 3,
+                    max_workers: int = 1,
+                    report: Optional['UploadReport'] = None,
+                    verbose: bool = True) -> list[dict]:
+        """
+        Delete FHIR resources in chunks of `batch_size` Bundles and retry the failed entries.
+        Resources are deleted in the reverse order of `create_all` (e.g., Appointments before Patients), 
+        so that no resource is deleted while another resource still refers to it.
+        A resource that does not exist anymore (i.e., 404 or 410) is regarded as deleted.
+
+        Args:
+            resources (list[dict]): FHIR resources to delete. Each resource must have 'resourceType' and 'id'.
+            batch_size (int, optional): Number of resources per Bundle. If 1 or less, each resource is deleted with an individual request. Defaults to 100.
+            bundle_type (str, optional): Bundle type. It must be either `batch` or `transaction`. Defaults to 'batch'.
+            max_retries (int, optional): Maximum number of retries of the failed entries. Defaults to 3.
+            max_workers (int, optional): Maximum number of in-flight requests. Defaults to 1.
+            report (Optional[UploadReport], optional): If given, request latencies and results are accumulated into it. Defaults to None.
+            verbose (bool, optional): If True, log each Bundle response. Defaults to True.
+
+        Returns:
+            list[dict]: Resources that could not be deleted even after the retries.
+        """
+        return self.__run_staged(resources, 'DELETE', batch_size, bundle_type, max_retries, max_workers, report, verbose)
+
+
+    def __run_staged(self,
+                     resources: list[dict],
+                     method: str,
+                     batch_size: int,
+                     bundle_type: str,
+                     max_retries: int,
+                     max_workers: int,
+                     report: Optional['UploadReport'] = None,
+                     verbose: bool = True) -> list[dict]:
+        """
+        Send PUT or DELETE requests of FHIR resources stage by stage with bounded concurrency and retries.
+        See `create_all` and `delete_many`.
+
+        Returns:
+            list[dict]: Resources that could not be processed even after the retries.
+        """
+        assert max_workers >= 1, log("The number of workers must be at least 1.", "error")
+        
+        # Group the resources by reference stage
+        stages = dict()
+        for resource in resources:
+            stage = self.RESOURCE_STAGES.get(resource.get('resourceType'), len(self.RESOURCE_STAGES))
+            stages.setdefault(stage, list()).append(resource)
+        
+        start = time.perf_counter()
+        failed_all = list()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for stage in sorted(stages, reverse=method == 'DELETE'):
+                pending = stages[stage]
+                for attempt in range(max_retries + 1):
+                    if attempt > 0:
+                        log(f'Retrying {len(pending)} failed resource(s) ({attempt}/{max_retries})', level='warning')
+                        time.sleep(min(2 ** (attempt - 1), 30))
+                    
+                    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)] if batch_size > 1 else [[r] for r in pending]
+                    failed = list()
+                    for chunk_failed in executor.map(lambda chunk: self.__send_chunk(chunk, method, batch_size > 1, bundle_type, report, verbose), chunks):
+                        failed += chunk_failed
+                    
+                    pending = failed
+                    if not len(pending):
+                        break
+                
+                failed_all += pending
+
+        if report is not None:
+            report.add_result(len(resources), failed_all, time.perf_counter() - start)
+        
+        return failed_all
+
+
+    def __send_chunk(self,
+                     chunk: list[dict],
+                     method: str,
+                     use_bundle: bool,
+                     bundle_type: str,
+                     report: Optional['UploadReport'] = None,
+                     verbose: bool = True) -> list[dict]:
+        """
+        Send PUT or DELETE requests of a chunk of FHIR resources with a single request.
+
+        Args:
+            chunk (list[dict]): FHIR resources. If `use_bundle` is False, it must contain only one resource.
+            method (str): HTTP method (i.e., `PUT` or `DELETE`).
+            use_bundle (bool): Whether to send the chunk as a Bundle.
+            bundle_type (str): Bundle type.
+            report (Optional[UploadReport], optional): If given, the request latency is recorded. Defaults to None.
+            verbose (bool, optional): If True, log the response. Defaults to True.
+
+        Returns:
+            list[dict]: Resources that could not be processed.
+        """
+        start = time.perf_counter()
+        if use_bundle:
+            status_codes = self.bundle(chunk, bundle_type, verbose=verbose, method=method)
+        else:
+            try:
+                if method == 'PUT':
+                    response = self.create(chunk[0]['resourceType'], chunk[0], verbose=verbose)
+                else:
+                    response = self.session.delete(f"{self.fhir_url}/{chunk[0]['resourceType']}/{chunk[0]['id']}", timeout=self.timeout)
+                status_codes = [0 if response is None else response.status_code]
+            except requests.RequestException as e:
+                if verbose:
+                    log(f'Request failed: {e}', level='error')
+                status_codes = [0]
+        
+        if report is not None:
+            report.add_latency(time.perf_counter() - start)
+        
+        success_codes = (404, 410) if method == 'DELETE' else tuple()
+        return [resource for resource, code in zip(chunk, status_codes) if not (200 <= code < 300 or code in success_codes)]
     
 
+    def reset(self,
+              resource_types: list[str],
+              params: Optional[dict] = None,
+              id_prefix: Optional[str] = None,
+              conditional: bool = False,
+              expunge: bool = False,
+              batch_size: int = 100,
+              max_workers: int = 4,
+              verbose: bool = True) -> int:
+        """
+        Delete every resource of the given types that matches the search criteria (e.g., the resources of a single hospital).
+        By default, the matched IDs are searched and deleted with concurrent batch Bundles in the reverse reference order.
+        If `conditional` is True, a conditional delete (i.e., `DELETE [type]?[params]`) is tried first, 
+        and the batch deletion is used only if the server rejects it (e.g., multiple matches are not allowed).
+
+        Args:
+            resource_types (list[str]): FHIR resource types to delete (e.g., ['Appointment', 'Patient']).
+            params (Optional[dict], optional): FHIR search parameters to scope the deletion (e.g., {'_tag': 'urn:h-adminsim:hospital|hospital001'}). 
+                                               If None, every resource of the types is deleted. Defaults to None.
+            id_prefix (Optional[str], optional): If given, only the resources whose IDs start with it are deleted. 
+                                                 A conditional delete is not used in this case. Defaults to None.
+            conditional (bool, optional): Whether to try a conditional delete first. Defaults to False.
+            expunge (bool, optional): If True, the deleted resources are also expunged with the `$expunge` operation where the server supports it. Defaults to False.
+            batch_size (int, optional): Number of resources per Bundle. Defaults to 100.
+            max_workers (int, optional): Maximum number of in-flight requests. Defaults to 4.
+            verbose (bool, optional): If True, log the summary. Defaults to True.
+
+        Returns:
+            int: The number of deleted resources. Resources deleted by a conditional delete are not counted.
+        """
+        resources = list()
+        for resource_type in resource_types:
+            if conditional and params and id_prefix is None:
+                try:
+                    response = self.session.delete(f"{self.fhir_url}/{resource_type}?{urlencode(params, doseq=True)}", timeout=self.timeout)
+                    if 200 <= response.status_code < 300:
+                        continue
+                except requests.RequestException:
+                    pass
+
+            # Only IDs are needed to delete the resources
+            query = dict(params or {})
+            query['_elements'] = 'id'
+            for entries in self.iter_all(resource_type, count=1000, verbose=False, params=query):
+                resources += [
+                    {'resourceType': resource_type, 'id': entry['resource']['id']} for entry in entries 
+                        if id_prefix is None or entry['resource']['id'].startswith(id_prefix)
+                ]
+
+        failed = self.delete_many(resources, batch_size=batch_size, max_workers=max_workers, verbose=False)
+        if len(failed):
+            log(f'{len(failed)} resource(s) could not be deleted during reset', level='warning')
+
+        if expunge:
+            for resource_type in resource_types:
+                try:
+                    response = self.session.post(
+                        f'{self.fhir_url}/{resource_type}/$expunge',
+                        headers={'Content-Type': 'application/fhir+json'},
+                        json={'resourceType': 'Parameters', 'parameter': [{'name': 'expungeDeletedResources', 'valueBoolean': True}]},
+                        timeout=self.timeout,
+                    )
+                    if not 200 <= response.status_code < 300:
+                        log(f'$expunge of {resource_type} is not supported by the server (status code: {response.status_code})', level='warning')
+                except requests.RequestException as e:
+                    log(f'$expunge of {resource_type} failed: {e}', level='warning')
+        
+        if verbose:
+            log(f'Reset {resource_types}: {len(resources) - len(failed)} resource(s) deleted', color=True)
+        return len(resources) - len(failed)
+
+
     def delete_all(self, entry: list[dict], verbose: bool = True):
         """
         Delete all FHIR resources from a given list of resource entries.
@@ -219,4 +654,254 @@ class FHIRManager:
 # SELECT * FROM hfj_resource WHERE res_type = 'Patient' LIMIT 1;
 # SELECT * FROM HFJ_RES_VER WHERE RES_ID = 925754;
 
-    
\ No newline at end of file
+    
+
+
+
+class UploadReport:
+    def __init__(self):
+        """
+        Thread-safe accumulator of the request latencies and the results of FHIR uploads (see `FHIRManager.create_all`).
+        """
+        self._lock = threading.Lock()
+        self.latencies = list()
+        self.resource_n = 0
+        self.failed = list()
+        self.elapsed = 0.0
+
+
+    def add_latency(self, latency: float):
+        """
+        Record the latency of a single request.
+
+        Args:
+            latency (float): Request latency in seconds.
+        """
+        with self._lock:
+            self.latencies.append(latency)
+
+
+    def add_result(self, resource_n: int, failed: list[dict], elapsed: float):
+        """
+        Record the result of an upload.
+
+        Args:
+            resource_n (int): The number of resources requested to upload.
+            failed (list[dict]): Resources that could not be created.
+            elapsed (float): Wall-clock time of the upload in seconds.
+        """
+        with self._lock:
+            self.resource_n += resource_n
+            self.failed += failed
+            self.elapsed += elapsed
+
+
+    def summary(self) -> dict:
+        """
+        Summarize the throughput, the latency percentiles, and the failures.
+
+        Returns:
+            dict: Summary of the uploads. Latencies are in milliseconds.
+        """
+        succeeded = self.resource_n - len(self.failed)
+        latencies = np.array(self.latencies) * 1000 if len(self.latencies) else np.zeros(1)
+        return {
+            'resources': self.resource_n,
+            'succeeded': succeeded,
+            'failed': len(self.failed),
+            'requests': len(self.latencies),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'throughput_per_second': round(succeeded / self.elapsed, 2) if self.elapsed > 0 else 0.0,
+            'latency_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'latency_p90_ms': round(float(np.percentile(latencies, 90)), 2),
+            'latency_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        }
+
+
+    def log(self):
+        """
+        Log the summary of the uploads and the failed resources.
+        """
+        summary = self.summary()
+        log(f"Uploaded {summary['succeeded']}/{summary['resources']} resources in {summary['elapsed_seconds']}s "
+            f"({summary['throughput_per_second']} resources/s, {summary['requests']} requests)", color=True)
+        log(f"Request latency (ms): p50={summary['latency_p50_ms']}, p90={summary['latency_p90_ms']}, p99={summary['latency_p99_ms']}")
+        if len(self.failed):
+            error_ids = [f"{r.get('resourceType')}/{r.get('id')}" for r in self.failed]
+            log(f'Error resources during creating data: {error_ids}', 'warning')
+
+
+
+class FHIRWriteQueue:
+    def __init__(self,
+                 fhir_manager: FHIRManager,
+                 batch_size: int = 100,
+                 flush_interval: float = 0.5,
+                 max_retries: int = 3,
+                 on_failure: Optional[Callable[[list[dict]], None]] = None):
+        """
+        Write-behind queue of FHIR resources, which takes the FHIR writes out of the simulation critical path.
+
+        PUT and DELETE requests are enqueued and coalesced per resource (i.e., only the last request of a resource is sent),
+        and a PUT of a new resource followed by its DELETE cancels out. A background worker flushes the queue in Bundles
+        every `flush_interval` seconds, and `flush()` is a barrier that waits until every enqueued write has reached the server.
+        Resources that have not been written by this queue are regarded as new unless they are marked by `mark_existing()`.
+
+        Args:
+            fhir_manager (FHIRManager): FHIR manager used to send the Bundles.
+            batch_size (int, optional): Number of resources per Bundle. Defaults to 100.
+            flush_interval (float, optional): Time in seconds for which the worker gathers writes before flushing them. Defaults to 0.5.
+            max_retries (int, optional): Maximum number of retries of the failed entries. Defaults to 3.
+            on_failure (Optional[Callable[[list[dict]], None]], optional): Callback called from the worker with the resources 
+                                                                          that could not be written even after the retries. Defaults to None.
+        """
+        self.fhir_manager = fhir_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+        self.failed = list()
+
+        # Queue states
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()       # (resource type, id) -> (method, resource, whether it exists on the server)
+        self._existing = set()
+        self._in_flight = False
+        self._flush_requested = False
+        self._closed = False
+        self._worker = threading.Thread(target=self.__run, daemon=True)
+        self._worker.start()
+
+
+    def put(self, resource_type: str, resource: dict):
+        """
+        Enqueue a PUT (i.e., create or overwrite) request of a FHIR resource.
+
+        Args:
+            resource_type (str): FHIR resource type (e.g., "Appointment").
+            resource (dict): FHIR resource data with its 'id'.
+        """
+        key = (resource_type, resource['id'])
+        with self._cond:
+            previous = self._pending.get(key)
+            exists = key in self._existing or (previous is not None and previous[2])
+            self.__enqueue(key, ('PUT', resource, exists))
+
+
+    def delete(self, resource_type: str, resource: dict):
+        """
+        Enqueue a DELETE request of a FHIR resource. If the resource has been enqueued as a new resource and not flushed yet, both requests cancel out.
+
+        Args:
+            resource_type (str): FHIR resource type (e.g., "Appointment").
+            resource (dict): FHIR resource data with its 'id'.
+        """
+        key = (resource_type, resource['id'])
+        with self._cond:
+            previous = self._pending.get(key)
+            if previous is not None and previous[0] == 'PUT' and not previous[2]:
+                self._pending.pop(key)
+            else:
+                self.__enqueue(key, ('DELETE', {'resourceType': resource_type, 'id': resource['id']}, True))
+
+
+    def mark_existing(self, resource_type: str, ids: list[str]):
+        """
+        Mark resources as existing on the server (e.g., after reading them), so that their DELETE requests are never cancelled out.
+
+        Args:
+            resource_type (str): FHIR resource type (e.g., "Appointment").
+            ids (list[str]): IDs of the resources.
+        """
+        with self._cond:
+            self._existing.update((resource_type, _id) for _id in ids)
+
+
+    def flush(self):
+        """
+        Flush barrier. Block until every enqueued write has been sent to the server.
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._pending and not self._in_flight)
+            self._flush_requested = False
+
+
+    def close(self):
+        """
+        Flush the queue and stop the background worker.
+        """
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+
+    def __enqueue(self, key: Tuple[str, str], request: tuple):
+        """
+        Replace the pending request of a resource with the new one. It must be called with the lock held.
+
+        Args:
+            key (Tuple[str, str]): Resource type and ID.
+            request (tuple): Method, resource, and whether the resource exists on the server.
+        """
+        assert not self._closed, log("FHIR write queue is already closed.", "error")
+        was_empty = not self._pending
+        self._pending.pop(key, None)
+        self._pending[key] = request
+        if was_empty:
+            self._cond.notify_all()
+
+
+    def __run(self):
+        """
+        Background worker that flushes the pending writes.
+        """
+        while 1:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+                
+                # Gather more writes to be coalesced unless a flush is requested
+                if not self._flush_requested and not self._closed:
+                    self._cond.wait_for(lambda: self._flush_requested or self._closed, timeout=self.flush_interval)
+                requests_, self._pending = self._pending, OrderedDict()
+                self._in_flight = True
+
+            failed = list()
+            try:
+                puts = [resource for method, resource, _ in requests_.values() if method == 'PUT']
+                deletes = [resource for method, resource, _ in requests_.values() if method == 'DELETE']
+                if len(puts):
+                    failed += self.fhir_manager.create_all(puts, batch_size=self.batch_size, max_retries=self.max_retries, verbose=False)
+                if len(deletes):
+                    failed += self.fhir_manager.delete_many(deletes, batch_size=self.batch_size, max_retries=self.max_retries, verbose=False)
+            except Exception as e:
+                log(f'FHIR write-behind flush failed: {e}', level='error')
+                failed = [resource for _, resource, _ in requests_.values()]
+            
+            with self._cond:
+                failed_keys = {(resource['resourceType'], resource['id']) for resource in failed}
+                for key, (method, _, _) in requests_.items():
+                    if key in failed_keys:
+                        continue
+                    if method == 'PUT':
+                        self._existing.add(key)
+                    else:
+                        self._existing.discard(key)
+                self.failed += failed
+                self._in_flight = False
+                self._cond.notify_all()
+
+            if len(failed):
+                log(f'{len(failed)} FHIR write(s) failed in the write-behind queue', level='warning')
+                if self.on_failure is not None:
+                    self.on_failure(failed)
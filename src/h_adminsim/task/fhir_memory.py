@@ -0,0 +1,344 @@
+import json
+import uuid
+import threading
+from http import HTTPStatus
+from collections import Counter
+from typing import Optional, Tuple
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+import requests
+from requests.adapters import BaseAdapter
+
+from h_adminsim.utils import log
+
+
+
+MEMORY_SCHEME = 'memory'
+
+
+
+class InMemoryFHIRServer:
+    # Getters of the search parameters supported by the server (every parameter is compared with its string values)
+    SEARCH_PARAMS = {
+        'identifier': lambda r: [x.get('value') for x in r.get('identifier', [])],
+        'status': lambda r: [r.get('status')],
+        'specialty': lambda r: [c.get('code') for x in r.get('specialty', []) for c in x.get('coding', [])],
+        'specialty:text': lambda r: [x.get('text') for x in r.get('specialty', [])],
+        'practitioner': lambda r: [r.get('practitioner', {}).get('reference')] + \
+            [p.get('actor', {}).get('reference') for p in r.get('participant', []) if p.get('actor', {}).get('reference', '').startswith('Practitioner/')],
+        'patient': lambda r: [p.get('actor', {}).get('reference') for p in r.get('participant', []) if p.get('actor', {}).get('reference', '').startswith('Patient/')],
+        'actor': lambda r: [x.get('reference') for x in r.get('actor', [])] + [p.get('actor', {}).get('reference') for p in r.get('participant', [])],
+        'schedule': lambda r: [r.get('schedule', {}).get('reference')],
+        'slot': lambda r: [x.get('reference') for x in r.get('slot', [])],
+    }
+    REFERENCE_PARAMS = ['practitioner', 'patient', 'actor', 'schedule', 'slot']
+
+    def __init__(self, base_url: str):
+        """
+        In-memory stand-in of a FHIR server, which implements the subset of the FHIR REST API used by `FHIRManager`.
+
+        It supports read, create (PUT and POST), delete, conditional delete, `batch` and `transaction` Bundles, `$expunge` (no-op),
+        and searches with pagination by `_id`, `_tag`, `_lastUpdated`, `_elements`, and the parameters in `SEARCH_PARAMS`.
+        Every HTTP request is counted by method and resource type (a Bundle counts as a single request, as it is one round-trip),
+        so that the number of round-trips of a simulation can be measured.
+
+        Args:
+            base_url (str): Base URL of the server (e.g., 'memory://local/fhir').
+        """
+        self.base_url = base_url.rstrip('/')
+        self.resources = dict()         # resource type -> {id: resource}
+        self.request_counts = Counter()
+        self._lock = threading.RLock()
+
+
+    @property
+    def request_n(self) -> int:
+        """
+        Total number of HTTP requests handled by the server.
+
+        Returns:
+            int: The number of requests.
+        """
+        return sum(self.request_counts.values())
+
+
+    def reset(self):
+        """
+        Delete every resource and reset the request counts.
+        """
+        with self._lock:
+            self.resources.clear()
+            self.request_counts.clear()
+
+
+    def handle(self, method: str, url: str, body: Optional[dict] = None) -> Tuple[int, Optional[dict]]:
+        """
+        Handle a single HTTP request.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            body (Optional[dict], optional): JSON body of the request. Defaults to None.
+
+        Returns:
+            Tuple[int, Optional[dict]]: HTTP status code and JSON body of the response.
+        """
+        with self._lock:
+            status, content = self.__dispatch(method, url, body)
+            self.request_counts[(method, self.__route(url)[0] or 'Bundle')] += 1
+            return status, content
+
+
+    @staticmethod
+    def __route(url: str) -> Tuple[Optional[str], Optional[str], list[str], dict]:
+        """
+        Split a request URL into the resource type, resource ID, path segments after the base URL, and query parameters.
+        """
+        split = urlsplit(url)
+        segments = [s for s in split.path.split('/') if s]
+        while segments and not (segments[0][:1].isupper() or segments[0].startswith('$')):
+            segments = segments[1:]
+        resource_type = segments[0] if segments else None
+        _id = segments[1] if len(segments) > 1 and not segments[1].startswith('$') else None
+        return resource_type, _id, segments, parse_qs(split.query, keep_blank_values=True)
+
+
+    def __dispatch(self, method: str, url: str, body: Optional[dict]) -> Tuple[int, Optional[dict]]:
+        resource_type, _id, segments, query = self.__route(url)
+
+        # Batch or transaction Bundle
+        if resource_type is None:
+            if method == 'POST' and body and body.get('resourceType') == 'Bundle':
+                return self.__bundle(body)
+            return self.__outcome(400, 'Only Bundle requests are supported on the base URL')
+
+        if segments[-1] == '$expunge':
+            return 200, {'resourceType': 'Parameters', 'parameter': [{'name': 'count', 'valueInteger': 0}]}
+
+        if method == 'GET':
+            return self.__read(resource_type, _id) if _id else self.__search(resource_type, query)
+        elif method == 'PUT' and _id:
+            return self.__put(resource_type, _id, body)
+        elif method == 'POST' and not _id:
+            return self.__put(resource_type, str(uuid.uuid4()), body)
+        elif method == 'DELETE':
+            return self.__delete(resource_type, _id) if _id else self.__conditional_delete(resource_type, query)
+        return self.__outcome(405, f'{method} {url} is not supported')
+
+
+    def __read(self, resource_type: str, _id: str) -> Tuple[int, dict]:
+        resource = self.resources.get(resource_type, {}).get(_id)
+        if resource is None:
+            return self.__outcome(404, f'{resource_type}/{_id} is not known')
+        return 200, resource
+
+
+    def __put(self, resource_type: str, _id: str, body: Optional[dict]) -> Tuple[int, dict]:
+        if not body or body.get('resourceType') != resource_type:
+            return self.__outcome(400, f'Resource type of the body must be {resource_type}')
+
+        store = self.resources.setdefault(resource_type, dict())
+        previous = store.get(_id)
+        resource = json.loads(json.dumps(body))
+        resource['id'] = _id
+        resource['meta'] = {
+            **resource.get('meta', {}),
+            'versionId': str(int(previous['meta']['versionId']) + 1 if previous else 1),
+            'lastUpdated': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+        }
+        store[_id] = resource
+        return (200 if previous else 201), resource
+
+
+    def __delete(self, resource_type: str, _id: str) -> Tuple[int, dict]:
+        if self.resources.get(resource_type, {}).pop(_id, None) is None:
+            return self.__outcome(404, f'{resource_type}/{_id} is not known')
+        return self.__outcome(200, f'Successfully deleted {resource_type}/{_id}', 'information')
+
+
+    def __conditional_delete(self, resource_type: str, query: dict) -> Tuple[int, dict]:
+        status, matched = self.__match(resource_type, query)
+        if status != 200:
+            return status, matched
+        for resource in matched:
+            self.resources[resource_type].pop(resource['id'], None)
+        return self.__outcome(200, f'Successfully deleted {len(matched)} resource(s)', 'information')
+
+
+    def __search(self, resource_type: str, query: dict) -> Tuple[int, dict]:
+        status, matched = self.__match(resource_type, query)
+        if status != 200:
+            return status, matched
+
+        # Pagination
+        count = int(query.get('_count', ['100'])[-1])
+        offset = int(query.get('_offset', ['0'])[-1])
+        page = matched[offset:offset + count]
+        elements = query.get('_elements', [''])[-1]
+        if elements:
+            keep = {'resourceType', 'id', 'meta'} | set(elements.split(','))
+            page = [{k: v for k, v in resource.items() if k in keep} for resource in page]
+
+        links = [{'relation': 'self', 'url': self.__page_url(resource_type, query, offset)}]
+        if offset + count < len(matched):
+            links.append({'relation': 'next', 'url': self.__page_url(resource_type, query, offset + count)})
+        return 200, {
+            'resourceType': 'Bundle',
+            'type': 'searchset',
+            'total': len(matched),
+            'link': links,
+            'entry': [{'fullUrl': f"{self.base_url}/{resource_type}/{r['id']}", 'resource': r, 'search': {'mode': 'match'}} for r in page],
+        }
+
+
+    def __match(self, resource_type: str, query: dict) -> Tuple[int, list[dict]]:
+        """
+        Find the resources matching every search parameter. Comma-separated values of a parameter are ORed.
+        """
+        matched = list(self.resources.get(resource_type, {}).values())
+        for key, values in query.items():
+            if key in ['_count', '_offset', '_elements', '_format']:
+                continue
+            for value in values:
+                options = value.split(',')
+                if key == '_id':
+                    matched = [r for r in matched if r['id'] in options]
+                elif key == '_tag':
+                    matched = [r for r in matched if any(self.__match_token(tag, option) for tag in r.get('meta', {}).get('tag', []) for option in options)]
+                elif key == '_lastUpdated':
+                    matched = [r for r in matched if self.__match_date(r.get('meta', {}).get('lastUpdated'), value)]
+                elif key in self.SEARCH_PARAMS:
+                    getter = self.SEARCH_PARAMS[key]
+                    matched = [r for r in matched if any(self.__match_value(key, v, option) for v in getter(r) if v for option in options)]
+                else:
+                    return self.__outcome(400, f'Unknown search parameter `{key}` for resource type {resource_type}')
+        return 200, matched
+
+
+    def __match_value(self, key: str, value: str, option: str) -> bool:
+        if key.endswith(':text'):
+            return value.lower().startswith(option.lower())
+        if key in self.REFERENCE_PARAMS:
+            return value == option or value.endswith(f'/{option}')
+        return value == option
+
+
+    @staticmethod
+    def __match_token(coding: dict, option: str) -> bool:
+        if '|' in option:
+            system, code = option.split('|', 1)
+            return (not system or coding.get('system') == system) and coding.get('code') == code
+        return coding.get('code') == option
+
+
+    @staticmethod
+    def __match_date(last_updated: Optional[str], value: str) -> bool:
+        if not last_updated:
+            return False
+        prefix, value = (value[:2], value[2:]) if value[:2] in ['eq', 'ne', 'gt', 'lt', 'ge', 'le'] else ('eq', value)
+        target, base = datetime.fromisoformat(last_updated), datetime.fromisoformat(value)
+        if base.tzinfo is None:
+            base = base.replace(tzinfo=timezone.utc)
+        return {
+            'eq': target == base, 'ne': target != base, 'gt': target > base,
+            'lt': target < base, 'ge': target >= base, 'le': target <= base
+        }[prefix]
+
+
+    def __bundle(self, bundle: dict) -> Tuple[int, dict]:
+        """
+        Process the entries of a `batch` or `transaction` Bundle. A transaction is rolled back if any entry fails.
+        """
+        bundle_type = bundle.get('type')
+        if bundle_type not in ['batch', 'transaction']:
+            return self.__outcome(400, 'Bundle type must be either `batch` or `transaction`')
+
+        snapshot = {k: dict(v) for k, v in self.resources.items()} if bundle_type == 'transaction' else None
+        response_entries = list()
+        for entry in bundle.get('entry', []):
+            request = entry.get('request', {})
+            method, url = request.get('method'), request.get('url', '')
+            status, body = self.__dispatch(method, f'{self.base_url}/{url}', entry.get('resource'))
+            response_entries.append({'response': {'status': f'{status} {HTTPStatus(status).phrase}'}, **({'resource': body} if method != 'DELETE' else {})})
+
+            if snapshot is not None and not 200 <= status < 300:
+                self.resources = snapshot
+                return self.__outcome(400, f'Transaction failed at {method} {url} with status code {status}')
+
+        return 200, {'resourceType': 'Bundle', 'type': f'{bundle_type}-response', 'entry': response_entries}
+
+
+    def __page_url(self, resource_type: str, query: dict, offset: int) -> str:
+        params = {k: v for k, v in query.items() if k != '_offset'}
+        params['_offset'] = [str(offset)]
+        return f'{self.base_url}/{resource_type}?{urlencode(params, doseq=True)}'
+
+
+    @staticmethod
+    def __outcome(status: int, message: str, severity: str = 'error') -> Tuple[int, dict]:
+        return status, {
+            'resourceType': 'OperationOutcome',
+            'issue': [{'severity': severity, 'code': 'processing' if severity == 'error' else 'informational', 'diagnostics': message}]
+        }
+
+
+
+class InMemoryFHIRAdapter(BaseAdapter):
+    def __init__(self, server: InMemoryFHIRServer):
+        """
+        Transport adapter of `requests` that routes the requests of a `memory://` URL to an in-memory FHIR server.
+
+        Args:
+            server (InMemoryFHIRServer): The in-memory FHIR server.
+        """
+        super().__init__()
+        self.server = server
+
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        body = None
+        if request.body:
+            body = json.loads(request.body.decode('utf-8') if isinstance(request.body, bytes) else request.body)
+        status, content = self.server.handle(request.method, request.url, body)
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response.headers['Content-Type'] = 'application/fhir+json'
+        response._content = json.dumps(content).encode('utf-8') if content is not None else b''
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+
+    def close(self):
+        pass
+
+
+
+_SERVERS = dict()
+_SERVERS_LOCK = threading.Lock()
+
+
+def get_memory_server(fhir_url: str) -> InMemoryFHIRServer:
+    """
+    Get the in-memory FHIR server of a `memory://` URL. Servers are shared by the host of the URL within the process,
+    so that the data uploader, the simulator, and the hospital environments see the same resources (e.g., 'memory://local/fhir').
+
+    Args:
+        fhir_url (str): Base URL of the server in `memory://{name}/...` format.
+
+    Returns:
+        InMemoryFHIRServer: The in-memory FHIR server.
+    """
+    split = urlsplit(fhir_url)
+    if split.scheme != MEMORY_SCHEME:
+        raise ValueError(f'In-memory FHIR URL must start with `{MEMORY_SCHEME}://`, but got {fhir_url}')
+
+    with _SERVERS_LOCK:
+        if split.netloc not in _SERVERS:
+            _SERVERS[split.netloc] = InMemoryFHIRServer(fhir_url)
+            log(f'In-memory FHIR server is created: {fhir_url}')
+        return _SERVERS[split.netloc]
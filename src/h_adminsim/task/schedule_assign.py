@@ -1,11 +1,8 @@
 import random
 from typing import Tuple, Optional
 
-from h_adminsim.utils.common_utils import (
-    convert_segment_to_time,
-    convert_time_to_segment, 
-    group_consecutive_segments,
-)
+from h_adminsim.utils.time_utils import get_time_grid
+from h_adminsim.utils.common_utils import group_consecutive_segments
 
 
 
@@ -25,7 +22,8 @@ class ScheduleAssigner:
         self.start = start
         self.end = end
         self.interval = interval
-        self.segments = convert_time_to_segment(self.start, self.end, self.interval)
+        self.grid = get_time_grid(self.start, self.end, self.interval)
+        self.segments = self.grid.to_segments()
 
 
     def schedule_segment_assign(self,
@@ -147,5 +145,5 @@ class ScheduleAssigner:
             if is_appointment else self.schedule_segment_assign(p, segments)
 
         if len(time_segments):
-            return time_segments, [list(convert_segment_to_time(self.start, self.end, self.interval, segments)) for segments in  time_segments]
+            return time_segments, [list(self.grid.to_time(segments)) for segments in time_segments]
         return [], []
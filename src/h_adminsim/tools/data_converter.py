@@ -1,19 +1,92 @@
 import os
+import orjson
 from tqdm import tqdm
 from typing import Optional
 
 from h_adminsim.utils import Information, log
 from h_adminsim.utils.fhir_utils import *
 from h_adminsim.utils.filesys_utils import json_load, json_save_fast, get_files
+from h_adminsim.utils.time_utils import get_time_grid
 from h_adminsim.utils.common_utils import (
     get_iso_time,
     get_utc_offset,
-    convert_time_to_segment,
-    convert_segment_to_time,
 )
 
 
 
+class FHIRResourceWriter:
+    def __init__(self,
+                 output_dir: Optional[str],
+                 resource_dir: str,
+                 hospital_name: str,
+                 output_format: str = 'json',
+                 sanity_check: bool = False):
+        """
+        Writer of the converted FHIR resources of a single resource type and hospital.
+
+        In `json` format, each resource is saved to `{output_dir}/{resource_dir}/{id}.fhir.json`.
+        In `ndjson` format (FHIR Bulk Data style), the resources are streamed line by line to `{output_dir}/{resource_dir}/{hospital}.ndjson`,
+        so that a hospital produces one file per resource type instead of one file per resource.
+        If `output_dir` is None, nothing is written.
+
+        Args:
+            output_dir (Optional[str]): Root directory of the converted FHIR resources.
+            resource_dir (str): Sub-directory name of the resource type (e.g., 'slot').
+            hospital_name (str): Hospital name.
+            output_format (str, optional): Either `json` or `ndjson`. Defaults to 'json'.
+            sanity_check (bool, optional): If True, asserts that no resource is written twice. Defaults to False.
+        """
+        assert output_format in ['json', 'ndjson'], log(f"Output format must be either `json` or `ndjson`, but got {output_format}", "error")
+
+        # Initialize
+        self.output_format = output_format
+        self.sanity_check = sanity_check
+        self.save_dir = None
+        self._file = None
+        self._ids = set()
+
+        if output_dir:
+            self.save_dir = os.path.join(output_dir, resource_dir)
+            os.makedirs(self.save_dir, exist_ok=True)
+            if output_format == 'ndjson':
+                save_path = os.path.join(self.save_dir, f'{sanitize_id(hospital_name)}.ndjson')
+                if sanity_check:
+                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
+                self._file = open(save_path, 'wb')
+
+
+    def write(self, resource: dict):
+        """
+        Write a single FHIR resource.
+
+        Args:
+            resource (dict): FHIR resource.
+        """
+        if not self.save_dir:
+            return
+        
+        if self._file is not None:
+            if self.sanity_check:
+                assert resource['id'] not in self._ids, log(f"Same resource exists: {resource['resourceType']}/{resource['id']}", "error")
+                self._ids.add(resource['id'])
+            self._file.write(orjson.dumps(resource) + b'\n')
+        else:
+            save_path = os.path.join(self.save_dir, f"{resource['id']}.fhir.json")
+            if self.sanity_check:
+                assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
+            json_save_fast(save_path, resource)
+
+
+    def close(self):
+        """
+        Close the NDJSON file, if any.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+
 class DataConverter:
     def __init__(self, config):
         # Initialize configuration
@@ -23,27 +96,28 @@ class DataConverter:
     
 
     @staticmethod
-    def data_to_practitioner(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_practitioner(data: dict,
+                             output_dir: Optional[str] = None,
+                             sanity_check: bool = False,
+                             output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `Practitioner` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted Practitioner resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR Practitioner resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'practitioner'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'practitioner')
-        
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'practitioner', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         practitioners = list()
 
@@ -57,6 +131,7 @@ class DataConverter:
             practitioner_obj = {
                 'resourceType': 'Practitioner',
                 'id': practitioner_id,
+                'meta': {'tag': [get_hospital_tag(hospital_name)]},
                 'active': True,
                 'name': [
                     {
@@ -71,40 +146,35 @@ class DataConverter:
             }
             practitioners.append(practitioner_obj)
 
-            if save_dir:
-                save_path = os.path.join(save_dir, f'{practitioner_id}.fhir.json')
-                if sanity_check:
-                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                json_save_fast(
-                    save_path,
-                    practitioner_obj
-                )
-        
+            writer.write(practitioner_obj)
+
+        writer.close()
         return practitioners
     
 
     @staticmethod
-    def data_to_practitionerrole(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_practitionerrole(data: dict,
+                                 output_dir: Optional[str] = None,
+                                 sanity_check: bool = False,
+                                 output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `PractitionerRole` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted PractitionerRole resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR PractitionerRole resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'practitionerrole'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'practitionerrole')
-        
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'practitionerrole', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         practitionerroles = list()
 
@@ -118,6 +188,7 @@ class DataConverter:
             practitionerrole_obj = {
                 'resourceType': 'PractitionerRole',
                 'id': practitionerrole_id,
+                'meta': {'tag': [get_hospital_tag(hospital_name)]},
                 'active': True,
                 'specialty': [
                     {
@@ -148,40 +219,35 @@ class DataConverter:
             }
             practitionerroles.append(practitionerrole_obj)
 
-            if save_dir:
-                save_path = os.path.join(save_dir, f'{practitionerrole_id}.fhir.json')
-                if sanity_check:
-                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                json_save_fast(
-                    save_path,
-                    practitionerrole_obj
-                )
-        
+            writer.write(practitionerrole_obj)
+
+        writer.close()
         return practitionerroles
 
 
     @staticmethod
-    def data_to_patient(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_patient(data: dict,
+                        output_dir: Optional[str] = None,
+                        sanity_check: bool = False,
+                        output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `Patient` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted Patient resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR Patient resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'patient'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'patient')
-        
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'patient', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         patients = list()
 
@@ -195,6 +261,7 @@ class DataConverter:
             patient_obj = {
                 'resourceType': 'Patient',
                 'id': patient_id,
+                'meta': {'tag': [get_hospital_tag(hospital_name)]},
                 'active': True,
                 'name': [
                     {
@@ -210,40 +277,35 @@ class DataConverter:
             }
             patients.append(patient_obj)
 
-            if save_dir:
-                save_path = os.path.join(save_dir, f'{patient_id}.fhir.json')
-                if sanity_check:
-                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                json_save_fast(
-                    save_path,
-                    patient_obj
-                )
-        
+            writer.write(patient_obj)
+
+        writer.close()
         return patients
 
 
     @staticmethod
-    def data_to_schedule(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_schedule(data: dict,
+                         output_dir: Optional[str] = None,
+                         sanity_check: bool = False,
+                         output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `Schedule` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted Schedule resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR Schedule resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'schedule'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'schedule')
-
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'schedule', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         country_code = data.get('metadata').get('country_code', 'KR')
         time_zone = data.get('metadata').get('timezone', None)
@@ -263,46 +325,42 @@ class DataConverter:
             schedule_obj = {
                 'resourceType': 'Schedule',
                 'id': schedule_id,
+                'meta': {'tag': [get_hospital_tag(hospital_name)]},
                 'active': True,
                 'actor': [{'reference': f'Practitioner/{practitioner_id}'}],
                 'planningHorizon': {'start': start, 'end': end}
             }
             schedules.append(schedule_obj)
 
-            if save_dir:
-                save_path = os.path.join(save_dir, f'{schedule_id}.fhir.json')
-                if sanity_check:
-                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                json_save_fast(
-                    save_path,
-                    schedule_obj
-                )
+            writer.write(schedule_obj)
 
+        writer.close()
         return schedules
 
 
     @staticmethod
-    def data_to_slot(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_slot(data: dict,
+                     output_dir: Optional[str] = None,
+                     sanity_check: bool = False,
+                     output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `Slot` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted Slot resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR Slot resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'slot'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'slot')
-
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'slot', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         country_code = data.get('metadata').get('country_code', 'KR')
         time_zone = data.get('metadata').get('timezone', None)
@@ -310,7 +368,8 @@ class DataConverter:
         start_hour = data.get('metadata')['time']['start_hour']
         end_hour = data.get('metadata')['time']['end_hour']
         interval_hour = data.get('metadata')['time']['interval_hour']
-        entire_segments = convert_time_to_segment(start_hour, end_hour, interval_hour)
+        grid = get_time_grid(start_hour, end_hour, interval_hour)
+        entire_segments = grid.to_segments()
         slots = list()
 
         for doctor_name, doctor_values in data['doctor'].items():
@@ -324,18 +383,19 @@ class DataConverter:
                 # Filtering fixed schedule
                 fixed_schedule = []
                 for schedule in schedules:
-                    fixed_schedule += convert_time_to_segment(start_hour, end_hour, interval_hour, schedule)
+                    fixed_schedule += grid.to_segments(schedule)
 
                 # Appointment available time segments
                 free_schedule = sorted(list(set(entire_segments) - set(fixed_schedule)))
 
                 # Add slot as a `busy` status
                 for seg in fixed_schedule:
-                    st, tr = convert_segment_to_time(start_hour, end_hour, interval_hour, [seg])
+                    st, tr = grid.segment_start_hours[seg], grid.segment_end_hours[seg]
                     slot_id = get_slot_id(practitioner_id, date, seg)
                     slot_obj = {
                         'resourceType': 'Slot',
                         'id': slot_id,
+                        'meta': {'tag': [get_hospital_tag(hospital_name)]},
                         'schedule': {'reference': f'Schedule/{get_schedule_id(practitioner_id)}'},
                         'status': 'busy',
                         'start': get_iso_time(st, date, utc_offset),
@@ -343,22 +403,16 @@ class DataConverter:
                     }
                     slots.append(slot_obj)
 
-                    if save_dir:
-                        save_path = os.path.join(save_dir, f'{slot_id}.fhir.json')
-                        if sanity_check:
-                            assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                        json_save_fast(
-                            save_path,
-                            slot_obj
-                        )
+                    writer.write(slot_obj)
                 
                 # Add slot as a `free` status
                 for seg in free_schedule:
                     slot_id = get_slot_id(practitioner_id, date, seg)
-                    st, tr = convert_segment_to_time(start_hour, end_hour, interval_hour, [seg])
+                    st, tr = grid.segment_start_hours[seg], grid.segment_end_hours[seg]
                     slot_obj = {
                         'resourceType': 'Slot',
                         'id': slot_id,
+                        'meta': {'tag': [get_hospital_tag(hospital_name)]},
                         'schedule': {'reference': f'Schedule/{get_schedule_id(practitioner_id)}'},
                         'status': 'free',
                         'start': get_iso_time(st, date, utc_offset),
@@ -366,40 +420,35 @@ class DataConverter:
                     }
                     slots.append(slot_obj)
                 
-                    if save_dir:
-                        save_path = os.path.join(save_dir, f'{slot_id}.fhir.json')
-                        if sanity_check:
-                            assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                        json_save_fast(
-                            save_path,
-                            slot_obj
-                        )
+                    writer.write(slot_obj)
 
+        writer.close()
         return slots
 
 
     @staticmethod
-    def data_to_appointment(data: dict, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[dict]:
+    def data_to_appointment(data: dict,
+                            output_dir: Optional[str] = None,
+                            sanity_check: bool = False,
+                            output_format: str = 'json') -> list[dict]:
         """
         Convert synthetic hospital data into `Appointment` FHIR resources. 
 
         Args:
             data (dict): Synthetic hospital data containing doctor information.
             output_dir (Optional[str], optional): Directory path to save the converted Appointment resources 
-                                                  as `.fhir.json` files. If None, the resources are not saved to disk.
+                                                  as files. If None, the resources are not saved to disk.
                                                   Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per hospital, written line by line). Defaults to 'json'.
 
         Returns:
             list[dict]: A list of converted FHIR Appointment resource objects.
         """
-        save_dir = None
-        if output_dir:
-            os.makedirs(os.path.join(output_dir, 'appointment'), exist_ok=True)
-            save_dir = os.path.join(output_dir, 'appointment')
-
         hospital_name = data.get('metadata')['hospital_name']
+        writer = FHIRResourceWriter(output_dir, 'appointment', hospital_name, output_format, sanity_check)
         department_data = data.get('department')
         country_code = data.get('metadata').get('country_code', 'KR')
         time_zone = data.get('metadata').get('timezone', None)
@@ -407,6 +456,7 @@ class DataConverter:
         start_hour = data.get('metadata')['time']['start_hour']
         end_hour = data.get('metadata')['time']['end_hour']
         interval_hour = data.get('metadata')['time']['interval_hour']
+        grid = get_time_grid(start_hour, end_hour, interval_hour)
         appointments = list()
 
         for patient_name, patient_values in data['patient'].items():
@@ -429,11 +479,12 @@ class DataConverter:
             # Filtering fixed schedule
             date = patient_values['date']
             schedule_time_range = patient_values['schedule']
-            schedule_segments = convert_time_to_segment(start_hour, end_hour, interval_hour, schedule_time_range)
+            schedule_segments = grid.to_segments(schedule_time_range)
             appointment_id = get_appointment_id(practitioner_id, date, schedule_segments[0], schedule_segments[-1])
             appointment_obj = {
                 'resourceType': 'Appointment',
                 'id': appointment_id,
+                'meta': {'tag': [get_hospital_tag(hospital_name)]},
                 'status': 'booked',
                 'start': get_iso_time(schedule_time_range[0], date, utc_offset),
                 'end': get_iso_time(schedule_time_range[-1], date, utc_offset),
@@ -442,15 +493,9 @@ class DataConverter:
             }
             appointments.append(appointment_obj)
 
-            if save_dir:
-                save_path = os.path.join(save_dir, f'{appointment_id}.fhir.json')
-                if sanity_check:
-                    assert not os.path.exists(save_path), log(f"Same file exists: {save_path}", "error")
-                json_save_fast(
-                    save_path,
-                    appointment_obj
-                )
-            
+            writer.write(appointment_obj)
+
+        writer.close()
         return appointments
     
     
@@ -498,15 +543,20 @@ class DataConverter:
             return gt_resource
     
 
-    def __call__(self, output_dir: Optional[str] = None, sanity_check: bool = False) -> list[Information]:
+    def __call__(self,
+                 output_dir: Optional[str] = None,
+                 sanity_check: bool = False,
+                 output_format: str = 'json') -> list[Information]:
         """
         Convert synthetic hospital data files into FHIR resources and optionally save them to disk.
 
         Args:
-            output_dir (Optional[str], optional): Directory to save the converted FHIR resources as `.fhir.json` files.
+            output_dir (Optional[str], optional): Directory to save the converted FHIR resources.
                                                   If None, the resources will not be saved. Defaults to None.
             sanity_check (bool, optional): If True, performs a sanity check to ensure the uniqueness of the generated FHIR data.
                                            This only applies when output_dir is specified. Defaults to False.
+            output_format (str, optional): Output file format, either `json` (one `.fhir.json` file per resource) or
+                                           `ndjson` (one `.ndjson` file per resource type and hospital). Defaults to 'json'.
 
         Returns:
             list[Information]: An object containing the converted FHIR resources, including practitioners, schedules, slots, patients, and appointments.
@@ -516,12 +566,12 @@ class DataConverter:
         
         for data_file in tqdm(self.data_files, desc='Converting to FHIR data..'):
             data = json_load(data_file)
-            practitioners = DataConverter.data_to_practitioner(data, output_dir, sanity_check)
-            practitionerroles = DataConverter.data_to_practitionerrole(data, output_dir, sanity_check)
-            schedules = DataConverter.data_to_schedule(data, output_dir, sanity_check)
-            slots = DataConverter.data_to_slot(data, output_dir, sanity_check)
-            patients = DataConverter.data_to_patient(data, output_dir, sanity_check)
-            appointments = DataConverter.data_to_appointment(data, output_dir, sanity_check)
+            practitioners = DataConverter.data_to_practitioner(data, output_dir, sanity_check, output_format)
+            practitionerroles = DataConverter.data_to_practitionerrole(data, output_dir, sanity_check, output_format)
+            schedules = DataConverter.data_to_schedule(data, output_dir, sanity_check, output_format)
+            slots = DataConverter.data_to_slot(data, output_dir, sanity_check, output_format)
+            patients = DataConverter.data_to_patient(data, output_dir, sanity_check, output_format)
+            appointments = DataConverter.data_to_appointment(data, output_dir, sanity_check, output_format)
 
             information = Information(
                 practitioners=practitioners,
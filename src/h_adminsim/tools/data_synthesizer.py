@@ -8,6 +8,7 @@ from decimal import Decimal, getcontext
 from h_adminsim.task.schedule_assign import ScheduleAssigner
 from h_adminsim.utils import Information, log, colorstr
 from h_adminsim.utils.common_utils import *
+from h_adminsim.utils.time_utils import get_time_grid
 from h_adminsim.utils.filesys_utils import json_load, txt_load, yaml_save, make_project_dir, json_save_fast
 from h_adminsim.utils.random_utils import (
     generate_random_prob,
@@ -109,7 +110,7 @@ class DataSynthesizer:
         doctor_n = sum(doctor_n_per_department)
         doctor_capacity_per_hour_list = [c for c in range(config.hospital_data.doctor_capacity_per_hour.min, config.hospital_data.doctor_capacity_per_hour.max + 1) \
                                          if float(Decimal(str(1))/Decimal(str(c)) % Decimal(str(interval_hour))) == 0]
-        hospital_time_segments = convert_time_to_segment(start_hour, end_hour, interval_hour)
+        hospital_time_segments = get_time_grid(start_hour, end_hour, interval_hour).to_segments()
         metadata = Information(
             hospital_name=hospital_name,
             start_date=dates[0],
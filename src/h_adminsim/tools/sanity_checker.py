@@ -81,53 +81,46 @@ class SanityChecker:
         # Init grount thruth values
         department = gt_patient_condition['department']
         preference_type = gt_patient_condition['preference']
-        valid_from = gt_patient_condition['valid_from']
-        fixed_schedules = environment.get_doctor_schedule(doctor_information=doctor_information, department=department)['doctor']
+        clock = environment.clock
+        valid_from = clock.from_iso(gt_patient_condition['valid_from']) if gt_patient_condition['valid_from'] else None
+        availability = environment.availability.sync(doctor_information)
 
         # Get predicted results
         pred_doctor_name = list(prediction['schedule'].keys())[0]
         pred_start = prediction['schedule'][pred_doctor_name]['start']
         pred_end = prediction['schedule'][pred_doctor_name]['end']
         pred_date = prediction['schedule'][pred_doctor_name]['date']
-        current_time = environment.current_time
-        utc_offset = environment._utc_offset
+        pred_date_timestamp = clock.date_to_epoch(pred_date)
+        current_timestamp = environment.current_timestamp
 
         # Time segments
-        prediction_schedule_segments = convert_time_to_segment(self._START_HOUR,
-                                                               self._END_HOUR,
-                                                               self._TIME_UNIT,
-                                                               [pred_start, pred_end])
+        prediction_schedule_segments = availability.grid.to_segments([pred_start, pred_end])
         
-        for k, v in fixed_schedules.items():
+        for k in availability.doctors(department):
             if preference_type == 'doctor' and k != pred_doctor_name:
                 continue
             
-            min_time_slot_n = int(Decimal(str(v['outpatient_duration'])) / Decimal(str(self._TIME_UNIT)))
-            fixed_schedule = v['schedule']
-            for date, schedule in fixed_schedule.items():
+            for date in availability.dates(k):
+                date_timestamp = clock.date_to_epoch(date)
+
                 # date > pred_date case
-                if compare_iso_time(date, pred_date):
+                if date_timestamp > pred_date_timestamp:
                     continue
                 
                 # valid_from > date case (preference == 'date' case)
-                if valid_from and compare_iso_time(valid_from, date):
+                if valid_from and valid_from > date_timestamp:
                     continue
 
-                fixed_schedule_segments = sum([convert_time_to_segment(self._START_HOUR, 
-                                                                       self._END_HOUR, 
-                                                                       self._TIME_UNIT, 
-                                                                       fs) for fs in schedule], [])
-                all_time_segments = convert_time_to_segment(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
-                free_time = [s for s in range(len(all_time_segments)) if s not in fixed_schedule_segments]
+                # The earliest free run which starts after the current time and is long enough for an appointment
+                from_segment = availability.first_segment_after(date, current_timestamp)
+                if from_segment is None:
+                    continue
+                earliest_segment = availability.earliest_start(k, date, from_segment, head_only=True)
+                if earliest_segment is None:
+                    continue
                 
-                if len(free_time):
-                    valid_time_segments = [seg for seg in group_consecutive_segments(free_time) if len(seg) >= min_time_slot_n]
-                    for valid_time in valid_time_segments:
-                        if (valid_time[0] < prediction_schedule_segments[0] and pred_date == date) or (len(valid_time) and compare_iso_time(pred_date, date)):
-                            free_max_st, _ = convert_segment_to_time(self._START_HOUR, self._END_HOUR, self._TIME_UNIT, [valid_time[0]])
-                            free_max_st_iso = get_iso_time(free_max_st, date, utc_offset=utc_offset)
-                            if compare_iso_time(free_max_st_iso, current_time):
-                                return False
+                if pred_date != date or earliest_segment < prediction_schedule_segments[0]:
+                    return False
         return True
     
 
@@ -166,10 +159,9 @@ class SanityChecker:
             end = prediction['schedule'][pred_doctor_name]['end']
             date = prediction['schedule'][pred_doctor_name]['date']
             fixed_schedules = doctor_information[pred_doctor_name]['schedule']
-            start_iso_time = get_iso_time(start, date, utc_offset=environment._utc_offset)
             assert isinstance(start, float) and isinstance(end, float) and isinstance(date, str) \
                 and start < end and start >= self._START_HOUR and end <= self._END_HOUR \
-                and compare_iso_time(start_iso_time, environment.current_time) and date in fixed_schedules
+                and environment.clock.to_epoch(start, date) > environment.current_timestamp and date in fixed_schedules
             assert gt_patient_condition['department'] == doctor_information[pred_doctor_name]['department']
             
             # Duration mismatched case
@@ -182,16 +174,9 @@ class SanityChecker:
             return False, STATUS_CODES['schedule']    # Invalid schedule times or department
 
         ####################### Check the duplication of the schedules #######################
-        prediction_schedule_segments = convert_time_to_segment(self._START_HOUR,
-                                                               self._END_HOUR,
-                                                               self._TIME_UNIT,
-                                                               [start, end])
-        fixed_schedule_segments = sum([convert_time_to_segment(self._START_HOUR, 
-                                                               self._END_HOUR, 
-                                                               self._TIME_UNIT, 
-                                                               fs) for fs in fixed_schedules[date]], [])
+        availability = environment.availability.sync(doctor_information)
         
-        if len(set(prediction_schedule_segments) & set(fixed_schedule_segments)):
+        if availability.occupied[pred_doctor_name][date] & availability.to_bitmap([[start, end]]):
             return False, STATUS_CODES['conflict']['time']    # Overlaps with an existing schedule
         
         ####################### Check the patient's preferences  #######################
@@ -200,7 +185,7 @@ class SanityChecker:
                 return False, STATUS_CODES['preference']['physician']
         
         if gt_patient_condition['preference'] == 'date':
-            if compare_iso_time(gt_patient_condition.get('valid_from'), date):
+            if environment.clock.from_iso(gt_patient_condition.get('valid_from')) > environment.clock.date_to_epoch(date):
                 return False, STATUS_CODES['preference']['date']
         
         is_earliest = self.__check_is_earliest(
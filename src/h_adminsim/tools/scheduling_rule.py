@@ -1,21 +1,20 @@
 from copy import deepcopy
-from decimal import Decimal
-from typing import Optional
+from typing import Tuple, Optional, NamedTuple
 from langchain.tools import tool
 from langchain.agents import AgentExecutor
 
 from .data_converter import DataConverter
 from h_adminsim.registry import STATUS_CODES
-from h_adminsim.utils import log
+from h_adminsim.utils import log, colorstr
 from h_adminsim.utils.fhir_utils import *
-from h_adminsim.utils.common_utils import (
-    group_consecutive_segments,
-    convert_segment_to_time,
-    convert_time_to_segment,
-    init_result_dict,
-    compare_iso_time,
-    get_iso_time,
-)
+from h_adminsim.utils.common_utils import init_result_dict
+
+
+
+class ScheduleCandidate(NamedTuple):
+    doctor: str
+    date: str
+    start: float
 
 
 
@@ -26,7 +25,8 @@ class SchedulingRule:
                  environment, 
                  fhir_intergration: bool = False):
         self.environment = environment
-        self._current_time = self.environment.current_time
+        self.clock = self.environment.clock
+        self._current_timestamp = self.environment.current_timestamp
         self._utc_offset = self.environment._utc_offset
         self._metadata = metadata
         self._department_data = department_data
@@ -37,6 +37,44 @@ class SchedulingRule:
         self.fhir_integration = fhir_intergration
 
 
+    def _get_availability(self, filtered_doctor_information: dict):
+        """
+        Get the availability index that reflects the given filtered doctor information.
+
+        Args:
+            filtered_doctor_information (dict): Filtered doctor information after department filtering.
+
+        Returns:
+            AvailabilityIndex: The hospital availability index, or a standalone one built from the filtered information
+                               when the schedules come from FHIR.
+        """
+        if not self.fhir_integration and self.environment.availability.is_synced():
+            return self.environment.availability
+        return self.environment.build_availability(filtered_doctor_information['doctor'])
+
+
+    def _collect_candidates(self, availability, doctor: str, dates: list[str]) -> list[str]:
+        """
+        Collect all feasible start times of a doctor on the given dates that are later than the current time.
+
+        Args:
+            availability (AvailabilityIndex): Availability index of the hospital.
+            doctor (str): Doctor name.
+            dates (list[str]): Target dates (YYYY-MM-DD).
+
+        Returns:
+            list[str]: Candidate schedules in the format "doctor;;;iso_time".
+        """
+        candidate_schedules = list()
+        for date in dates:
+            from_segment = availability.first_segment_after(date, self._current_timestamp)
+            if from_segment is None:
+                continue
+            for segment in availability.iter_starts(doctor, date, from_segment):
+                candidate_schedules.append(f"{doctor};;;{availability.segment_to_iso(date, segment, self._utc_offset)}")
+        return candidate_schedules
+
+
     def physician_filter(self, filtered_doctor_information: dict, preferred_doctor: str) -> list[str]:
         """
         Filter schedules by preferred doctor.
@@ -48,31 +86,11 @@ class SchedulingRule:
         Returns:
             list[str]: A set of candidate schedules that match the preferred doctor.
         """
-        candidate_schedules = set()
-        schedule_info = filtered_doctor_information['doctor'][preferred_doctor]
-        schedule_candidates = schedule_info['schedule']
-        min_time_slot_n = int(Decimal(str(schedule_info['outpatient_duration'])) / Decimal(str(self._TIME_UNIT)))
-        dates = sorted(list(schedule_candidates.keys()))
-        for date in dates:
-            schedule = schedule_candidates[date]
-            fixed_schedule_segments = sum([convert_time_to_segment(self._START_HOUR, 
-                                                                    self._END_HOUR, 
-                                                                    self._TIME_UNIT, 
-                                                                    fs) for fs in schedule], [])
-            all_time_segments = convert_time_to_segment(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
-            free_time = [s for s in range(len(all_time_segments)) if s not in fixed_schedule_segments]
-            
-            if len(free_time):
-                valid_time_segments = [seg for seg in group_consecutive_segments(free_time) if len(seg) >= min_time_slot_n]
-                for valid_time in valid_time_segments:
-                    for i in range(len(valid_time) - min_time_slot_n + 1):
-                        time_slot = valid_time[i:i+min_time_slot_n]
-                        free_max_st, _ = convert_segment_to_time(self._START_HOUR, self._END_HOUR, self._TIME_UNIT, [time_slot[0]])
-                        free_max_st_iso = get_iso_time(free_max_st, date, utc_offset=self._utc_offset)
-                        if compare_iso_time(free_max_st_iso, self._current_time):
-                            candidate_schedules.add(f"{preferred_doctor};;;{free_max_st_iso}")
-
-        return list(candidate_schedules)
+        if preferred_doctor not in filtered_doctor_information['doctor']:
+            raise KeyError(colorstr("red", f"Doctor not found in the filtered doctor information: {preferred_doctor}"))
+        
+        availability = self._get_availability(filtered_doctor_information)
+        return self._collect_candidates(availability, preferred_doctor, availability.dates(preferred_doctor))
     
 
     def date_filter(self, filtered_doctor_information: dict, valid_date: str) -> list[str]:
@@ -86,34 +104,15 @@ class SchedulingRule:
         Returns:
             list[str]: A set of candidate schedules that are on or after the valid date.
         """
-        candidate_schedules = set()
-        schedule_infos = filtered_doctor_information['doctor']
-
-        for doctor, schedule_info in schedule_infos.items():
-            min_time_slot_n = int(Decimal(str(schedule_info['outpatient_duration'])) / Decimal(str(self._TIME_UNIT)))
-            dates = sorted(list(schedule_info['schedule'].keys()))
-
-            for date in dates:
-                if not compare_iso_time(valid_date, date):
-                    schedule = schedule_info['schedule'][date]
-                    fixed_schedule_segments = sum([convert_time_to_segment(self._START_HOUR, 
-                                                                            self._END_HOUR, 
-                                                                            self._TIME_UNIT, 
-                                                                            fs) for fs in schedule], [])
-                    all_time_segments = convert_time_to_segment(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
-                    free_time = [s for s in range(len(all_time_segments)) if s not in fixed_schedule_segments]
-                    
-                    if len(free_time):
-                        valid_time_segments = [seg for seg in group_consecutive_segments(free_time) if len(seg) >= min_time_slot_n]
-                        for valid_time in valid_time_segments:
-                            for i in range(len(valid_time) - min_time_slot_n + 1):
-                                time_slot = valid_time[i:i+min_time_slot_n]
-                                free_max_st, _ = convert_segment_to_time(self._START_HOUR, self._END_HOUR, self._TIME_UNIT, [time_slot[0]])
-                                free_max_st_iso = get_iso_time(free_max_st, date, utc_offset=self._utc_offset)
-                                if compare_iso_time(free_max_st_iso, self._current_time):
-                                    candidate_schedules.add(f"{doctor};;;{free_max_st_iso}")
-
-        return list(candidate_schedules)
+        candidate_schedules = list()
+        valid_timestamp = self.clock.from_iso(valid_date)
+        availability = self._get_availability(filtered_doctor_information)
+
+        for doctor in filtered_doctor_information['doctor'].keys():
+            dates = [date for date in availability.dates(doctor) if not valid_timestamp > self.clock.date_to_epoch(date)]
+            candidate_schedules += self._collect_candidates(availability, doctor, dates)
+
+        return candidate_schedules
     
 
     def get_all(self, filtered_doctor_information: dict) -> list[str]:
@@ -126,35 +125,98 @@ class SchedulingRule:
         Returns:
             list[str]: A set of all candidate schedules without any filtering.
         """
-        candidate_schedules = set()
-        schedule_infos = filtered_doctor_information['doctor']
-
-        for doctor, schedule_info in schedule_infos.items():
-            min_time_slot_n = int(Decimal(str(schedule_info['outpatient_duration'])) / Decimal(str(self._TIME_UNIT)))
-            dates = sorted(list(schedule_info['schedule'].keys()))
-
-            for date in dates:
-                schedule = schedule_info['schedule'][date]
-                fixed_schedule_segments = sum([convert_time_to_segment(self._START_HOUR, 
-                                                                        self._END_HOUR, 
-                                                                        self._TIME_UNIT, 
-                                                                        fs) for fs in schedule], [])
-                all_time_segments = convert_time_to_segment(self._START_HOUR, self._END_HOUR, self._TIME_UNIT)
-                free_time = [s for s in range(len(all_time_segments)) if s not in fixed_schedule_segments]
-                
-                if len(free_time):
-                    valid_time_segments = [seg for seg in group_consecutive_segments(free_time) if len(seg) >= min_time_slot_n]
-                    for valid_time in valid_time_segments:
-                        for i in range(len(valid_time) - min_time_slot_n + 1):
-                            time_slot = valid_time[i:i+min_time_slot_n]
-                            free_max_st, _ = convert_segment_to_time(self._START_HOUR, self._END_HOUR, self._TIME_UNIT, [time_slot[0]])
-                            free_max_st_iso = get_iso_time(free_max_st, date, utc_offset=self._utc_offset)
-                            if compare_iso_time(free_max_st_iso, self._current_time):
-                                candidate_schedules.add(f"{doctor};;;{free_max_st_iso}")
-
-        return list(candidate_schedules)
+        candidate_schedules = list()
+        availability = self._get_availability(filtered_doctor_information)
+
+        for doctor in filtered_doctor_information['doctor'].keys():
+            candidate_schedules += self._collect_candidates(availability, doctor, availability.dates(doctor))
+
+        return candidate_schedules
     
 
+    def earliest_available(self,
+                           department: Optional[str] = None,
+                           doctor: Optional[str] = None,
+                           valid_from: Optional[str] = None,
+                           after: Optional[int] = None,
+                           filtered_doctor_information: Optional[dict] = None) -> list[ScheduleCandidate]:
+        """
+        Find the earliest available schedule(s) by walking the dates in order and stopping at the first date that has a free slot.
+
+        Args:
+            department (Optional[str], optional): Target department. If None, all doctors in the given information are considered. Defaults to None.
+            doctor (Optional[str], optional): If given, only this doctor is considered. Defaults to None.
+            valid_from (Optional[str], optional): If given, dates earlier than this date are skipped. Defaults to None.
+            after (Optional[int], optional): Only slots starting strictly after this time (epoch seconds) are considered. Defaults to the current time.
+            filtered_doctor_information (Optional[dict], optional): Filtered doctor information after department filtering. 
+                                                                    If not given, the environment availability index is used. Defaults to None.
+
+        Raises:
+            KeyError: If the given doctor does not belong to the target doctors.
+
+        Returns:
+            list[ScheduleCandidate]: Candidates sharing the earliest start time. Empty if no slot is available.
+        """
+        # Target doctors
+        if filtered_doctor_information is not None:
+            availability = self._get_availability(filtered_doctor_information)
+            doctors = [k for k, v in filtered_doctor_information['doctor'].items() if department is None or v['department'] == department]
+        else:
+            availability = self.environment.availability
+            doctors = availability.doctors(department)
+        
+        if doctor is not None:
+            if doctor not in doctors:
+                raise KeyError(colorstr("red", f"Doctor not found in the target doctors: {doctor}"))
+            doctors = [doctor]
+        
+        # Walk the dates in order
+        after = self._current_timestamp if after is None else after
+        valid_from = self.clock.from_iso(valid_from) if valid_from is not None else None
+        dates = sorted({date for k in doctors for date in availability.dates(k)})
+        for date in dates:
+            if valid_from is not None and valid_from > self.clock.date_to_epoch(date):
+                continue
+            
+            from_segment = availability.first_segment_after(date, after)
+            if from_segment is None:
+                continue
+
+            earliest_segment, earliest_doctors = None, list()
+            for k in doctors:
+                if date not in availability.occupied[k]:
+                    continue
+                segment = availability.earliest_start(k, date, from_segment)
+                if segment is None:
+                    continue
+                if earliest_segment is None or segment < earliest_segment:
+                    earliest_segment, earliest_doctors = segment, [k]
+                elif segment == earliest_segment:
+                    earliest_doctors.append(k)
+            
+            if earliest_segment is not None:
+                start = availability.segment_to_hour(earliest_segment)
+                return [ScheduleCandidate(k, date, start) for k in earliest_doctors]
+
+        return list()
+
+
+    def to_tool_result(self, candidates: list[ScheduleCandidate]) -> dict:
+        """
+        Convert the earliest schedule candidates into the tool calling result format.
+
+        Args:
+            candidates (list[ScheduleCandidate]): Candidates from `earliest_available`.
+
+        Returns:
+            dict: A dictionary containing the earliest doctor(s) and their corresponding schedule(s) in ISO format.
+        """
+        return {
+            'doctor': [c.doctor for c in candidates],
+            'schedule': [self.clock.to_iso(self.clock.to_epoch(c.start, c.date)) for c in candidates]
+        }
+
+
     def find_idx(self, patient_schedule_list: list[dict], patient_name: str, doctor_name: str, date: str) -> int:
         """
         Identify the index of the appointment corresponding to the patient's request
@@ -170,6 +232,10 @@ class SchedulingRule:
         Returns:
             int: The index of the appointment that matches the patient's request.
         """
+        # Indexed lookup of the environment schedule store (i.e., PatientScheduleStore)
+        if hasattr(patient_schedule_list, 'find'):
+            return patient_schedule_list.find(patient_name, doctor_name, date, status='scheduled')
+        
         for idx, patient_schedule in enumerate(patient_schedule_list):
             if patient_schedule['status'] == 'scheduled' and \
                 patient_schedule['patient'].lower() == patient_name.lower() and \
@@ -179,6 +245,50 @@ class SchedulingRule:
         return -1
 
 
+    def identify_schedule(self,
+                          task: str,
+                          patient_schedule_list: list[dict],
+                          patient_name: str,
+                          doctor_name: str,
+                          date: str,
+                          gt_idx: Optional[int] = None) -> Tuple[int, dict]:
+        """
+        Identify the appointment requested to be cancelled or rescheduled and evaluate it against the ground truth.
+
+        Args:
+            task (str): Request type. It must be either `cancel` or `reschedule`.
+            patient_schedule_list (list[dict]): A list of the patient's scheduled appointments.
+            patient_name (str): Name of the patient making the request.
+            doctor_name (str): Name of the doctor associated with the target appointment.
+            date (str): Date of the target appointment (YYYY-MM-DD).
+            gt_idx (Optional[int], optional): Ground-truth index of the appointment. Defaults to None.
+
+        Returns:
+            Tuple[int, dict]: The identified index and a result dictionary. The status of the result is None if there is no `gt_idx`.
+        """
+        result_dict = init_result_dict()
+        prefix = 'Dr.'
+        if prefix not in doctor_name:
+            doctor_name = f'{prefix} {doctor_name}'
+        index = self.find_idx(patient_schedule_list, patient_name, doctor_name, date)
+
+        # Update result_dict
+        if gt_idx is None:
+            result_dict['gt'].append({task: None})
+            result_dict['pred'].append({task: index})
+            result_dict['status'].append(None)
+            result_dict['status_code'].append(None)
+        else:
+            status = True if index == gt_idx else False
+            status_code = STATUS_CODES['correct'] if index == gt_idx else STATUS_CODES[task]['identify']
+            result_dict['gt'].append({task: gt_idx})
+            result_dict['pred'].append({task: index})
+            result_dict['status'].append(status)
+            result_dict['status_code'].append(status_code)
+        
+        return index, result_dict
+
+
     def find_earliest_time(self, schedules: list[str], delimiter: str = ';;;') -> dict:
         """
         Find the earliest schedule from the list of schedules.
@@ -190,18 +300,20 @@ class SchedulingRule:
         Returns:
             dict: A dictionary containing the earliest doctor(s) and their corresponding schedule(s).
         """
-        earliest_doctor, earliest_time = list(), list()
+        earliest_doctor, earliest_time, earliest_timestamp = list(), list(), None
 
         for schedule in schedules:
             doctor, iso_time = schedule.split(delimiter)
+            timestamp = self.clock.from_iso(iso_time)
 
             # skip when the slot is earlier than the current time
-            if not compare_iso_time(iso_time, self.current_time):
+            if not timestamp > self._current_timestamp:
                 continue
 
             if not len(earliest_doctor):
                 earliest_doctor.append(doctor) 
                 earliest_time.append(iso_time)
+                earliest_timestamp = timestamp
                 continue
             
             # Append if the iso_time is same with the alrealdy appended one
@@ -209,9 +321,10 @@ class SchedulingRule:
                 earliest_doctor.append(doctor)
                 earliest_time.append(iso_time)
             
-            elif compare_iso_time(earliest_time[0], iso_time):
+            elif earliest_timestamp > timestamp:
                 earliest_doctor = [doctor]
                 earliest_time = [iso_time]
+                earliest_timestamp = timestamp
         
         return {'doctor': earliest_doctor, 'schedule': earliest_time}
     
@@ -232,10 +345,9 @@ class SchedulingRule:
             dict: Updated doctor information after cancellation.
         """
         doctor, date, time = cancelled_schedule['attending_physician'], cancelled_schedule['date'], cancelled_schedule['schedule']
-        schedule_list = doctor_info[doctor]['schedule'][date]
 
         # Remove from doctor_information
-        schedule_list.remove(time)  # In-place logic
+        self.environment.remove_doctor_schedule(doctor_info, doctor, date, time)
 
         # Remove from FHIR
         if self.fhir_integration:
@@ -255,6 +367,8 @@ def create_tools(rule: SchedulingRule,
                  patient_schedule_list: Optional[list[dict]] = None,
                  gt_idx: Optional[int] = None,
                  only_schedule_tool: bool = False) -> list[tool]:
+    department = next((info.get('department') for info in doctor_info.get('doctor', {}).values()), None)
+
     @tool
     def physician_filter_tool(preferred_doctor: str) -> dict:
         """
@@ -270,9 +384,8 @@ def create_tools(rule: SchedulingRule,
         prefix = 'Dr.'
         if prefix not in preferred_doctor:
             preferred_doctor = f'{prefix} {preferred_doctor}'
-        schedules = rule.physician_filter(doctor_info, preferred_doctor)
-        schedule = rule.find_earliest_time(schedules)
-        return schedule
+        candidates = rule.earliest_available(department, doctor=preferred_doctor, filtered_doctor_information=doctor_info)
+        return rule.to_tool_result(candidates)
 
     @tool
     def date_filter_tool(valid_date: str) -> dict:
@@ -286,9 +399,8 @@ def create_tools(rule: SchedulingRule,
             dict: The earliest date-filtered time slot and its information.
         """
         log(f'[TOOL CALL] date_filter_tool | valid_date={valid_date}', color=True)
-        schedules = rule.date_filter(doctor_info, valid_date)
-        schedule = rule.find_earliest_time(schedules)
-        return schedule
+        candidates = rule.earliest_available(department, valid_from=valid_date, filtered_doctor_information=doctor_info)
+        return rule.to_tool_result(candidates)
 
     @tool
     def get_all_time_tool() -> dict:
@@ -299,9 +411,8 @@ def create_tools(rule: SchedulingRule,
             dict: The earliest time slot and its information.
         """
         log(f'[TOOL CALL] get_all_time_tool', color=True)
-        schedules = rule.get_all(doctor_info)
-        schedule = rule.find_earliest_time(schedules)
-        return schedule
+        candidates = rule.earliest_available(department, filtered_doctor_information=doctor_info)
+        return rule.to_tool_result(candidates)
 
     @tool
     def cancel_tool(patient_name: str, doctor_name: str, date: str) -> dict:
@@ -317,28 +428,11 @@ def create_tools(rule: SchedulingRule,
             dict: A dictionary containing the cancelled_schedule, result_dict, and updated_doctor_info.
         """
         log(f'[TOOL CALL] cancel_tool | patient_name={patient_name}, doctor_name={doctor_name}, date={date}', color=True)
-        result_dict, updated_doctor_info, cancelled_schedule = init_result_dict(), None, None
-        prefix = 'Dr.'
-        if prefix not in doctor_name:
-            doctor_name = f'{prefix} {doctor_name}'
-        index = rule.find_idx(patient_schedule_list, patient_name, doctor_name, date)
-
-        # Update result_dict
-        if gt_idx is None:
-            result_dict['gt'].append({'cancel': None})
-            result_dict['pred'].append({'cancel': index})
-            result_dict['status'].append(None)
-            result_dict['status_code'].append(None)
-        else:
-            status = True if index == gt_idx else False
-            status_code = STATUS_CODES['correct'] if index == gt_idx else STATUS_CODES['cancel']['identify']
-            result_dict['gt'].append({'cancel': gt_idx})
-            result_dict['pred'].append({'cancel': index})
-            result_dict['status'].append(status)
-            result_dict['status_code'].append(status_code)
+        updated_doctor_info, cancelled_schedule = None, None
+        index, result_dict = rule.identify_schedule('cancel', patient_schedule_list, patient_name, doctor_name, date, gt_idx)
 
         # Update the schedule only when the cancellation is correct or there is no gt_idx
-        if gt_idx is None or status:
+        if result_dict['status'][0] is not False:
             cancelled_schedule = patient_schedule_list[index]
             updated_doctor_info = rule.cancel_schedule(index, doctor_info, cancelled_schedule)
                 
@@ -359,27 +453,10 @@ def create_tools(rule: SchedulingRule,
             dict: A dictionary containing the original_schedule and result_dict.
         """
         log(f'[TOOL CALL] reschedule_tool | patient_name={patient_name}, doctor_name={doctor_name}, date={date}', color=True)
-        result_dict, original_schedule = init_result_dict(), None
-        prefix = 'Dr.'
-        if prefix not in doctor_name:
-            doctor_name = f'{prefix} {doctor_name}'
-        index = rule.find_idx(patient_schedule_list, patient_name, doctor_name, date)
-        
-        # Update result_dict
-        if gt_idx is None:
-            result_dict['gt'].append({'reschedule': None})
-            result_dict['pred'].append({'reschedule': index})
-            result_dict['status'].append(None)
-            result_dict['status_code'].append(None)
-        else:
-            status = True if index == gt_idx else False
-            status_code = STATUS_CODES['correct'] if index == gt_idx else STATUS_CODES['reschedule']['identify']
-            result_dict['gt'].append({'reschedule': gt_idx})
-            result_dict['pred'].append({'reschedule': index})
-            result_dict['status'].append(status)
-            result_dict['status_code'].append(status_code)
+        original_schedule = None
+        index, result_dict = rule.identify_schedule('reschedule', patient_schedule_list, patient_name, doctor_name, date, gt_idx)
 
-        if gt_idx is None or status:
+        if result_dict['status'][0] is not False:
             original_schedule = patient_schedule_list[index]
 
         return {'original_schedule': original_schedule, 'result_dict': result_dict}
@@ -1,14 +1,18 @@
 import re
 
+from h_adminsim.utils.time_utils import get_time_grid
 from h_adminsim.utils.common_utils import (
     iso_to_hour,
     iso_to_date,
     sort_schedule,
-    convert_time_list_to_merged_time,
 )
 
 
 
+HOSPITAL_TAG_SYSTEM = 'urn:h-adminsim:hospital'
+
+
+
 def sanitize_id(s: str) -> str:
     """
     Sanitize a string to conform to the pattern: ^[A-Za-z0-9\-\.]{1,64}$
@@ -41,6 +45,35 @@ def get_individual_id(hospital: str, department_code: str, individual_name: str)
 
 
 
+def get_hospital_tag(hospital: str) -> dict:
+    """
+    Make a `meta.tag` coding of a hospital, so that the resources of a hospital can be searched with the `_tag` parameter.
+
+    Args:
+        hospital (str): A hospital name.
+
+    Returns:
+        dict: A tag coding (e.g., {'system': 'urn:h-adminsim:hospital', 'code': 'hospital001'}).
+    """
+    return {'system': HOSPITAL_TAG_SYSTEM, 'code': sanitize_id(hospital)}
+
+
+
+def get_hospital_tag_param(hospital: str) -> str:
+    """
+    Make a `_tag` search parameter value of a hospital.
+
+    Args:
+        hospital (str): A hospital name.
+
+    Returns:
+        str: A token search value (e.g., 'urn:h-adminsim:hospital|hospital001').
+    """
+    tag = get_hospital_tag(hospital)
+    return f"{tag['system']}|{tag['code']}"
+
+
+
 def get_practitionerrole_id(individual_id: str) -> str:
     """
     Make a practitioner role ID for an individual.
@@ -157,9 +190,10 @@ def get_all_doctor_info(practitioners: list[dict],
 
     # Merge fixed schedule times
     if all(k in kwargs for k in ['start', 'end', 'interval']):
+        grid = get_time_grid(kwargs['start'], kwargs['end'], kwargs['interval'])
         for fixed_schedules in practitioner_ref_to_schedules.values():
             for date, time_list in fixed_schedules.items():
-                fixed_schedules[date] = convert_time_list_to_merged_time(time_list=sort_schedule(time_list), **kwargs)
+                fixed_schedules[date] = grid.merge_time_list(sort_schedule(time_list))
 
     # Append patient appointments of a doctor
     for appointment in appointments:
@@ -1,7 +1,7 @@
 import os
 import json
 import orjson
-from typing import Any
+from typing import Any, Iterator
 from pathlib import Path
 
 from h_adminsim.utils import log
@@ -65,6 +65,43 @@ def json_save_fast(path: str, data: dict):
 
 
 
+def ndjson_load(path: str) -> Iterator[Any]:
+    """
+    Load a newline-delimited JSON (NDJSON) file line by line.
+
+    Args:
+        path (str): Path to the NDJSON file.
+
+    Yields:
+        Any: The parsed Python object of each non-empty line.
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+
+def iter_json_records(path: str) -> Iterator[Any]:
+    """
+    Iterate over the JSON records of a `.json` or `.ndjson` file, or of every such file in a directory.
+    A `.json` file yields a single record, and an `.ndjson` file yields one record per line.
+
+    Args:
+        path (str): File or folder path.
+
+    Yields:
+        Any: The parsed Python object of each record.
+    """
+    files = [path] if os.path.isfile(path) else sorted(get_files(path))
+    for file in files:
+        if str(file).endswith('.ndjson'):
+            yield from ndjson_load(file)
+        elif str(file).endswith('.json'):
+            yield json_load(file)
+
+
+
 def yaml_save(file: str='data.yaml', data: Any = None):
     """
     Save data to an YAML file.
@@ -0,0 +1,335 @@
+from functools import lru_cache
+from decimal import Decimal, getcontext
+from datetime import datetime, date, timedelta, timezone
+from typing import Union, Tuple, Optional
+
+from h_adminsim.utils import log
+from h_adminsim.utils.common_utils import str_to_datetime
+
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+SECONDS_PER_DAY = 86400
+
+
+
+def hour_to_seconds(hours: Union[int, float]) -> int:
+    """
+    Convert a decimal number of hours into integer seconds.
+    The fractional second is truncated in the same way as `hour_to_hhmmss`.
+
+    Args:
+        hours (Union[int, float]): A float or integer representing the number of hours.
+
+    Returns:
+        int: The number of seconds.
+    """
+    return int(timedelta(hours=hours).total_seconds())
+
+
+
+def seconds_to_hour(seconds: int) -> float:
+    """
+    Convert integer seconds into a decimal number of hours.
+
+    Args:
+        seconds (int): The number of seconds.
+
+    Returns:
+        float: Time represented in float hours (e.g., 9.5).
+    """
+    return seconds / 3600
+
+
+
+@lru_cache(maxsize=None)
+def get_time_grid(start_hour: float, end_hour: float, interval_hour: float) -> 'TimeGrid':
+    """
+    Get the segment grid of the given operating hours. The grid is built only once per (start, end, interval) triple.
+
+    Args:
+        start_hour (float): Start time in hours (e.g., 9.0 for 09:00).
+        end_hour (float): End time in hours (e.g., 18.0 for 18:00).
+        interval_hour (float): Time interval in hours for each segment (e.g., 0.5 for 30 minutes).
+
+    Returns:
+        TimeGrid: The cached segment grid.
+    """
+    return TimeGrid(start_hour, end_hour, interval_hour)
+
+
+
+class TimeGrid:
+    def __init__(self, start_hour: float, end_hour: float, interval_hour: float):
+        """
+        Precomputed segment grid of a single hospital.
+
+        It gives the same results as `convert_time_to_segment` and `convert_segment_to_time` of the same (start, end, interval) triple,
+        but the Decimal arithmetic is done only once per segment (or per distinct hour value) instead of on every call.
+        Use `get_time_grid` to share a grid across the modules.
+
+        Args:
+            start_hour (float): Start time in hours (e.g., 9.0 for 09:00).
+            end_hour (float): End time in hours (e.g., 18.0 for 18:00).
+            interval_hour (float): Time interval in hours for each segment (e.g., 0.5 for 30 minutes).
+        """
+        assert start_hour < end_hour, log("Start time must be less than end time", "error")
+        assert interval_hour > 0, log("Interval must be greater than 0", "error")
+
+        # Initialize
+        getcontext().prec = 10
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.interval_hour = interval_hour
+        self.segment_n = int((end_hour - start_hour) / interval_hour)
+
+        # Segment tables
+        self.segment_start_hours = [float(Decimal(str(start_hour)) + Decimal(str(s * interval_hour))) for s in range(self.segment_n)]
+        self.segment_end_hours = [float(min(Decimal(str(start_hour)) + Decimal(str((s + 1) * interval_hour)), end_hour)) for s in range(self.segment_n)]
+
+        # Reverse lookup from a float hour to a segment index
+        self._hour_to_segment = dict()
+
+
+    def hour_to_segment(self, hour: float) -> int:
+        """
+        Get the index of the segment that starts at (or contains) the given hour.
+
+        Args:
+            hour (float): Time in hours.
+
+        Returns:
+            int: Segment index. The end hour of the grid is mapped to `segment_n`.
+        """
+        try:
+            return self._hour_to_segment[hour]
+        except KeyError:
+            getcontext().prec = 10
+            segment = int((Decimal(str(hour)) - Decimal(str(self.start_hour))) / Decimal(str(self.interval_hour)))
+            self._hour_to_segment[hour] = segment
+            return segment
+
+
+    def to_segment_range(self, time_range: list[float]) -> Tuple[int, int]:
+        """
+        Convert a time range into the half-open range of its segment indices.
+
+        Args:
+            time_range (list[float]): [start_time, end_time] in hours.
+
+        Returns:
+            Tuple[int, int]: The first segment index and the one past the last segment index.
+        """
+        assert len(time_range) == 2, log("Time range must be composed of two float values", "error")
+        assert time_range[0] >= self.start_hour and time_range[1] <= self.end_hour, log("Time range must be within overall time bounds", "error")
+        assert time_range[0] < time_range[1], log("Start time of `time_range` must be less than its end time", "error")
+        return self.hour_to_segment(time_range[0]), self.hour_to_segment(time_range[1])
+    
+
+    def to_segments(self, time_range: Optional[list[float]] = None) -> list[int]:
+        """
+        Generate segment indices of the whole grid or of the given time range.
+
+        Args:
+            time_range (Optional[list[float]], optional): If provided, should be a list of two floats 
+                [start_time, end_time]. Only segments within this subrange are returned.
+
+        Returns:
+            list[int]: List of segment indices, where each index corresponds to a time slot.
+        """
+        if time_range == None:
+            return list(range(self.segment_n))
+        return list(range(*self.to_segment_range(time_range)))
+    
+
+    def to_time(self, segments: list[int]) -> Tuple[float, float]:
+        """
+        Convert continuous segment indices back to the time range they cover.
+
+        Args:
+            segments (list[int]): List of segment indices to convert (e.g., [0, 1, 2]).
+
+        Returns:
+            Tuple[float, float]: Start and end time (in hours) of the given segments.
+        """
+        # Sanity checking
+        for s in segments:
+            assert 0 <= s < self.segment_n, log(f"Segment index {s} out of range", "error")
+
+        if len(segments) > 1:
+            for i in range(1, len(segments)):
+                assert segments[i] == segments[i-1] + 1, log("Segment indices must be continuous (i.e., increasing by 1)", "error")
+        
+        return self.segment_start_hours[segments[0]], self.segment_end_hours[segments[-1]]
+    
+
+    def merge_time_list(self, time_list: list[Tuple[float, float]]) -> list[Tuple[float, float]]:
+        """
+        Convert a list of time intervals into merged intervals on the grid (see `convert_time_list_to_merged_time`).
+
+        Args:
+            time_list (list[Tuple[float, float]]): A list of time intervals to convert and merge.
+
+        Returns:
+            list[Tuple[float, float]]: A list of merged time intervals.
+        """
+        if len(time_list) > 0:
+            merged, current = list(), None
+            for time_range in time_list:
+                st, tr = self.to_segment_range(time_range)
+                for s in range(st, tr):
+                    if current is not None and s == current[1]:
+                        current[1] = s + 1
+                    else:
+                        if current is not None:
+                            merged.append(current)
+                        current = [s, s + 1]
+            if current is not None:
+                merged.append(current)
+            time_list = [[self.segment_start_hours[st], self.segment_end_hours[tr - 1]] for st, tr in merged]
+        return time_list
+
+
+
+class HospitalClock:
+    def __init__(self, utc_offset: str):
+        """
+        Compact integer time representation of a single hospital.
+
+        Every time is kept as integer UTC epoch seconds and is rendered with the fixed UTC offset of the hospital.
+        ISO 8601 strings are produced only when a time leaves the simulation (e.g., LLM prompts, FHIR resources, and saved results).
+
+        Args:
+            utc_offset (str): UTC offset of the hospital in '+HH:MM' or '-HH:MM' format.
+        """
+        self.utc_offset = utc_offset
+        self._offset_seconds = int(datetime.fromisoformat(f'2000-01-01T00:00:00{utc_offset}').utcoffset().total_seconds())
+
+        # Cache variables
+        self._date_cache = dict()
+        self._hour_cache = dict()
+
+
+    def date_to_epoch(self, date_str: Union[str, date]) -> int:
+        """
+        Get the epoch seconds of the midnight of the given date in the hospital time zone.
+
+        Args:
+            date_str (Union[str, date]): Date string in 'YYYY-MM-DD' format or a date object.
+
+        Returns:
+            int: Epoch seconds.
+        """
+        try:
+            return self._date_cache[date_str]
+        except KeyError:
+            _date = date.fromisoformat(date_str) if isinstance(date_str, str) else date_str
+            epoch = (_date.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY - self._offset_seconds
+            self._date_cache[date_str] = epoch
+            return epoch
+
+
+    def hour_to_seconds(self, hours: Union[int, float]) -> int:
+        """
+        Cached version of `hour_to_seconds`.
+
+        Args:
+            hours (Union[int, float]): A float or integer representing the number of hours.
+
+        Returns:
+            int: The number of seconds.
+        """
+        try:
+            return self._hour_cache[hours]
+        except KeyError:
+            seconds = hour_to_seconds(hours)
+            self._hour_cache[hours] = seconds
+            return seconds
+
+
+    def to_epoch(self, time_hour: Union[int, float], date_str: Union[str, date]) -> int:
+        """
+        Convert an hour on the given date into epoch seconds.
+
+        Args:
+            time_hour (Union[int, float]): Time expressed in hours (e.g., 9.5 → 09:30:00).
+            date_str (Union[str, date]): Date string in 'YYYY-MM-DD' format or a date object.
+
+        Returns:
+            int: Epoch seconds.
+        """
+        return self.date_to_epoch(date_str) + self.hour_to_seconds(time_hour)
+
+
+    def from_iso(self, iso_time: Union[str, datetime]) -> int:
+        """
+        Convert an ISO 8601 time into epoch seconds.
+        Naive times (i.e., without UTC offset) are regarded as times in the hospital time zone.
+
+        Args:
+            iso_time (Union[str, datetime]): ISO 8601 time string or a datetime object.
+
+        Returns:
+            int: Epoch seconds. Fractional seconds are truncated.
+        """
+        dt = str_to_datetime(iso_time)
+        if not isinstance(dt, datetime):
+            return self.date_to_epoch(dt)
+        if dt.tzinfo is None:
+            return int((dt - EPOCH).total_seconds()) - self._offset_seconds
+        return int((dt - EPOCH.replace(tzinfo=timezone.utc)).total_seconds())
+
+
+    def to_iso(self, epoch: int) -> str:
+        """
+        Convert epoch seconds into an ISO 8601 time string with the hospital UTC offset.
+
+        Args:
+            epoch (int): Epoch seconds.
+
+        Returns:
+            str: ISO 8601 formatted datetime string.
+        """
+        days, seconds = divmod(epoch + self._offset_seconds, SECONDS_PER_DAY)
+        h, m, s = seconds // 3600, (seconds % 3600) // 60, seconds % 60
+        return f'{date.fromordinal(days + EPOCH_ORDINAL).isoformat()}T{h:02}:{m:02}:{s:02}{self.utc_offset}'
+
+
+    def to_date(self, epoch: int) -> str:
+        """
+        Extract the date of the epoch seconds in the hospital time zone.
+
+        Args:
+            epoch (int): Epoch seconds.
+
+        Returns:
+            str: Date represented in string (e.g. 2024-05-23).
+        """
+        return date.fromordinal((epoch + self._offset_seconds) // SECONDS_PER_DAY + EPOCH_ORDINAL).isoformat()
+
+
+    def seconds_of_day(self, epoch: int) -> int:
+        """
+        Get the seconds elapsed since the midnight of the hospital time zone.
+
+        Args:
+            epoch (int): Epoch seconds.
+
+        Returns:
+            int: Seconds of the day.
+        """
+        return (epoch + self._offset_seconds) % SECONDS_PER_DAY
+
+
+    def to_hour(self, epoch: int) -> float:
+        """
+        Convert epoch seconds into the float hour of the day in the hospital time zone.
+
+        Args:
+            epoch (int): Epoch seconds.
+
+        Returns:
+            float: Time represented in float hours (e.g., 9.5).
+        """
+        return seconds_to_hour(self.seconds_of_day(epoch))
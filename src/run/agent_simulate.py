@@ -10,8 +10,10 @@ sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 from h_adminsim import SupervisorAgent
 from h_adminsim.task.agent_task import *
 from h_adminsim.pipeline import Simulator
-from h_adminsim.utils import set_logging, LOGGING_NAME
-from h_adminsim.utils.filesys_utils import yaml_save, get_files
+from h_adminsim.task.fhir_manager import FHIRManager
+from h_adminsim.client import enable_response_cache, enable_trace_recording, enable_trace_replay
+from h_adminsim.utils import set_logging, log, colorstr, LOGGING_NAME
+from h_adminsim.utils.filesys_utils import yaml_save, get_files, iter_json_records
 
 
 
@@ -36,10 +38,46 @@ def load_config(config_path: str):
     return config
 
 
+def load_memory_fhir(config):
+    # In-process FHIR servers (memory://) are empty in every process, so the hospital resources are uploaded from the `fhir_data` folder next to the agent test data
+    fhir_data_dir = os.path.join(os.path.dirname(os.path.normpath(config.agent_test_data)), 'fhir_data')
+    if not os.path.isdir(fhir_data_dir):
+        raise FileNotFoundError(colorstr("red", f"FHIR data for the in-process FHIR server not found: {fhir_data_dir}"))
+    
+    resources = [
+        resource for resource_type in ['practitioner', 'practitionerrole', 'schedule', 'slot'] \
+            if os.path.isdir(os.path.join(fhir_data_dir, resource_type)) \
+            for resource in iter_json_records(os.path.join(fhir_data_dir, resource_type))
+    ]
+    failed = FHIRManager(config.fhir_url).create_all(resources, verbose=False)
+    log(f"{len(resources) - len(failed)} FHIR resources are loaded into {config.fhir_url}")
+
+
 def simulate(config, args, single_file=None):
     if args.logging_dir is not None:
         init_worker_logging(args.logging_dir, config.task_model.replace('/', '_'))
 
+    # Load the in-process FHIR server of this process
+    if config.integration_with_fhir and config.fhir_url.startswith('memory://'):
+        load_memory_fhir(config)
+
+    # Initialize LLM response cache
+    response_cache = None
+    if config.llm_cache_path:
+        response_cache = enable_response_cache(
+            config.llm_cache_path,
+            max_size_mb=config.llm_cache_max_size_mb,
+            read_only=config.llm_cache_replay,
+        )
+
+    # Initialize LLM traffic trace
+    trace = None
+    if config.llm_trace_path:
+        if config.llm_trace_mode == 'replay':
+            trace = enable_trace_replay(config.llm_trace_path, latency=config.llm_trace_latency, strict=config.llm_trace_strict)
+        else:
+            trace = enable_trace_recording(config.llm_trace_path)
+
     # Initialize tasks
     intake_task, scheduling_task = None, None
     if 'intake' in args.type:
@@ -68,6 +106,7 @@ def simulate(config, args, single_file=None):
             request_early_schedule_prob=config.request_early_schedule_prob,
             fhir_integration=config.integration_with_fhir,
             scheduling_strategy=config.schedule_task.scheduling_strategy,
+            waiting_list_strategy=config.schedule_task.waiting_list_strategy,
             patient_vllm_endpoint=config.vllm_url if use_vllm else None,
             admin_staff_vllm_endpoint=config.vllm_url if use_vllm else None
         )
@@ -81,6 +120,8 @@ def simulate(config, args, single_file=None):
         fhir_url=config.fhir_url,
         fhir_max_connection_retries=config.fhir_max_connection_retries,
         random_seed=config.seed,
+        fhir_write_behind=config.fhir_write_behind,
+        patient_concurrency=config.patient_concurrency,
     )
 
     simulator.run(
@@ -90,6 +131,11 @@ def simulate(config, args, single_file=None):
         verbose=args.verbose,
     )
 
+    if response_cache is not None:
+        log(f"LLM response cache statistics: {response_cache.stats()}")
+    if config.llm_trace_path and config.llm_trace_mode == 'replay':
+        log(f"LLM trace replay statistics: {trace.stats()}")
+
 
 def main(args):
     # Init config
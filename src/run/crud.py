@@ -6,10 +6,10 @@ from sconf import Config
 from argparse import ArgumentParser
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
-from h_adminsim.task.fhir_manager import FHIRManager
+from h_adminsim.task.fhir_manager import FHIRManager, UploadReport
 from h_adminsim.utils import log
 from h_adminsim.utils.random_utils import random_uuid
-from h_adminsim.utils.filesys_utils import json_load, get_files
+from h_adminsim.utils.filesys_utils import json_load, iter_json_records
 
 
 def env_setup(config):
@@ -34,25 +34,16 @@ def main(args):
     fhir_manager = FHIRManager(config.fhir_url)
     
     if args.mode == 'create':
+        resources = list()
         for path in config.create_data_path:
-            is_file = os.path.isfile(path)
-            files = [path] if is_file else get_files(path, ext='json')
-            error_files = list()
-            
-            for file in files:
-                resource_data = json_load(file)
-                resource_type = resource_data.get('resourceType')
+            for resource_data in iter_json_records(path):
                 if 'id' not in resource_data:
                     resource_data['id'] = random_uuid(args.is_develop)
-                
-                response = fhir_manager.create(resource_type, resource_data)
-                if 200 <= response.status_code < 300:
-                    log(f"Created {resource_type} with ID {response.json().get('id')}")
-                else:
-                    error_files.append(file)
-            
-            if len(error_files):
-                log(f'Error files during creating data: {error_files}', 'warning')
+                resources.append(resource_data)
+        
+        report = UploadReport()
+        fhir_manager.create_all(resources, batch_size=args.batch_size, max_workers=args.max_workers, report=report)
+        report.log()
 
     elif args.mode == 'read':
         if not args.id or not args.resource_type:
@@ -99,11 +90,10 @@ def main(args):
             raise ValueError('Resource type is required for read_all operation')
         
         for resource_type in args.resource_type:
-            all_entries = fhir_manager.read_all(resource_type)
-            log(f'Resource type: {resource_type}, Total length: {len(all_entries)}', color=True)
-
-            fhir_manager.delete_all(all_entries)
+            deleted_n = fhir_manager.reset([resource_type], batch_size=args.batch_size, max_workers=args.max_workers, verbose=False)
+            log(f'Resource type: {resource_type}, Deleted length: {deleted_n}', color=True)
 
+    fhir_manager.close()
     
 
 
@@ -114,6 +104,8 @@ if __name__ == '__main__':
     parser.add_argument('-d', '--is_develop', action='store_true', required=False, help='Enable development mode for controlled random UUID generation')
     parser.add_argument('--id', type=str, required=False, help='Resource ID for read, update, or delete operations')
     parser.add_argument('--resource_type', type=str, required=False, nargs='+', help='Resource type for read, update, or delete operations')
+    parser.add_argument('--batch_size', type=int, default=100, required=False, help='Number of resources per Bundle for create and delete_all operations (1 or less disables batching)')
+    parser.add_argument('--max_workers', type=int, default=1, required=False, help='Maximum number of in-flight requests for create and delete_all operations')
     parser.add_argument('--update_data_path', type=str, required=False, help='Data path for update operation (JSON file)')
     args = parser.parse_args()
 
@@ -10,24 +10,17 @@ from h_adminsim import SupervisorAgent
 from h_adminsim.task.agent_task import *
 from h_adminsim.task.fhir_manager import FHIRManager
 from h_adminsim.pipeline import DataGenerator, Simulator
+from h_adminsim.client import enable_response_cache, enable_trace_recording, enable_trace_replay
 from h_adminsim.utils import log
 from h_adminsim.utils.filesys_utils import yaml_save
 
 
 
 
-def env_setup(config, resume):
+def env_setup(config):
     random.seed(config.seed)
     np.random.seed(config.seed)
 
-    # Delete Patient and Appointment resources when starting a simulation
-    if config.integration_with_fhir and not resume:
-        fhir_manager = FHIRManager(config.fhir_url)
-        appointment_entries = fhir_manager.read_all('Appointment')
-        patient_entries = fhir_manager.read_all('Patient')
-        fhir_manager.delete_all(appointment_entries, verbose=False)
-        fhir_manager.delete_all(patient_entries, verbose=False)
-
 
 def load_config(config_path):
     config = Config(config_path)
@@ -42,17 +35,20 @@ def main(args):
     
 
     # Init environment
-    env_setup(s_config, args.resume)
+    fhir_manager = FHIRManager(s_config.fhir_url)
+    env_setup(s_config)
 
 
     # Generate data for the simulation
     data_generator = DataGenerator() if not d_config else DataGenerator(config=d_config)
-    output = data_generator.build(convert_to_fhir=True)
+    output = data_generator.build(convert_to_fhir=True, fhir_output_format=args.fhir_output_format)
 
     if args.upload_data_to_fhir:
         data_generator.upload_to_fhir(
             fhir_data_dir=data_generator.save_dir / 'fhir_data',
-            fhir_url=s_config.fhir_url
+            fhir_url=s_config.fhir_url,
+            fhir_manager=fhir_manager,
+            max_workers=args.upload_max_workers,
         )
 
     log('Data has been successfully generated!', color=True)
@@ -63,6 +59,21 @@ def main(args):
     s_config.agent_test_data = str(data_generator.save_dir / 'agent_data')
     os.makedirs(output_dir, exist_ok=True)
     yaml_save(os.path.join(output_dir, 'args.yaml'), s_config)
+
+    response_cache = None
+    if s_config.llm_cache_path:
+        response_cache = enable_response_cache(
+            s_config.llm_cache_path,
+            max_size_mb=s_config.llm_cache_max_size_mb,
+            read_only=s_config.llm_cache_replay,
+        )
+
+    trace = None
+    if s_config.llm_trace_path:
+        if s_config.llm_trace_mode == 'replay':
+            trace = enable_trace_replay(s_config.llm_trace_path, latency=s_config.llm_trace_latency, strict=s_config.llm_trace_strict)
+        else:
+            trace = enable_trace_recording(s_config.llm_trace_path)
     
     intake_task, scheduling_task = None, None
     if 'intake' in args.type:
@@ -92,6 +103,7 @@ def main(args):
             request_early_schedule_prob=s_config.request_early_schedule_prob,
             fhir_integration=s_config.integration_with_fhir,
             scheduling_strategy=s_config.schedule_task.scheduling_strategy,
+            waiting_list_strategy=s_config.schedule_task.waiting_list_strategy,
             patient_vllm_endpoint=s_config.vllm_url if use_vllm else None,
             admin_staff_vllm_endpoint=s_config.vllm_url if use_vllm else None
         )
@@ -103,7 +115,10 @@ def main(args):
         fhir_integration=s_config.integration_with_fhir,
         fhir_url=s_config.fhir_url,
         fhir_max_connection_retries=s_config.fhir_max_connection_retries,
-        random_seed=s_config.seed
+        random_seed=s_config.seed,
+        fhir_write_behind=s_config.fhir_write_behind,
+        patient_concurrency=s_config.patient_concurrency,
+        fhir_manager=fhir_manager if s_config.integration_with_fhir else None,
     )
     
     log('Simulation started!', color=True)
@@ -113,6 +128,11 @@ def main(args):
         resume=args.resume,
         verbose=args.verbose
     )
+
+    if response_cache is not None:
+        log(f"LLM response cache statistics: {response_cache.stats()}")
+    if s_config.llm_trace_path and s_config.llm_trace_mode == 'replay':
+        log(f"LLM trace replay statistics: {trace.stats()}")
     
     
 
@@ -124,6 +144,8 @@ if __name__ == '__main__':
     parser.add_argument('--resume', action='store_true', required=False, help='Continue the stopped processing')
     parser.add_argument('--verbose', action='store_true', required=False, help='Whether logging the each result or not')
     parser.add_argument('--upload_data_to_fhir', action='store_true', required=False, help='Whether to upload synthetic data to FHIR')
+    parser.add_argument('--fhir_output_format', type=str, default='json', required=False, choices=['json', 'ndjson'], help='File format of the converted FHIR data (one file per resource or one NDJSON file per resource type and hospital)')
+    parser.add_argument('--upload_max_workers', type=int, default=1, required=False, help='Maximum number of in-flight requests when uploading synthetic data to FHIR')
     args = parser.parse_args()
 
     main(args)
@@ -34,7 +34,8 @@ def main(args):
     output = data_generator.build(
         sanity_check=args.sanity_check,
         convert_to_fhir=args.convert_to_fhir,
-        build_agent_data=True
+        build_agent_data=True,
+        fhir_output_format=args.fhir_output_format
     )
 
     
@@ -44,6 +45,7 @@ if __name__ == '__main__':
     parser.add_argument('-c', '--config', type=str, required=True, help='Path to the configuration file')
     parser.add_argument('--sanity_check', action='store_true', required=False, help='Check whether generated data and Hospital object compatible')
     parser.add_argument('--convert_to_fhir', action='store_true', required=False, help='Whether convert generated data to FHIR or not')
+    parser.add_argument('--fhir_output_format', type=str, default='json', required=False, choices=['json', 'ndjson'], help='File format of the converted FHIR data (one file per resource or one NDJSON file per resource type and hospital)')
     args = parser.parse_args()
 
     main(args)